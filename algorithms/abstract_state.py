@@ -65,3 +65,19 @@ class AbstractState(abc.ABC):
     def unmake_random_move(self, move: AbstractRandomMove):
         """reverts specified random move"""
         raise NotImplementedError()
+
+    def get_hash(self) -> int:
+        """
+        get a hash of the current position, the same for all the states that play the same from now on.
+        it's only needed by the searches that remember positions (see TranspositionTable)
+        :return: int, the hash of the position
+        """
+        raise NotImplementedError()
+
+    def to_bytes(self) -> bytes:
+        """
+        get a compact snapshot of the current state, to restore it in another process.
+        it's only needed by the searches that run in several processes (see ParallelRootSearch)
+        :return: bytes, the snapshot
+        """
+        raise NotImplementedError()
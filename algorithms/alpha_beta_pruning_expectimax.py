@@ -1,16 +1,35 @@
 import math
-from typing import Callable, List
+import time
+from typing import Callable, Dict, List, Sequence, Tuple
 
-from algorithms.abstract_state import AbstractState, AbstractMove
-from algorithms.timeoutable_algorithm import TimeoutableAlgorithm
+from algorithms.abstract_state import AbstractState, AbstractMove, AbstractRandomMove
+from algorithms.evaluation_cache import EvaluationCache
+from algorithms.moves_cache import MovesCache
+from algorithms.random_moves_sampler import RandomMovesSampler
+from algorithms.search_statistics import SearchStatistics
+from algorithms.timeoutable_algorithm import TimeoutableAlgorithm, Deadline
+from algorithms.transposition_table import TranspositionTable, TranspositionEntry, Bound
 from players.abstract_player import AbstractPlayer
 
 
 class AlphaBetaExpectimax(TimeoutableAlgorithm):
+    # the most children of a frontier node that are evaluated in one bulk (see _evaluate_frontier). larger batches
+    # are evaluated faster, but a cutoff wastes the evaluations of the rest of the batch
+    max_frontier_batch_size = 64
+
     def __init__(self, is_maximizing_player: Callable[[AbstractPlayer], bool],
                  evaluate_heuristic_value: Callable[[AbstractState], float],
                  timeout_seconds=5,
-                 filter_moves: Callable[[List[AbstractMove]], List[AbstractMove]]=lambda l: l):
+                 filter_moves: Callable[[List[AbstractMove], AbstractState], List[AbstractMove]]=
+                 lambda moves, state: moves,
+                 evaluate_heuristic_values: Callable[[AbstractState, List[AbstractMove]], Sequence[float]]=None,
+                 transposition_table: TranspositionTable=None,
+                 heuristic_bounds: Tuple[float, float]=None,
+                 probe_random_moves: bool=False,
+                 evaluation_cache: EvaluationCache=None,
+                 random_moves_sampler: RandomMovesSampler=None,
+                 score_moves: Callable[[List[AbstractMove], AbstractState], Sequence[float]]=None,
+                 moves_cache: MovesCache=None):
         """
         wrapper of the expectiamx with alpha-beta pruning algorithm
         it inherits from TimeoutableAlgorithm to enable iterative deepening
@@ -21,6 +40,36 @@ class AlphaBetaExpectimax(TimeoutableAlgorithm):
             lambda player: player == self
         :param evaluate_heuristic_value: a function that returns a number to
         heuristically evaluate the current state
+        :param evaluate_heuristic_values: optional parameter. a function that returns the heuristic values of the
+        states after each of the given moves (in the order of the moves), that evaluates them in bulk, e.g by
+        gathering their features into a matrix and multiplying it by the weights. the state should be left as it was.
+        if given, it's used to evaluate the children of the frontier (depth 1) nodes, instead of
+        evaluate_heuristic_value
+        :param transposition_table: optional parameter. if given, the values and best moves of the searched
+        positions are stored in it, and looked up before positions are searched (the states should implement
+        get_hash). it's kept between searches, so the iterations of the iterative deepening reuse each other's
+        results. NOTE: the stored values depend on the heuristic, so it should be cleared when the heuristic changes
+        :param heuristic_bounds: optional parameter. the lowest and highest values the heuristic can return (values
+        out of them are clipped). if given, the random nodes are pruned by them (see _search_random_moves)
+        :param probe_random_moves: whether to probe the children of the random nodes before searching them, when
+        pruning them by the heuristic's bounds (see _probe_random_moves). the probes search the first move of each
+        child, so they pay off only if they often prove cutoffs
+        :param evaluation_cache: optional parameter. if given, the heuristic values of the leaves are cached in it,
+        and looked up before the leaves are evaluated (the states should implement get_hash). it pays off if the
+        heuristic is expensive. the leaves that are evaluated in bulk aren't looked up, as it'd take making their
+        moves once more, but evaluate_heuristic_values may look them up itself, as it makes the moves anyway.
+        NOTE: as the transposition table, it should be cleared when the heuristic changes
+        :param random_moves_sampler: optional parameter. if given, the random nodes with many random moves are
+        expanded with some of them, that stand for the others (see RandomMovesSampler), so the search gets deeper
+        at the cost of estimating their values (the states should implement get_hash)
+        :param score_moves: optional parameter. a function that cheaply scores the (filtered) next moves of a state,
+        higher for the moves that are likely better for the player making them (i.e by the points they gain). if
+        given, the moves are searched from the highest score down, after the best move of the transposition table,
+        so the good moves are found first and cut the others off
+        :param moves_cache: optional parameter. if given, the filtered and ordered next moves of the searched
+        positions are cached in it, and looked up before the moves are generated (the states should implement
+        get_hash), so the iterations of the iterative deepening don't generate the moves of the positions they
+        search again. NOTE: it should be cleared when the filter or the scorer changes
         :return: best move
         """
         super().__init__(timeout_seconds)
@@ -29,24 +78,78 @@ class AlphaBetaExpectimax(TimeoutableAlgorithm):
         self.max_depth = 0
         self._is_maximizing_player = is_maximizing_player
         self.evaluate_heuristic_value = evaluate_heuristic_value
+        self.evaluate_heuristic_values = evaluate_heuristic_values
+        self.transposition_table = transposition_table
+        self.heuristic_bounds = heuristic_bounds
+        self.probe_random_moves = probe_random_moves
+        self.evaluation_cache = evaluation_cache
+        self.random_moves_sampler = random_moves_sampler
+        self.score_moves = score_moves
+        self.moves_cache = moves_cache
+        # the values of the root's moves (by their indices among the filtered next moves) in the last iteration of
+        # the iterative deepening that was completed in this turn, and in the current iteration so far
+        self.last_root_values = None
+        self._root_values = None
+        # the index of the best of the root's moves in the current iteration so far
+        self._root_best_index = None
+        # set by ParallelRootSearch in its workers: the indices of the root's moves the worker searches (None for
+        # all of them), and the best value of the root's moves found by all the workers so far (see SharedAlpha)
+        self.root_moves_indices = None
+        self.shared_alpha = None
+        # the statistics of the searches of the current turn
+        self.statistics = SearchStatistics()
+
+    def start_turn_timer(self, deadline: Deadline=None):
+        """
+        start the timer of the turn (see TimeoutableAlgorithm.start_turn_timer), and forget the iterations of the
+        previous turn. the statistics of the turn start anew
+        :param deadline: optional parameter. as in TimeoutableAlgorithm.start_turn_timer
+        :return: None
+        """
+        super().start_turn_timer(deadline)
+        self.last_root_values = None
+        self.statistics = SearchStatistics()
 
     def get_best_move(self, state: AbstractState, max_depth: int):
         """
         get best move, based on the expectimax with alpha-beta pruning algorithm
-        with given heuristic function
+        with given heuristic function.
+        it's an iteration of the iterative deepening: the root's moves are searched in the order of their values in
+        the previous (completed) iteration of the turn, so the previous best move is searched first.
+        if the time runs out in the middle of the iteration, the best of the moves that were searched to the end is
+        returned, provided that the previous best move was one of them (so the returned move was found to be at
+        least as good as it, by a deeper search), or that there is no previous iteration
         :param state: the Game, an interface with necessary methods
         (see AbstractState for details)
         :param max_depth: the maximum depth the algorithm will reach in the game tree
-        :return: the best move
+        :return: the best move, or None if the time ran out before a move better than the previous one was found
         """
         assert isinstance(max_depth, int) and max_depth > 0
         assert isinstance(state, AbstractState)
 
         self.state = state
         self.max_depth = max_depth
+        if self.transposition_table is not None:
+            self.transposition_table.new_search()
+        self._root_values = {}
+        self._root_best_index = None
+        self.check_time(read_clock=True)
+        start_time = time.perf_counter()
         _, best_move = self._alpha_beta_expectimax(self.max_depth, -math.inf, math.inf, False)
+        self.statistics.add_iteration(max_depth, time.perf_counter() - start_time, not self.ran_out_of_time)
+
+        if not self.ran_out_of_time:
+            self.last_root_values = self._root_values
+            return best_move
+        if self.last_root_values and self._get_best_index(self.last_root_values) not in self._root_values:
+            return None
         return best_move
 
+    @staticmethod
+    def _get_best_index(values: Dict[int, float]) -> int:
+        # the first of the best, as in the search
+        return max(values, key=values.get)
+
     def _alpha_beta_expectimax(self, depth: int, alpha: int, beta: int, is_random_event: bool):
         """
         expectimax with alpha-beta pruning
@@ -59,44 +162,400 @@ class AlphaBetaExpectimax(TimeoutableAlgorithm):
         :param is_random_event: boolean indicating whether it's a node of random event (dice thrown)
         :return: best move
         """
-        if self.ran_out_of_time:
+        if self.check_time():
             return 0, None
 
         if depth == 0 or self.state.is_final():
-            return self.evaluate_heuristic_value(self.state), None
+            self.statistics.leaves_count += 1
+            return self._clip(self._evaluate_leaf()), None
 
         if is_random_event:
-            v = 0
-            for random_move in self.state.get_next_random_moves():
-                self.state.make_random_move(random_move)
-                u, _ = self._alpha_beta_expectimax(depth - 1, alpha, beta, False)
-                v += random_move.probability * u
-                self.state.unmake_random_move(random_move)
+            self.statistics.chance_nodes_count += 1
+            if self.heuristic_bounds is None:
+                v = 0
+                for random_move, probability in self._get_random_moves():
+                    self._make_move(random_move)
+                    u, _ = self._alpha_beta_expectimax(depth - 1, alpha, beta, False)
+                    v += probability * u
+                    self._unmake_move(random_move)
+                return v, None
+            return self._search_random_moves(depth, alpha, beta), None
+
+        key, entry = None, None
+        if self.transposition_table is not None:
+            key = self.state.get_hash()
+            entry = self.transposition_table.lookup(key)
+            # the root is always searched, for its best move
+            if entry is not None and depth != self.max_depth and entry.is_usable(depth, alpha, beta):
+                self.statistics.transposition_cutoffs_count += 1
+                return entry.value, None
+
+        moves, indexed_moves = self._get_ordered_moves(entry, depth, key)
+        root_values = None
+        if depth == self.max_depth:
+            root_values = self._root_values
+            if self.root_moves_indices is not None:
+                indexed_moves = [(i, move) for i, move in indexed_moves if i in self.root_moves_indices]
+            if self.last_root_values:
+                indexed_moves.sort(key=lambda indexed_move: -self.last_root_values.get(indexed_move[0], -math.inf))
+
+        if depth == 1 and self.evaluate_heuristic_values is not None:
+            v, best_move_index = self._evaluate_frontier(indexed_moves, alpha, beta, root_values)
+        else:
+            v, best_move_index = self._search_moves(indexed_moves, depth, alpha, beta, root_values)
+
+        if root_values is not None:
+            self._root_best_index = best_move_index
+        # the value of a root that was searched for some of its moves is only theirs
+        is_partial_root = root_values is not None and self.root_moves_indices is not None
+        if key is not None and not self.ran_out_of_time and not is_partial_root:
+            self.transposition_table.store(key, v, depth, Bound.of_value(v, alpha, beta), best_move_index)
+        if best_move_index is None or not self._is_maximizing_player(self.state.get_current_player()):
             return v, None
-        elif self._is_maximizing_player(self.state.get_current_player()):
-            v = -math.inf
-            best_move = None
-            for move in self.filter_moves(self.state.get_next_moves(), self.state):
-                self.state.make_move(move)
-                u, _ = self._alpha_beta_expectimax(depth - 1, alpha, beta, True)
-                if u > v:
-                    v = u
-                    best_move = move
-                self.state.unmake_move(move)
+        return v, moves[best_move_index]
 
-                alpha = max(v, alpha)
-                if beta <= alpha:
-                    break
-            return v, best_move
+    def get_next_moves(self, state: AbstractState) -> List[AbstractMove]:
+        """
+        get the filtered next moves of a state, as the search gets them (from the moves cache, if they're there)
+        :param state: the state to get the moves of
+        :return: the filtered next moves
+        """
+        return self._get_moves(state)[0]
+
+    def _get_moves(self, state: AbstractState, key: int=None,
+                   is_cached: bool=True) -> Tuple[List[AbstractMove], List[int], int]:
+        """
+        get the filtered next moves of a state, and their order by their scores (see score_moves), from the moves
+        cache if they're there
+        :param state: the state to get the moves of
+        :param key: optional parameter. the hash of the state, if it's at hand
+        :param is_cached: whether to cache the moves, if they aren't there yet
+        :return: the filtered next moves, their indices in the order of their scores, and the number of the moves
+        before they were filtered
+        """
+        if self.moves_cache is not None:
+            key = key if key is not None else state.get_hash()
+            cached_moves = self.moves_cache.lookup(key)
+            if cached_moves is not None:
+                return cached_moves
+        start_time = time.perf_counter()
+        all_moves = state.get_next_moves()
+        moves = self.filter_moves(all_moves, state)
+        self.statistics.move_generation_seconds += time.perf_counter() - start_time
+        order = list(range(len(moves)))
+        if self.score_moves is not None and len(moves) > 1:
+            start_time = time.perf_counter()
+            scores = self.score_moves(moves, state)
+            order.sort(key=lambda i: -scores[i])
+            self.statistics.move_ordering_seconds += time.perf_counter() - start_time
+        if self.moves_cache is not None and is_cached:
+            self.moves_cache.store(key, (moves, order, len(all_moves)))
+        return moves, order, len(all_moves)
+
+    def _get_ordered_moves(self, entry: TranspositionEntry, depth: int, key: int=None):
+        """
+        get the (filtered) next moves, and the order to search them in
+        :param entry: the entry of the current state in the transposition table, or None
+        :param depth: the current depth in the game tree (for the statistics)
+        :param key: optional parameter. the hash of the current state, if it's at hand
+        :return: the next moves, and the moves with their indices, in the order to search them
+        """
+        # the moves of the frontier are the bulk of the moves, and are searched again only by the next iteration (if
+        # there's time for it), so they aren't worth the memory
+        moves, order, all_moves_count = self._get_moves(self.state, key, is_cached=depth > 1)
+        self.statistics.add_moves_counts(self.max_depth - depth, all_moves_count, len(moves))
+        indexed_moves = [(i, moves[i]) for i in order]
+        # the best move of a previous search of the position is searched first, as it's likely to be the best again
+        if entry is not None and entry.best_move_index is not None and entry.best_move_index < len(moves):
+            best_move_position = next(position for position, (i, _) in enumerate(indexed_moves)
+                                      if i == entry.best_move_index)
+            indexed_moves.insert(0, indexed_moves.pop(best_move_position))
+        return moves, indexed_moves
+
+    def _get_random_moves(self) -> List[Tuple[AbstractRandomMove, float]]:
+        """
+        :return: the random moves to expand the current random node with, with the probabilities they stand for
+        (their own, unless they're sampled by the random moves sampler)
+        """
+        start_time = time.perf_counter()
+        random_moves = self.state.get_next_random_moves()
+        if self.random_moves_sampler is None:
+            weighted_random_moves = [(random_move, random_move.probability) for random_move in random_moves]
+        else:
+            weighted_random_moves = self.random_moves_sampler.sample(random_moves, self.state.get_hash())
+        self.statistics.move_generation_seconds += time.perf_counter() - start_time
+        return weighted_random_moves
+
+    def _make_move(self, move: AbstractMove):
+        start_time = time.perf_counter()
+        if isinstance(move, AbstractRandomMove):
+            self.state.make_random_move(move)
+        else:
+            self.state.make_move(move)
+        self.statistics.make_moves_seconds += time.perf_counter() - start_time
+
+    def _unmake_move(self, move: AbstractMove):
+        start_time = time.perf_counter()
+        if isinstance(move, AbstractRandomMove):
+            self.state.unmake_random_move(move)
         else:
-            v = math.inf
-            for move in self.filter_moves(self.state.get_next_moves(), self.state):
-                self.state.make_move(move)
-                u, _ = self._alpha_beta_expectimax(depth - 1, alpha, beta, True)
-                v = min(v, u)
-                self.state.unmake_move(move)
+            self.state.unmake_move(move)
+        self.statistics.make_moves_seconds += time.perf_counter() - start_time
 
+    def _evaluate_leaf(self) -> float:
+        """
+        :return: the heuristic value of the current state, from the evaluation cache if it's there
+        """
+        key = None
+        if self.evaluation_cache is not None:
+            key = self.state.get_hash()
+            value = self.evaluation_cache.lookup(key)
+            if value is not None:
+                return value
+        start_time = time.perf_counter()
+        value = self.evaluate_heuristic_value(self.state)
+        self.statistics.heuristic_seconds += time.perf_counter() - start_time
+        if key is not None:
+            self.evaluation_cache.store(key, value)
+        return value
+
+    def _count_cutoff(self, searched_moves_count: int):
+        self.statistics.cutoffs_count += 1
+        if searched_moves_count == 1:
+            self.statistics.first_move_cutoffs_count += 1
+
+    def _count_node(self, is_maximizing: bool):
+        if is_maximizing:
+            self.statistics.max_nodes_count += 1
+        else:
+            self.statistics.min_nodes_count += 1
+
+    def _clip(self, value: float) -> float:
+        if self.heuristic_bounds is None:
+            return value
+        return min(max(value, self.heuristic_bounds[0]), self.heuristic_bounds[1])
+
+    def _search_random_moves(self, depth: int, alpha: int, beta: int) -> float:
+        """
+        the random node, pruned with the bounds of the heuristic (Star1, with Star2 probing):
+        the children that weren't searched yet are known to be within the bounds, so after each child, the value of
+        the node is known to be within a range. once the range is out of the window, the search stops, and the
+        bound is returned (as a fail-soft value). each child is searched with the window its value must be in for
+        the node's value to be in the window.
+        if probe_random_moves is set, and the children are max/min nodes, they're first probed (Star2): the first
+        move of each is searched, which gives a lower bound of a max node (an upper bound of a min node), which may
+        be enough for a cutoff, and otherwise tightens the range
+        :param depth: the current depth in the game tree
+        :param alpha: the limit from above to the best move
+        :param beta: the limit from below to the best move
+        :return: the value of the node (or a bound of it, if it's out of the window)
+        """
+        random_moves = self._get_random_moves()
+        lower_bounds = [self.heuristic_bounds[0]] * len(random_moves)
+        upper_bounds = [self.heuristic_bounds[1]] * len(random_moves)
+        if self.probe_random_moves and depth > 1:
+            bound = self._probe_random_moves(random_moves, depth, alpha, beta, lower_bounds, upper_bounds)
+            if bound is not None:
+                return bound
+
+        rest_lower, rest_upper = self._get_rest_bounds(random_moves, lower_bounds, upper_bounds)
+        v = 0
+        for i, (random_move, probability) in enumerate(random_moves):
+            child_alpha, child_beta = self._get_child_window(probability, alpha - v - rest_upper[i + 1],
+                                                             beta - v - rest_lower[i + 1])
+            self._make_move(random_move)
+            u, _ = self._alpha_beta_expectimax(depth - 1, child_alpha, child_beta, False)
+            self._unmake_move(random_move)
+            if self.ran_out_of_time:
+                break
+
+            v += probability * u
+            if v + rest_upper[i + 1] <= alpha:
+                self.statistics.chance_cutoffs_count += 1
+                return v + rest_upper[i + 1]
+            if v + rest_lower[i + 1] >= beta:
+                self.statistics.chance_cutoffs_count += 1
+                return v + rest_lower[i + 1]
+        return v
+
+    def _probe_random_moves(self, random_moves: List[Tuple[AbstractRandomMove, float]], depth: int, alpha: int,
+                            beta: int, lower_bounds: List[float], upper_bounds: List[float]):
+        """
+        probe the children of a random node (the Star2 part of _search_random_moves): search the first move of
+        each child, and tighten its bounds by the result
+        :param random_moves: the random moves of the node, with their probabilities (see _get_random_moves)
+        :param depth: the current depth in the game tree
+        :param alpha: the limit from above to the best move
+        :param beta: the limit from below to the best move
+        :param lower_bounds: the lower bounds of the children's values, updated by the probes
+        :param upper_bounds: the upper bounds of the children's values, updated by the probes
+        :return: the bound of the node's value if the probes prove it's out of the window, None otherwise
+        """
+        for i, (random_move, probability) in enumerate(random_moves):
+            rest_lower, rest_upper = self._get_rest_bounds(random_moves, lower_bounds, upper_bounds)
+            others_lower = rest_lower[0] - probability * lower_bounds[i]
+            others_upper = rest_upper[0] - probability * upper_bounds[i]
+            child_alpha, child_beta = self._get_child_window(probability, alpha - others_upper, beta - others_lower)
+
+            self._make_move(random_move)
+            u, is_maximizing = None, None
+            if not self.state.is_final():
+                is_maximizing = self._is_maximizing_player(self.state.get_current_player())
+                key, entry = None, None
+                if self.transposition_table is not None:
+                    key = self.state.get_hash()
+                    entry = self.transposition_table.lookup(key)
+                _, indexed_moves = self._get_ordered_moves(entry, depth - 1, key)
+                if indexed_moves:
+                    move = indexed_moves[0][1]
+                    self._make_move(move)
+                    u, _ = self._alpha_beta_expectimax(depth - 2, child_alpha, child_beta, True)
+                    self._unmake_move(move)
+            self._unmake_move(random_move)
+            if self.ran_out_of_time:
+                return None
+            if u is None:
+                continue
+
+            # a value that failed low (high) is an upper (lower) bound of the move, that says nothing of the node
+            if is_maximizing and u > child_alpha:
+                lower_bounds[i] = u
+                bound = others_lower + probability * u
+                if bound >= beta:
+                    self.statistics.chance_cutoffs_count += 1
+                    return bound
+            elif not is_maximizing and u < child_beta:
+                upper_bounds[i] = u
+                bound = others_upper + probability * u
+                if bound <= alpha:
+                    self.statistics.chance_cutoffs_count += 1
+                    return bound
+        return None
+
+    @staticmethod
+    def _get_rest_bounds(random_moves: List[Tuple[AbstractRandomMove, float]], lower_bounds: List[float],
+                         upper_bounds: List[float]) -> Tuple[List[float], List[float]]:
+        """
+        :return: the sums of the children's lower bounds, and of their upper bounds, weighted by their
+        probabilities, from each child to the last (and an extra 0 for none)
+        """
+        rest_lower, rest_upper = [0] * (len(random_moves) + 1), [0] * (len(random_moves) + 1)
+        for i in range(len(random_moves) - 1, -1, -1):
+            probability = random_moves[i][1]
+            rest_lower[i] = rest_lower[i + 1] + probability * lower_bounds[i]
+            rest_upper[i] = rest_upper[i + 1] + probability * upper_bounds[i]
+        return rest_lower, rest_upper
+
+    def _get_child_window(self, probability: float, alpha_margin: float, beta_margin: float) -> Tuple[float, float]:
+        """
+        :return: the window of a child of a random node, given what's left of the node's window for it
+        (i.e alpha minus the contributions of the other children), clipped by the heuristic's bounds
+        """
+        return (max(self.heuristic_bounds[0], alpha_margin / probability),
+                min(self.heuristic_bounds[1], beta_margin / probability))
+
+    def _search_moves(self, indexed_moves: List[Tuple[int, AbstractMove]], depth: int, alpha: int, beta: int,
+                      values: Dict[int, float]=None):
+        """
+        the max/min node: search the state after each of the moves.
+        if the time runs out, the moves that were searched to the end so far are the ones taken into account
+        :param indexed_moves: the moves to search, in the order they're searched, with their indices among the next
+        moves
+        :param depth: the current depth in the game tree
+        :param alpha: the limit from above to the best move
+        :param beta: the limit from below to the best move
+        :param values: optional parameter. if given, the value of each move that was searched is put in it, by the
+        move's index
+        :return: the value of the node, and the index of its best move (None if there are no moves)
+        """
+        best_move_index = None
+        is_maximizing = self._is_maximizing_player(self.state.get_current_player())
+        self._count_node(is_maximizing)
+        v = -math.inf if is_maximizing else math.inf
+        # at the root of a worker that shares alpha with the others, the moves are searched with the best value
+        # found by any of them, and only the moves that beat it count as best (the others' values are bounds)
+        shared_alpha = self.shared_alpha if values is not None and is_maximizing else None
+        for searched_moves_count, (i, move) in enumerate(indexed_moves, 1):
+            if shared_alpha is not None:
+                alpha = max(alpha, shared_alpha.get())
+            self._make_move(move)
+            u, _ = self._alpha_beta_expectimax(depth - 1, alpha, beta, True)
+            self._unmake_move(move)
+            if self.ran_out_of_time:
+                break
+            if values is not None:
+                values[i] = u
+            if shared_alpha is not None:
+                if u > alpha:
+                    shared_alpha.raise_to(u)
+                    v = u
+                    best_move_index = i
+                alpha = max(u, alpha)
+                continue
+
+            if is_maximizing:
+                if u > v:
+                    v = u
+                    best_move_index = i
+                alpha = max(v, alpha)
+            else:
+                if u < v:
+                    v = u
+                    best_move_index = i
                 beta = min(v, beta)
+            if beta <= alpha:
+                self._count_cutoff(searched_moves_count)
+                break
+        return v, best_move_index
+
+    def _evaluate_frontier(self, indexed_moves: List[Tuple[int, AbstractMove]], alpha: int, beta: int,
+                           values: Dict[int, float]=None):
+        """
+        the max/min node at depth 1, with its children (the leaves) evaluated in bulk by evaluate_heuristic_values.
+        the values are scanned as the children are in _search_moves, cutoffs included, so the value and the
+        move are the same as if the children were evaluated one by one. since cutoffs tend to happen at the first
+        children, the batches start with a single child, and double (up to max_frontier_batch_size), so a cutoff
+        wastes fewer evaluations than were needed to reach it
+        :param indexed_moves: the moves to evaluate the states after, as in _search_moves
+        :param alpha: the limit from above to the best move
+        :param beta: the limit from below to the best move
+        :param values: optional parameter. as in _search_moves
+        :return: the value of the node, and the index of its best move (None if there are no moves)
+        """
+        is_maximizing = self._is_maximizing_player(self.state.get_current_player())
+        self._count_node(is_maximizing)
+        v = -math.inf if is_maximizing else math.inf
+        best_move_index = None
+        first, batch_size = 0, 1
+        searched_moves_count = 0
+        while first < len(indexed_moves):
+            batch = indexed_moves[first:first + batch_size]
+            first += batch_size
+            batch_size = min(2 * batch_size, self.max_frontier_batch_size)
+            start_time = time.perf_counter()
+            batch_values = self.evaluate_heuristic_values(self.state, [move for _, move in batch])
+            self.statistics.heuristic_seconds += time.perf_counter() - start_time
+            self.statistics.leaves_count += len(batch)
+
+            for (i, _), u in zip(batch, batch_values):
+                searched_moves_count += 1
+                u = self._clip(u)
+                if values is not None:
+                    values[i] = u
+                if is_maximizing:
+                    if u > v:
+                        v = u
+                        best_move_index = i
+                    alpha = max(v, alpha)
+                else:
+                    if u < v:
+                        v = u
+                        best_move_index = i
+                    beta = min(v, beta)
                 if beta <= alpha:
-                    break
-            return v, None
+                    self._count_cutoff(searched_moves_count)
+                    return v, best_move_index
+            # the evaluations are complete, so the batch counts even if the time ran out
+            if self.check_time():
+                break
+        return v, best_move_index
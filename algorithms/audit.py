@@ -0,0 +1,68 @@
+import enum
+import os
+
+
+@enum.unique
+class AuditLevel(enum.Enum):
+    """
+    how often the expensive invariant checks (audits) are run
+    """
+    Off = 'off'
+    Sampled = 'sampled'
+    Full = 'full'
+
+
+class Audit:
+    """
+    decides when the expensive invariant checks are run, e.g the scan of all the locations in Board.set_location.
+    unlike the cheap asserts, they aren't tied to __debug__, but configured by the environment variables
+    CATAN_AUDIT (off/sampled/full, sampled by default) and CATAN_AUDIT_PERIOD (with 'sampled', every how many
+    audited mutations a check runs), or by set_level (i.e the tests audit fully)
+    """
+    default_level = AuditLevel.Sampled
+    default_sampling_period = 1000
+
+    def __init__(self, level: AuditLevel=default_level, sampling_period: int=default_sampling_period):
+        self.level = None
+        self.sampling_period = None
+        self._mutations_count = 0
+        self.set_level(level, sampling_period)
+
+    @staticmethod
+    def from_environment():
+        """
+        create an audit configured by the environment variables CATAN_AUDIT and CATAN_AUDIT_PERIOD
+        :return: Audit, configured by the environment (or the default configuration, if not set)
+        """
+        level = AuditLevel(os.environ.get('CATAN_AUDIT', Audit.default_level.value).lower())
+        sampling_period = int(os.environ.get('CATAN_AUDIT_PERIOD', Audit.default_sampling_period))
+        return Audit(level, sampling_period)
+
+    def set_level(self, level: AuditLevel, sampling_period: int=None):
+        """
+        set how often the checks are run
+        :param level: the audit level
+        :param sampling_period: with AuditLevel.Sampled, a check is run every sampling_period audited mutations.
+        if None, the current period is kept
+        :return: None
+        """
+        assert sampling_period is None or sampling_period > 0
+        self.level = level
+        if sampling_period is not None:
+            self.sampling_period = sampling_period
+        self._mutations_count = 0
+
+    def is_due(self) -> bool:
+        """
+        count an audited mutation, and indicate whether its check should be run
+        :return: True if the check should be run now, False otherwise
+        """
+        if self.level is AuditLevel.Off:
+            return False
+        if self.level is AuditLevel.Full:
+            return True
+        self._mutations_count += 1
+        return self._mutations_count % self.sampling_period == 0
+
+
+audit = Audit.from_environment()
@@ -0,0 +1,12 @@
+from algorithms.lru_cache import LruCache
+
+
+class EvaluationCache(LruCache):
+    """
+    a bounded cache of the heuristic values of positions, by their keys (i.e CatanState.get_hash), so positions
+    that are reached again (in later iterations of the iterative deepening, or by other orders of the same moves)
+    aren't evaluated again. once full, the least recently used value is dropped for a new one.
+    NOTE: the values depend on the heuristic and on the player evaluating, so each player should have its own cache,
+    and clear it when the heuristic changes
+    """
+    default_capacity = 2 ** 16
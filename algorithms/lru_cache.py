@@ -0,0 +1,64 @@
+from collections import OrderedDict
+from typing import Any
+
+
+class LruCache:
+    """
+    a bounded map of the positions a search already computed something for (see EvaluationCache and MovesCache), by
+    their keys (i.e CatanState.get_hash). once full, the least recently used value is dropped for a new one
+    """
+    default_capacity = 2 ** 16
+
+    def __init__(self, capacity: int=None):
+        """
+        :param capacity: optional parameter. the maximal number of values, default_capacity if None
+        """
+        capacity = capacity if capacity is not None else self.default_capacity
+        assert capacity > 0
+        self._capacity = capacity
+        self._values = OrderedDict()
+        self.probes_count = 0
+        self.hits_count = 0
+
+    def clear(self):
+        """
+        remove all the values, and reset the statistics
+        :return: None
+        """
+        self._values.clear()
+        self.probes_count = 0
+        self.hits_count = 0
+
+    def lookup(self, key: int) -> Any:
+        """
+        get the value of a position
+        :param key: the key of the position
+        :return: the value of the position, or None if it isn't cached
+        """
+        self.probes_count += 1
+        value = self._values.get(key)
+        if value is not None:
+            self.hits_count += 1
+            self._values.move_to_end(key)
+        return value
+
+    def store(self, key: int, value: Any):
+        """
+        cache the value of a position, dropping the least recently used value if the cache is full
+        :param key: the key of the position
+        :param value: the value of the position
+        :return: None
+        """
+        self._values[key] = value
+        self._values.move_to_end(key)
+        if len(self._values) > self._capacity:
+            self._values.popitem(last=False)
+
+    def get_hit_rate(self) -> float:
+        """
+        :return: the fraction of the lookups that found their position, 0 if there were none
+        """
+        return self.hits_count / self.probes_count if self.probes_count else 0.0
+
+    def __len__(self):
+        return len(self._values)
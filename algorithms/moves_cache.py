@@ -0,0 +1,13 @@
+from algorithms.lru_cache import LruCache
+
+
+class MovesCache(LruCache):
+    """
+    a bounded cache of the (filtered and ordered) next moves of positions, by their keys (i.e
+    CatanState.get_hash), so the positions an iteration of the iterative deepening searches again (those the
+    previous iteration searched, and more) don't generate and filter their moves again.
+    the moves take much more memory than values, so the default capacity is smaller than that of the other caches.
+    NOTE: the moves depend on the filter (and the scorer), so the cache should be cleared when they change. the
+    moves are made and unmade over and over, so they should be left as they were after they're unmade
+    """
+    default_capacity = 2 ** 10
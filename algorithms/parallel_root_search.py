@@ -0,0 +1,237 @@
+import math
+import multiprocessing
+import time
+from typing import Callable, Dict, Tuple
+
+from algorithms.abstract_state import AbstractState
+from algorithms.alpha_beta_pruning_expectimax import AlphaBetaExpectimax
+from algorithms.search_statistics import SearchStatistics
+
+# the algorithm and the restoring of the states of the ParallelRootSearch whose pool is being forked, for the workers
+# to inherit (the algorithms aren't picklable, i.e they hold lambdas)
+_forked_context = None
+# the context the worker processes inherited
+_worker_context = None
+
+
+class SharedAlpha:
+    """
+    the best value of the root's moves found so far by the workers of a search (see ParallelRootSearch), in memory
+    shared between the processes. the value is tagged by the search it belongs to, so a worker that is still
+    busy with a previous search doesn't spoil the current one
+    """
+
+    def __init__(self, shared_values, search_id: int):
+        """
+        :param shared_values: multiprocessing.Array of two doubles: the id of the current search, and the value
+        :param search_id: the id of the search the values are read and written for
+        """
+        self._shared_values = shared_values
+        self._search_id = search_id
+
+    def get(self) -> float:
+        """
+        :return: the best value found so far in the search, -inf if none or if it's no longer the current search
+        """
+        with self._shared_values.get_lock():
+            search_id, value = self._shared_values[:]
+        return value if search_id == self._search_id else -math.inf
+
+    def raise_to(self, value: float):
+        """
+        update the best value found in the search, if given value is better
+        :param value: the value of a root's move that was searched
+        :return: None
+        """
+        with self._shared_values.get_lock():
+            if self._shared_values[0] == self._search_id and value > self._shared_values[1]:
+                self._shared_values[1] = value
+
+
+class ParallelRootSearch:
+    """
+    an iteration of the iterative deepening of AlphaBetaExpectimax, with the root's moves split between processes.
+    the processes are forked once (when the search is started), each with a copy of the algorithm (with its
+    heuristic, filter and transposition table), and are kept for all the turns. each search ships the workers a
+    snapshot of the state (see AbstractState.to_bytes) and the deadline of the turn, and merges their values of the
+    root's moves.
+    NOTE: the workers are forked with the algorithm and the players as they are at that time, so if the heuristic
+    or the filter changes, the search should be restarted (see close). the search can't be used from processes that
+    are workers of a multiprocessing.Pool themselves
+    """
+    # the time to wait for the workers after the deadline, for them to unwind their searches
+    results_grace_seconds = 0.5
+
+    def __init__(self, algorithm: AlphaBetaExpectimax, processes_count: int, share_alpha: bool=True):
+        """
+        :param algorithm: the algorithm to search with. its timer is the turn's timer
+        :param processes_count: the number of worker processes
+        :param share_alpha: whether the workers search their moves with the best value found by any of them so far
+        (see SharedAlpha), or each with its own
+        """
+        assert processes_count > 0
+        self.algorithm = algorithm
+        self.processes_count = processes_count
+        self.share_alpha = share_alpha
+        self._pool = None
+        self._shared_values = None
+        self._search_id = 0
+        self._turn_id = 0
+        # incremented whenever the cached evaluations are cleared (see clear_evaluations)
+        self._evaluations_id = 0
+
+    def __deepcopy__(self, memo):
+        # the processes aren't copied, the copy starts its own if used
+        search = ParallelRootSearch(self.algorithm, self.processes_count, self.share_alpha)
+        memo[id(self)] = search
+        return search
+
+    def is_started(self) -> bool:
+        return self._pool is not None
+
+    def start(self, restore_state: Callable[[bytes], AbstractState]):
+        """
+        fork the worker processes
+        :param restore_state: a function that restores a state from a snapshot, in the workers. i.e
+        lambda data: CatanState.from_bytes(data, players)
+        :return: None
+        """
+        global _forked_context
+        assert self._pool is None
+        self._shared_values = multiprocessing.Array('d', [0, -math.inf])
+        _forked_context = (self.algorithm, restore_state, self._shared_values)
+        try:
+            self._pool = multiprocessing.get_context('fork').Pool(self.processes_count, _initialize_worker)
+        finally:
+            _forked_context = None
+
+    def close(self):
+        """
+        stop the worker processes (i.e when the game ends, or the heuristic changes). the searches they're busy with
+        are under the deadline of their turn, so they're waited for
+        :return: None
+        """
+        if self._pool is not None:
+            # terminate may deadlock while tasks are being handed to the workers
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def start_turn_timer(self):
+        """
+        start the timer of the turn (see AlphaBetaExpectimax.start_turn_timer). the workers forget the positions
+        of the previous turns
+        :return: None
+        """
+        self.algorithm.start_turn_timer()
+        self._turn_id += 1
+
+    def clear_evaluations(self):
+        """
+        clear the evaluation cache of the algorithm, and have the workers clear theirs before their next search
+        (i.e when the heuristic values of the cached positions are no longer valid, as in a game on another board)
+        :return: None
+        """
+        if self.algorithm.evaluation_cache is not None:
+            self.algorithm.evaluation_cache.clear()
+        self._evaluations_id += 1
+
+    def get_best_move(self, state: AbstractState, max_depth: int):
+        """
+        an iteration of the iterative deepening, as AlphaBetaExpectimax.get_best_move, with the root's moves split
+        between the workers: the moves are dealt to them in the order of their values in the previous iteration,
+        so each worker searches its most promising moves first.
+        if the time runs out, the values of the moves the workers searched to the end are merged, and the best move
+        is returned as in AlphaBetaExpectimax.get_best_move
+        :param state: the state to search from
+        :param max_depth: the maximum depth the algorithm will reach in the game tree
+        :return: the best move, or None if the time ran out before a move better than the previous one was found
+        """
+        assert self._pool is not None
+        algorithm = self.algorithm
+        moves = algorithm.get_next_moves(state)
+        if not moves:
+            return None
+        indices = list(range(len(moves)))
+        last_root_values = algorithm.last_root_values
+        if last_root_values:
+            indices.sort(key=lambda i: -last_root_values.get(i, -math.inf))
+
+        start_time = time.perf_counter()
+        self._search_id += 1
+        if self.share_alpha:
+            with self._shared_values.get_lock():
+                self._shared_values[:] = [self._search_id, -math.inf]
+        data, deadline = state.to_bytes(), algorithm.deadline
+        tasks = [(data, indices[first::self.processes_count], max_depth, deadline, last_root_values,
+                  algorithm.heuristic_bounds, self._turn_id, self._evaluations_id,
+                  self._search_id if self.share_alpha else None)
+                 for first in range(min(self.processes_count, len(moves)))]
+        results = [self._pool.apply_async(_search_root_moves, (task,)) for task in tasks]
+        for result in results:
+            result.wait(deadline.get_remaining_seconds() + ParallelRootSearch.results_grace_seconds)
+
+        root_values, best = {}, None
+        is_complete = not algorithm.check_time(read_clock=True)
+        for result in results:
+            if not result.ready():
+                is_complete = False
+                continue
+            values, best_index, ran_out_of_time, statistics = result.get()
+            algorithm.statistics.add(statistics)
+            root_values.update(values)
+            is_complete = is_complete and not ran_out_of_time
+            # among equal values, the move searched first in the order
+            if best_index is not None and (best is None or (values[best_index], -indices.index(best_index)) >
+                                           (root_values[best], -indices.index(best))):
+                best = best_index
+
+        algorithm.statistics.add_iteration(max_depth, time.perf_counter() - start_time, is_complete)
+        if is_complete:
+            algorithm.last_root_values = root_values
+        elif last_root_values and AlphaBetaExpectimax._get_best_index(last_root_values) not in root_values:
+            return None
+        return moves[best] if best is not None else None
+
+
+def _initialize_worker():
+    global _worker_context
+    algorithm, restore_state, shared_values = _forked_context
+    # the transposition table and the moves cache of the worker, and the turn they're for. the evaluation cache,
+    # and the clearing of the evaluations it's for (the worker inherited the parent's cache, which may be stale)
+    _worker_context = [algorithm, restore_state, shared_values, None, None]
+
+
+def _search_root_moves(task: Tuple) -> Tuple[Dict[int, float], int, bool, SearchStatistics]:
+    """
+    search some of the root's moves, in a worker of ParallelRootSearch
+    :param task: the snapshot of the state, the indices of the root's moves to search,
+    the maximum depth, the deadline, the values of the root's moves in the previous iteration, the bounds of the
+    heuristic (that may change between turns), the id of the turn, the id of the last clearing of the evaluations,
+    and the id of the search (None if alpha isn't shared)
+    :return: the values of the moves that were searched, by their indices, the index of the best of them (None if
+    none beat the shared alpha), whether the time ran out, and the statistics of the search
+    """
+    data, indices, max_depth, deadline, last_root_values, heuristic_bounds, turn_id, evaluations_id, search_id = task
+    algorithm, restore_state, shared_values, last_turn_id, last_evaluations_id = _worker_context
+    if turn_id != last_turn_id:
+        _worker_context[3] = turn_id
+        if algorithm.transposition_table is not None:
+            algorithm.transposition_table.clear()
+        if algorithm.moves_cache is not None:
+            algorithm.moves_cache.clear()
+    if evaluations_id != last_evaluations_id:
+        _worker_context[4] = evaluations_id
+        if algorithm.evaluation_cache is not None:
+            algorithm.evaluation_cache.clear()
+
+    state = restore_state(data)
+    algorithm.start_turn_timer(deadline)
+    algorithm.last_root_values = last_root_values
+    algorithm.heuristic_bounds = heuristic_bounds
+    algorithm.root_moves_indices = set(indices)
+    algorithm.shared_alpha = SharedAlpha(shared_values, search_id) if search_id is not None else None
+    algorithm.get_best_move(state, max_depth)
+    # the iteration is recorded by the parent, once for all the workers
+    algorithm.statistics.iterations = []
+    return algorithm._root_values, algorithm._root_best_index, algorithm.ran_out_of_time, algorithm.statistics
@@ -0,0 +1,59 @@
+import bisect
+import hashlib
+import itertools
+import random
+from typing import List, Tuple
+
+from algorithms.abstract_state import AbstractRandomMove
+
+
+class RandomMovesSampler:
+    """
+    sparse sampling of the random moves of a random node: the most probable moves are expanded exactly, and the
+    others are estimated by stratified samples. the probabilities of the others are laid one after the other along
+    [0, P) (P being their total), that is cut into samples_count equal strata, and a move is drawn from each (the
+    move whose range a random point of the stratum falls in). each drawn move stands for P / samples_count of the
+    probability, so the estimate of the node's value is unbiased, and the strata spread the samples over the moves
+    by their probabilities.
+    the samples of a node are drawn by a random generator seeded by the seed and the key of the node, so a node is
+    sampled the same way in all the iterations of the iterative deepening, in the workers of a parallel search, and
+    in other runs
+    """
+
+    def __init__(self, exact_moves_count: int, samples_count: int, seed: int=0):
+        """
+        :param exact_moves_count: the number of the most probable moves that are expanded exactly
+        :param samples_count: the number of samples of the other moves
+        :param seed: the seed of the samples
+        """
+        assert exact_moves_count >= 0 and samples_count > 0
+        self.exact_moves_count = exact_moves_count
+        self.samples_count = samples_count
+        self.seed = seed
+
+    def sample(self, random_moves: List[AbstractRandomMove], key: int) -> List[Tuple[AbstractRandomMove, float]]:
+        """
+        get the random moves to expand a random node with, and the probabilities they stand for
+        :param random_moves: the random moves of the node
+        :param key: the key of the node (i.e CatanState.get_hash)
+        :return: the moves to expand, with their probabilities (that sum to the total probability of the moves).
+        all the moves with their own probabilities, if they're no more than the moves and the samples
+        """
+        if len(random_moves) <= self.exact_moves_count + self.samples_count:
+            return [(random_move, random_move.probability) for random_move in random_moves]
+        ordered_moves = sorted(random_moves, key=lambda random_move: -random_move.probability)
+        exact_moves, other_moves = ordered_moves[:self.exact_moves_count], ordered_moves[self.exact_moves_count:]
+        cumulative_probabilities = list(itertools.accumulate(random_move.probability for random_move in other_moves))
+        others_probability = cumulative_probabilities[-1]
+
+        # seeded by a digest rather than by hash, that is salted per interpreter
+        digest = hashlib.blake2b('{}:{}'.format(self.seed, key).encode(), digest_size=8).digest()
+        generator = random.Random(int.from_bytes(digest, 'little'))
+        probabilities_by_indices = {}
+        for stratum in range(self.samples_count):
+            point = (stratum + generator.random()) * others_probability / self.samples_count
+            i = min(bisect.bisect_right(cumulative_probabilities, point), len(other_moves) - 1)
+            probabilities_by_indices[i] = (probabilities_by_indices.get(i, 0) +
+                                           others_probability / self.samples_count)
+        return ([(random_move, random_move.probability) for random_move in exact_moves] +
+                [(other_moves[i], probability) for i, probability in sorted(probabilities_by_indices.items())])
@@ -0,0 +1,97 @@
+from typing import Dict, Tuple
+
+
+class SearchStatistics:
+    """
+    the statistics of the searches of a turn (see AlphaBetaExpectimax.statistics): what the search visited, where
+    it cut off, how deep it got, and where its time went. the statistics of several turns (or of the workers of a
+    parallel search) can be summed with add, i.e to aggregate them over a tournament
+    """
+
+    def __init__(self):
+        self.max_nodes_count = 0
+        self.min_nodes_count = 0
+        self.chance_nodes_count = 0
+        self.leaves_count = 0
+        # the max/min nodes that were cut off after some of their moves, and the chance nodes cut off after some
+        # of their random moves (see AlphaBetaExpectimax._search_random_moves)
+        self.cutoffs_count = 0
+        # the max/min nodes that were cut off after their first move, the measure of the order of the moves
+        self.first_move_cutoffs_count = 0
+        self.chance_cutoffs_count = 0
+        # the max/min nodes whose values were taken from the transposition table
+        self.transposition_cutoffs_count = 0
+        # the iterations of the iterative deepening: their depth, seconds, and whether they were completed
+        self.iterations = []
+        # by the ply (the distance from the root), the number of max/min nodes that generated their moves, and
+        # the sums of their moves counts before and after filter_moves
+        self.moves_counts_by_ply = {}
+        self.move_generation_seconds = 0.0
+        self.make_moves_seconds = 0.0
+        self.heuristic_seconds = 0.0
+        self.move_ordering_seconds = 0.0
+
+    def add_moves_counts(self, ply: int, moves_count: int, filtered_moves_count: int, nodes_count: int=1):
+        counts = self.moves_counts_by_ply.setdefault(ply, [0, 0, 0])
+        counts[0] += nodes_count
+        counts[1] += moves_count
+        counts[2] += filtered_moves_count
+
+    def add_iteration(self, depth: int, seconds: float, is_completed: bool):
+        self.iterations.append((depth, seconds, is_completed))
+
+    def get_completed_depth(self) -> int:
+        """
+        :return: the deepest iteration that was completed, 0 if none
+        """
+        return max((depth for depth, _, is_completed in self.iterations if is_completed), default=0)
+
+    def get_nodes_count(self) -> int:
+        return self.max_nodes_count + self.min_nodes_count + self.chance_nodes_count + self.leaves_count
+
+    def get_cutoff_rate(self) -> float:
+        """
+        :return: the fraction of the searched max/min nodes that were cut off, 0 if there were none
+        """
+        searched_nodes_count = self.max_nodes_count + self.min_nodes_count
+        return self.cutoffs_count / searched_nodes_count if searched_nodes_count else 0.0
+
+    def get_first_move_cutoff_rate(self) -> float:
+        """
+        :return: the fraction of the cutoffs that were after the first move, 0 if there were none
+        """
+        return self.first_move_cutoffs_count / self.cutoffs_count if self.cutoffs_count else 0.0
+
+    def get_branching_factors(self) -> Dict[int, Tuple[float, float]]:
+        """
+        :return: Dict[int, Tuple[float, float]], by the ply, the average number of moves of the max/min nodes
+        before and after filter_moves
+        """
+        return {ply: (moves_count / nodes_count, filtered_moves_count / nodes_count)
+                for ply, (nodes_count, moves_count, filtered_moves_count) in sorted(self.moves_counts_by_ply.items())}
+
+    def add(self, other: 'SearchStatistics'):
+        """
+        add the statistics of other searches to these
+        :param other: the statistics to add
+        :return: None
+        """
+        for name in ('max_nodes_count', 'min_nodes_count', 'chance_nodes_count', 'leaves_count', 'cutoffs_count',
+                     'first_move_cutoffs_count', 'chance_cutoffs_count', 'transposition_cutoffs_count',
+                     'move_generation_seconds', 'make_moves_seconds', 'heuristic_seconds', 'move_ordering_seconds'):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.iterations.extend(other.iterations)
+        for ply, (nodes_count, moves_count, filtered_moves_count) in other.moves_counts_by_ply.items():
+            self.add_moves_counts(ply, moves_count, filtered_moves_count, nodes_count)
+
+    def __str__(self):
+        branching_factors = ', '.join('{}: {:.1f}/{:.1f}'.format(ply, before, after)
+                                      for ply, (before, after) in self.get_branching_factors().items())
+        return ('depth {}, nodes {} (max {}, min {}, chance {}, leaves {}), cutoffs {} (rate {:.2f}, first move '
+                '{:.2f}, chance {}, table {}), branching by ply (before/after filter) {{{}}}, seconds: move '
+                'generation {:.2f}, ordering {:.2f}, make/unmake {:.2f}, heuristic {:.2f}').format(
+            self.get_completed_depth(), self.get_nodes_count(), self.max_nodes_count, self.min_nodes_count,
+            self.chance_nodes_count, self.leaves_count, self.cutoffs_count, self.get_cutoff_rate(),
+            self.get_first_move_cutoff_rate(), self.chance_cutoffs_count, self.transposition_cutoffs_count,
+            branching_factors, self.move_generation_seconds, self.move_ordering_seconds, self.make_moves_seconds,
+            self.heuristic_seconds)
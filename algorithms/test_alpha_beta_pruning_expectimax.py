@@ -0,0 +1,322 @@
+import math
+from typing import List
+from unittest import TestCase
+
+from algorithms.abstract_state import AbstractState, AbstractMove, AbstractRandomMove
+from algorithms.alpha_beta_pruning_expectimax import AlphaBetaExpectimax
+from algorithms.evaluation_cache import EvaluationCache
+from algorithms.moves_cache import MovesCache
+from algorithms.random_moves_sampler import RandomMovesSampler
+from algorithms.transposition_table import TranspositionTable
+
+
+class FakeMove(AbstractMove):
+    def __init__(self, value: int):
+        self.value = value
+
+
+class FakeRandomMove(AbstractRandomMove):
+    def __init__(self, value: int, probability: float):
+        self.value = value
+        self._probability = probability
+
+    @property
+    def probability(self):
+        return self._probability
+
+
+class FakeState(AbstractState):
+    """
+    a game of two players, that take turns picking one of moves_count numbers, each turn followed by a throw of a
+    biased coin. the history of the picks and throws is the state
+    """
+    moves_count = 5
+
+    def __init__(self):
+        self.history = []
+
+    def is_final(self):
+        return len(self.history) >= 12
+
+    def get_next_moves(self):
+        return [FakeMove(value) for value in range(FakeState.moves_count)]
+
+    def make_move(self, move: FakeMove):
+        self.history.append(move.value)
+
+    def unmake_move(self, move: FakeMove):
+        self.history.pop()
+
+    def get_current_player(self):
+        return (len(self.history) // 2) % 2
+
+    def get_next_random_moves(self) -> List[FakeRandomMove]:
+        return [FakeRandomMove(0, 0.3), FakeRandomMove(1, 0.7)]
+
+    def make_random_move(self, move: FakeRandomMove):
+        self.history.append(move.value)
+
+    def unmake_random_move(self, move: FakeRandomMove):
+        self.history.pop()
+
+    def get_hash(self) -> int:
+        return hash(tuple(self.history))
+
+    def to_bytes(self) -> bytes:
+        return bytes(self.history)
+
+    @staticmethod
+    def from_bytes(data: bytes):
+        state = FakeState()
+        state.history = list(data)
+        return state
+
+    def evaluate(self) -> float:
+        return sum(math.sin(3.7 * (i + 1) * (value + 1)) for i, value in enumerate(self.history))
+
+
+class TestAlphaBetaExpectimax(TestCase):
+    def setUp(self):
+        self.state = FakeState()
+        self.evaluations_count = 0
+        self.evaluations_limit = None
+        self.algorithm = AlphaBetaExpectimax(lambda player: player == 0, self.evaluate_heuristic_value)
+
+    def evaluate_heuristic_value(self, state: FakeState):
+        self.evaluations_count += 1
+        if self.evaluations_count == self.evaluations_limit:
+            self.algorithm.ran_out_of_time = True
+        return state.evaluate()
+
+    def evaluate_heuristic_values(self, state: FakeState, moves: List[FakeMove]):
+        values = []
+        for move in moves:
+            state.make_move(move)
+            values.append(self.evaluate_heuristic_value(state))
+            state.unmake_move(move)
+        return values
+
+    def get_best_move_and_value(self, depth: int, batched: bool, transposition_table: TranspositionTable=None,
+                                heuristic_bounds=None, probe_random_moves=False,
+                                evaluation_cache: EvaluationCache=None):
+        algorithm = AlphaBetaExpectimax(lambda player: player == 0, self.evaluate_heuristic_value,
+                                        evaluate_heuristic_values=self.evaluate_heuristic_values if batched else None,
+                                        transposition_table=transposition_table, heuristic_bounds=heuristic_bounds,
+                                        probe_random_moves=probe_random_moves, evaluation_cache=evaluation_cache)
+        algorithm.state = self.state
+        algorithm.max_depth = depth
+        value, move = algorithm._alpha_beta_expectimax(depth, -math.inf, math.inf, False)
+        return move.value, value
+
+    def test_batched_frontier_evaluation_is_the_same_as_one_by_one(self):
+        for depth in (1, 3, 5):
+            self.evaluations_count = 0
+            expected = self.get_best_move_and_value(depth, batched=False)
+            one_by_one_evaluations_count = self.evaluations_count
+
+            self.evaluations_count = 0
+            self.assertEqual(self.get_best_move_and_value(depth, batched=True), expected)
+            self.assertGreaterEqual(self.evaluations_count, one_by_one_evaluations_count)
+            self.assertListEqual(self.state.history, [])
+
+    def test_batched_frontier_evaluation_skips_batches_after_cutoff(self):
+        self.get_best_move_and_value(5, batched=True)
+        all_leaves_count = (FakeState.moves_count * 2) ** 3
+        self.assertLess(self.evaluations_count, all_leaves_count)
+
+    def test_search_with_transposition_table_is_the_same_as_without(self):
+        for batched in (False, True):
+            transposition_table = TranspositionTable()
+            for depth in (1, 3, 5):
+                self.assertEqual(self.get_best_move_and_value(depth, batched, transposition_table),
+                                 self.get_best_move_and_value(depth, batched))
+                self.assertListEqual(self.state.history, [])
+            self.assertGreater(transposition_table.hits_count, 0)
+
+    def test_repeated_search_with_transposition_table_evaluates_only_the_root_children(self):
+        transposition_table = TranspositionTable()
+        expected = self.get_best_move_and_value(5, False, transposition_table)
+
+        self.evaluations_count = 0
+        self.assertEqual(self.get_best_move_and_value(5, False, transposition_table), expected)
+        self.assertEqual(self.evaluations_count, 0)
+
+    def test_search_with_evaluation_cache_is_the_same_as_without(self):
+        evaluation_cache = EvaluationCache()
+        for batched in (False, True):
+            for depth in (1, 3, 5):
+                self.evaluations_count = 0
+                expected = self.get_best_move_and_value(depth, batched)
+                evaluations_count = self.evaluations_count
+
+                self.evaluations_count = 0
+                self.assertEqual(self.get_best_move_and_value(depth, batched, evaluation_cache=evaluation_cache),
+                                 expected)
+                self.assertLessEqual(self.evaluations_count, evaluations_count)
+                self.assertListEqual(self.state.history, [])
+
+    def test_repeated_search_with_evaluation_cache_evaluates_nothing(self):
+        evaluation_cache = EvaluationCache()
+        expected = self.get_best_move_and_value(3, False, evaluation_cache=evaluation_cache)
+
+        self.evaluations_count = 0
+        self.assertEqual(self.get_best_move_and_value(3, False, evaluation_cache=evaluation_cache), expected)
+        self.assertEqual(self.evaluations_count, 0)
+
+    def get_expectimax_value(self, depth: int, is_random_event: bool=False) -> float:
+        if depth == 0 or self.state.is_final():
+            return self.state.evaluate()
+        if is_random_event:
+            v = 0
+            for random_move in self.state.get_next_random_moves():
+                self.state.make_random_move(random_move)
+                v += random_move.probability * self.get_expectimax_value(depth - 1)
+                self.state.unmake_random_move(random_move)
+            return v
+        values = []
+        for move in self.state.get_next_moves():
+            self.state.make_move(move)
+            values.append(self.get_expectimax_value(depth - 1, True))
+            self.state.unmake_move(move)
+        return max(values) if self.state.get_current_player() == 0 else min(values)
+
+    def test_search_with_heuristic_bounds_finds_the_expectimax_value(self):
+        # each of the 12 terms of FakeState.evaluate is in [-1, 1]
+        heuristic_bounds = (-12, 12)
+        for batched, probe_random_moves in ((False, False), (True, False), (False, True), (True, True)):
+            for transposition_table in (None, TranspositionTable()):
+                for depth in (1, 3, 5, 7):
+                    move, value = self.get_best_move_and_value(depth, batched, transposition_table, heuristic_bounds,
+                                                               probe_random_moves)
+                    self.assertAlmostEqual(value, self.get_expectimax_value(depth))
+                    self.state.make_move(FakeMove(move))
+                    self.assertAlmostEqual(self.get_expectimax_value(depth - 1, True), value)
+                    self.state.unmake_move(FakeMove(move))
+                    self.assertListEqual(self.state.history, [])
+
+    def test_probing_random_moves_prunes_random_nodes(self):
+        self.get_best_move_and_value(5, False, heuristic_bounds=(-12, 12))
+        evaluations_count = self.evaluations_count
+        self.evaluations_count = 0
+        self.get_best_move_and_value(5, False, heuristic_bounds=(-12, 12), probe_random_moves=True)
+        self.assertLess(self.evaluations_count, evaluations_count)
+
+    def test_interrupted_search_returns_best_move_so_far(self):
+        self.evaluations_limit = 100
+        move = self.algorithm.get_best_move(self.state, 5)
+        self.assertTrue(self.algorithm.ran_out_of_time)
+        self.assertIsNotNone(move)
+        self.assertIn(move.value, self.algorithm._root_values)
+        self.assertListEqual(self.state.history, [])
+
+    def test_interrupted_iteration_returns_move_only_if_previous_best_move_was_searched(self):
+        previous_move = self.algorithm.get_best_move(self.state, 3)
+        previous_values = self.algorithm.last_root_values
+        self.evaluations_count = 0
+        self.evaluations_limit = 2
+        self.assertIsNone(self.algorithm.get_best_move(self.state, 5))
+        self.assertIs(self.algorithm.last_root_values, previous_values)
+
+        self.algorithm.ran_out_of_time = False
+        self.evaluations_count = 0
+        self.evaluations_limit = 100
+        move = self.algorithm.get_best_move(self.state, 5)
+        self.assertTrue(self.algorithm.ran_out_of_time)
+        self.assertIn(previous_move.value, self.algorithm._root_values)
+        self.assertIsNotNone(move)
+
+    def test_search_with_sampled_random_moves_expands_the_samples(self):
+        heuristic_bounds = (-12, 12)
+        for bounds in (None, heuristic_bounds):
+            self.evaluations_count = 0
+            expected = self.get_best_move_and_value(3, False, heuristic_bounds=bounds)
+            evaluations_count = self.evaluations_count
+            self.algorithm.heuristic_bounds = bounds
+            # both random moves fit in the budget
+            self.algorithm.random_moves_sampler = RandomMovesSampler(1, 1)
+            self.assertEqual(self.algorithm.get_best_move(self.state, 3).value, expected[0])
+            self.assertAlmostEqual(self.algorithm._root_values[expected[0]], expected[1])
+
+            self.evaluations_count = 0
+            self.algorithm.random_moves_sampler = RandomMovesSampler(0, 1)
+            self.algorithm.get_best_move(self.state, 3)
+            self.assertLess(self.evaluations_count, evaluations_count)
+            self.assertListEqual(self.state.history, [])
+
+    def score_moves_by_expectimax_values(self, moves: List[FakeMove], state: FakeState) -> List[float]:
+        sign = 1 if state.get_current_player() == 0 else -1
+        scores = []
+        for move in moves:
+            state.make_move(move)
+            scores.append(sign * self.get_expectimax_value(2, True))
+            state.unmake_move(move)
+        return scores
+
+    def test_ordered_search_is_the_same_as_unordered(self):
+        for score_moves in (lambda moves, state: [-move.value for move in moves],
+                            self.score_moves_by_expectimax_values):
+            for batched, transposition_table in ((False, None), (True, None), (False, TranspositionTable())):
+                algorithm = AlphaBetaExpectimax(lambda player: player == 0, self.evaluate_heuristic_value,
+                                                evaluate_heuristic_values=self.evaluate_heuristic_values if batched
+                                                else None, transposition_table=transposition_table,
+                                                score_moves=score_moves)
+                for depth in (1, 3, 5):
+                    algorithm.start_turn_timer()
+                    move = algorithm.get_best_move(self.state, depth)
+                    self.assertEqual((move.value, algorithm._root_values[move.value]),
+                                     self.get_best_move_and_value(depth, batched))
+                    self.assertListEqual(self.state.history, [])
+
+    def test_ordering_by_values_evaluates_fewer_leaves(self):
+        leaves_counts = []
+        for score_moves in (lambda moves, state: [-score for score in
+                                                  self.score_moves_by_expectimax_values(moves, state)],
+                            None, self.score_moves_by_expectimax_values):
+            algorithm = AlphaBetaExpectimax(lambda player: player == 0, self.evaluate_heuristic_value,
+                                            score_moves=score_moves)
+            algorithm.start_turn_timer()
+            algorithm.get_best_move(self.state, 5)
+            leaves_counts.append(algorithm.statistics.leaves_count)
+        self.assertListEqual(leaves_counts, sorted(leaves_counts, reverse=True))
+        self.assertLess(leaves_counts[2], leaves_counts[1])
+
+    def test_iterations_with_moves_cache_reuse_the_moves(self):
+        generations_counts = []
+        get_next_moves = self.state.get_next_moves
+
+        def count_next_moves():
+            generations_counts[-1] += 1
+            return get_next_moves()
+        self.state.get_next_moves = count_next_moves
+
+        results = []
+        for moves_cache in (None, MovesCache()):
+            algorithm = AlphaBetaExpectimax(lambda player: player == 0, self.evaluate_heuristic_value,
+                                            score_moves=lambda moves, state: [move.value % 3 for move in moves],
+                                            transposition_table=TranspositionTable(), moves_cache=moves_cache)
+            algorithm.start_turn_timer()
+            generations_counts.append(0)
+            results.append([(algorithm.get_best_move(self.state, depth).value, algorithm._root_values)
+                            for depth in (1, 3, 5)])
+            self.assertListEqual(self.state.history, [])
+        self.assertEqual(results[0], results[1])
+        self.assertLess(generations_counts[1], generations_counts[0])
+
+        generations_counts.append(0)
+        algorithm.get_best_move(self.state, 3)
+        self.assertEqual(generations_counts[-1], 0)
+
+    def test_statistics_count_the_search(self):
+        self.algorithm.start_turn_timer()
+        for depth in (1, 3):
+            self.algorithm.get_best_move(self.state, depth)
+        statistics = self.algorithm.statistics
+        self.assertEqual(statistics.leaves_count, self.evaluations_count)
+        self.assertEqual(statistics.get_completed_depth(), 3)
+        self.assertListEqual([depth for depth, _, _ in statistics.iterations], [1, 3])
+        self.assertEqual(statistics.get_branching_factors()[0], (FakeState.moves_count, FakeState.moves_count))
+        self.assertGreater(statistics.chance_nodes_count, 0)
+        self.assertGreater(statistics.min_nodes_count, 0)
+
+        self.algorithm.start_turn_timer()
+        self.assertEqual(self.algorithm.statistics.get_nodes_count(), 0)
@@ -0,0 +1,18 @@
+from unittest import TestCase
+
+from algorithms.audit import Audit, AuditLevel
+
+
+class TestAudit(TestCase):
+    def test_is_due_by_level(self):
+        self.assertFalse(any(Audit(AuditLevel.Off).is_due() for _ in range(10)))
+        self.assertTrue(all(Audit(AuditLevel.Full).is_due() for _ in range(10)))
+
+        sampled = Audit(AuditLevel.Sampled, sampling_period=3)
+        self.assertEqual([sampled.is_due() for _ in range(6)], [False, False, True, False, False, True])
+
+    def test_set_level(self):
+        audit = Audit(AuditLevel.Off, sampling_period=5)
+        audit.set_level(AuditLevel.Sampled)
+        self.assertEqual(audit.sampling_period, 5)
+        self.assertEqual([audit.is_due() for _ in range(5)].count(True), 1)
@@ -0,0 +1,32 @@
+from unittest import TestCase
+
+from algorithms.evaluation_cache import EvaluationCache
+
+
+class TestEvaluationCache(TestCase):
+    def setUp(self):
+        self.cache = EvaluationCache(capacity=2)
+
+    def test_lookup_finds_stored_value(self):
+        self.cache.store(5, 1.5)
+        self.assertEqual(self.cache.lookup(5), 1.5)
+        self.assertIsNone(self.cache.lookup(9))
+        self.assertEqual(self.cache.get_hit_rate(), 0.5)
+
+    def test_least_recently_used_value_is_dropped(self):
+        self.cache.store(5, 1.5)
+        self.cache.store(9, 2.5)
+        self.cache.lookup(5)
+        self.cache.store(13, 3.5)
+        self.assertEqual(len(self.cache), 2)
+        self.assertEqual(self.cache.lookup(5), 1.5)
+        self.assertIsNone(self.cache.lookup(9))
+        self.assertEqual(self.cache.lookup(13), 3.5)
+
+    def test_clear_resets_the_statistics(self):
+        self.cache.store(5, 1.5)
+        self.cache.lookup(5)
+        self.cache.clear()
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual((self.cache.probes_count, self.cache.hits_count), (0, 0))
+        self.assertIsNone(self.cache.lookup(5))
@@ -0,0 +1,107 @@
+from unittest import TestCase
+
+from algorithms.alpha_beta_pruning_expectimax import AlphaBetaExpectimax
+from algorithms.evaluation_cache import EvaluationCache
+from algorithms.parallel_root_search import ParallelRootSearch
+from algorithms.test_alpha_beta_pruning_expectimax import FakeState
+from algorithms.timeoutable_algorithm import Deadline
+from algorithms.transposition_table import TranspositionTable
+
+
+class FakeBoardState(FakeState):
+    """
+    FakeState on a board, that is part of the snapshot but not of the hash (as the layout of CatanState), and
+    changes the values of the positions
+    """
+
+    def __init__(self, board: int=0):
+        super().__init__()
+        self.board = board
+
+    def to_bytes(self) -> bytes:
+        return bytes([self.board] + self.history)
+
+    @staticmethod
+    def from_bytes(data: bytes):
+        state = FakeBoardState(data[0])
+        state.history = list(data[1:])
+        return state
+
+    def evaluate(self) -> float:
+        return super().evaluate() + self.board
+
+
+class TestParallelRootSearch(TestCase):
+    def setUp(self):
+        self.state = FakeState()
+
+    def create_algorithm(self):
+        return AlphaBetaExpectimax(lambda player: player == 0, FakeState.evaluate, timeout_seconds=60,
+                                   transposition_table=TranspositionTable())
+
+    def get_best_moves(self, search, algorithm: AlphaBetaExpectimax, depths):
+        search.start_turn_timer()
+        moves = [search.get_best_move(self.state, depth) for depth in depths]
+        return [move.value for move in moves], algorithm.last_root_values
+
+    def test_parallel_search_finds_the_best_move_of_the_search(self):
+        depths = (1, 3, 5)
+        algorithm = self.create_algorithm()
+        expected_moves, expected_values = self.get_best_moves(algorithm, algorithm, depths)
+        for share_alpha in (False, True):
+            search = ParallelRootSearch(self.create_algorithm(), 2, share_alpha)
+            search.start(FakeState.from_bytes)
+            try:
+                moves, values = self.get_best_moves(search, search.algorithm, depths)
+            finally:
+                search.close()
+            self.assertListEqual(moves, expected_moves)
+            self.assertEqual(values.keys(), expected_values.keys())
+            best_index = AlphaBetaExpectimax._get_best_index(expected_values)
+            self.assertAlmostEqual(values[best_index], expected_values[best_index])
+            if not share_alpha:
+                for i in values:
+                    self.assertAlmostEqual(values[i], expected_values[i])
+            # the workers' nodes are merged, with an iteration per depth
+            self.assertGreater(search.algorithm.statistics.leaves_count, 0)
+            self.assertEqual(search.algorithm.statistics.get_completed_depth(), depths[-1])
+            self.assertEqual(len(search.algorithm.statistics.iterations), len(depths))
+            self.assertListEqual(self.state.history, [])
+
+    def test_search_out_of_time_returns_no_move(self):
+        search = ParallelRootSearch(self.create_algorithm(), 2)
+        search.start(FakeState.from_bytes)
+        try:
+            search.start_turn_timer()
+            search.algorithm.deadline = Deadline(0)
+            self.assertIsNone(search.get_best_move(self.state, 3))
+            self.assertIsNone(search.algorithm.last_root_values)
+        finally:
+            search.close()
+
+    def test_workers_evaluations_are_cleared_for_a_new_board(self):
+        def create_algorithm():
+            return AlphaBetaExpectimax(lambda player: player == 0, FakeBoardState.evaluate, timeout_seconds=60,
+                                       transposition_table=TranspositionTable(), evaluation_cache=EvaluationCache())
+
+        expected_values = []
+        for board in (0, 1):
+            algorithm = create_algorithm()
+            algorithm.start_turn_timer()
+            algorithm.get_best_move(FakeBoardState(board), 3)
+            expected_values.append(algorithm.last_root_values)
+
+        # search on a board, and again on a new board (as a player that is reused in a new game)
+        search = ParallelRootSearch(create_algorithm(), 2, share_alpha=False)
+        search.start(FakeBoardState.from_bytes)
+        try:
+            for board in (0, 1):
+                search.clear_evaluations()
+                search.start_turn_timer()
+                search.get_best_move(FakeBoardState(board), 3)
+                # assert the values are of the board searched, rather than cached ones of the previous board
+                self.assertEqual(search.algorithm.last_root_values.keys(), expected_values[board].keys())
+                for i, value in search.algorithm.last_root_values.items():
+                    self.assertAlmostEqual(value, expected_values[board][i])
+        finally:
+            search.close()
@@ -0,0 +1,62 @@
+import os
+import subprocess
+import sys
+from unittest import TestCase
+
+from algorithms.random_moves_sampler import RandomMovesSampler
+from algorithms.test_alpha_beta_pruning_expectimax import FakeRandomMove
+
+
+class TestRandomMovesSampler(TestCase):
+    def setUp(self):
+        # the probabilities of the sums of two dice
+        self.random_moves = [FakeRandomMove(value, (6 - abs(value - 7)) / 36) for value in range(2, 13)]
+
+    def test_few_random_moves_are_not_sampled(self):
+        sampler = RandomMovesSampler(6, 5)
+        self.assertListEqual(sampler.sample(self.random_moves, 0),
+                             [(random_move, random_move.probability) for random_move in self.random_moves])
+
+    def test_most_probable_random_moves_are_expanded_exactly(self):
+        sampler = RandomMovesSampler(3, 4)
+        weighted_random_moves = sampler.sample(self.random_moves, 0)
+        self.assertListEqual([random_move.value for random_move, _ in weighted_random_moves[:3]], [7, 6, 8])
+        self.assertLessEqual(len(weighted_random_moves), 7)
+        self.assertAlmostEqual(sum(probability for _, probability in weighted_random_moves), 1)
+
+    def test_samples_are_reproducible(self):
+        sampler = RandomMovesSampler(1, 3, seed=5)
+        samples = [[random_move.value for random_move, _ in sampler.sample(self.random_moves, key)]
+                   for key in range(20)]
+        self.assertListEqual(samples, [[random_move.value for random_move, _ in
+                                        RandomMovesSampler(1, 3, seed=5).sample(self.random_moves, key)]
+                                       for key in range(20)])
+        self.assertGreater(len(set(map(tuple, samples))), 1)
+
+    def test_samples_of_a_state_are_reproducible_in_other_interpreters(self):
+        # the indices of the random moves sampled for a state of a game, with its key
+        script = ('from algorithms.random_moves_sampler import RandomMovesSampler\n'
+                  'from game.catan_state import CatanState\n'
+                  'from players.random_player import RandomPlayer\n'
+                  'state = CatanState([RandomPlayer(i) for i in range(4)], seed=1)\n'
+                  'state.turns_count = 8\n'
+                  'random_moves = state.get_next_random_moves()\n'
+                  'samples = RandomMovesSampler(1, 3, seed=5).sample(random_moves, state.get_hash())\n'
+                  'print(len(random_moves), *[random_moves.index(random_move) for random_move, _ in samples])\n')
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+        # assert interpreters with other hash salts sample the same moves
+        outputs = [subprocess.check_output([sys.executable, '-c', script], cwd=root,
+                                           env=dict(os.environ, PYTHONHASHSEED=hash_seed)).split()
+                   for hash_seed in ('1', '2')]
+        self.assertGreater(int(outputs[0][0]), 4)
+        self.assertListEqual(outputs[0], outputs[1])
+
+    def test_samples_estimate_the_expectation(self):
+        sampler = RandomMovesSampler(2, 3)
+        expectation = sum(random_move.probability * random_move.value ** 2 for random_move in self.random_moves)
+        keys_count = 20000
+        estimations = sum(sum(probability * random_move.value ** 2
+                              for random_move, probability in sampler.sample(self.random_moves, key))
+                          for key in range(keys_count))
+        self.assertAlmostEqual(estimations / keys_count, expectation, delta=0.01 * expectation)
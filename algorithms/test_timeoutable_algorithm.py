@@ -0,0 +1,52 @@
+import threading
+import time
+from unittest import TestCase
+
+from algorithms.timeoutable_algorithm import TimeoutableAlgorithm, Deadline
+
+
+class FakeAlgorithm(TimeoutableAlgorithm):
+    pass
+
+
+class TestTimeoutableAlgorithm(TestCase):
+    def test_nested_deadline_is_no_later_than_its_parent(self):
+        parent = Deadline(0.5)
+        self.assertLessEqual(Deadline(10, parent).time, parent.time)
+        self.assertLess(Deadline(0.1, parent).time, parent.time)
+        self.assertTrue(Deadline(0).is_expired())
+        self.assertEqual(Deadline(0).get_remaining_seconds(), 0)
+
+    def test_clock_is_read_once_in_an_interval_of_checks(self):
+        algorithm = FakeAlgorithm(0.01)
+        algorithm.start_turn_timer()
+        time.sleep(0.02)
+        for _ in range(TimeoutableAlgorithm.clock_reading_interval - 1):
+            self.assertFalse(algorithm.check_time())
+        self.assertTrue(algorithm.check_time())
+        self.assertTrue(algorithm.ran_out_of_time)
+
+        algorithm.start_turn_timer()
+        self.assertFalse(algorithm.ran_out_of_time)
+        time.sleep(0.02)
+        self.assertTrue(algorithm.check_time(read_clock=True))
+
+    def test_algorithms_are_timed_independently(self):
+        short, long = FakeAlgorithm(0.01), FakeAlgorithm(60)
+
+        def time_out(algorithm: TimeoutableAlgorithm):
+            algorithm.start_turn_timer()
+            while not algorithm.check_time():
+                time.sleep(0.001)
+
+        short_thread = threading.Thread(target=time_out, args=(short,))
+        long.start_turn_timer()
+        short_thread.start()
+        short_thread.join(5)
+        self.assertTrue(short.ran_out_of_time)
+        self.assertFalse(long.check_time(read_clock=True))
+
+    def test_turn_nested_in_expired_deadline_is_out_of_time(self):
+        algorithm = FakeAlgorithm(60)
+        algorithm.start_turn_timer(Deadline(0))
+        self.assertTrue(algorithm.ran_out_of_time)
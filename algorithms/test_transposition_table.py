@@ -0,0 +1,45 @@
+from unittest import TestCase
+
+from algorithms.transposition_table import TranspositionTable, Bound
+
+
+class TestTranspositionTable(TestCase):
+    def setUp(self):
+        self.table = TranspositionTable(capacity=4)
+
+    def test_lookup_finds_stored_entry(self):
+        self.table.store(5, 1.5, 3, Bound.Exact, 2)
+        entry = self.table.lookup(5)
+        self.assertEqual((entry.value, entry.depth, entry.bound, entry.best_move_index), (1.5, 3, Bound.Exact, 2))
+        self.assertIsNone(self.table.lookup(9))
+        self.assertEqual(self.table.get_hit_rate(), 0.5)
+
+    def test_shallower_entry_of_current_search_does_not_replace_deeper_one(self):
+        self.table.store(5, 1.5, 3, Bound.Exact, 2)
+        self.table.store(9, 2.5, 1, Bound.Exact, 0)
+        self.assertIsNotNone(self.table.lookup(5))
+        self.assertIsNone(self.table.lookup(9))
+
+        self.table.store(9, 2.5, 3, Bound.Exact, 0)
+        self.assertIsNone(self.table.lookup(5))
+        self.assertIsNotNone(self.table.lookup(9))
+        self.assertEqual(self.table.replacements_count, 1)
+
+    def test_entry_of_older_search_is_replaced(self):
+        self.table.store(5, 1.5, 3, Bound.Exact, 2)
+        self.table.new_search()
+        self.table.store(9, 2.5, 1, Bound.Exact, 0)
+        self.assertIsNotNone(self.table.lookup(9))
+
+    def test_table_is_bounded(self):
+        for key in range(100):
+            self.table.store(key, 0.0, 1, Bound.Exact, None)
+        self.assertEqual(len(self.table), 4)
+
+    def test_entry_is_usable_by_its_bound(self):
+        self.table.store(5, 1.5, 3, Bound.of_value(1.5, 2, 4), None)
+        entry = self.table.lookup(5)
+        self.assertIs(entry.bound, Bound.Upper)
+        self.assertTrue(entry.is_usable(3, 2, 4))
+        self.assertFalse(entry.is_usable(3, 1, 4))
+        self.assertFalse(entry.is_usable(5, 2, 4))
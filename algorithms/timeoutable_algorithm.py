@@ -1,22 +1,53 @@
 import abc
-import signal
+import time
+
+
+class Deadline:
+    """
+    the time a budget runs out at, by the monotonic clock. a budget may be nested in another (i.e a turn's budget
+    in a game's), and then it runs out no later than it.
+    a deadline doesn't change once created, so it can be shared by threads, and sent to processes on the same
+    machine (the monotonic clock is system-wide, i.e CLOCK_MONOTONIC on linux)
+    """
+
+    def __init__(self, seconds: float, parent: 'Deadline'=None):
+        """
+        :param seconds: the budget, from now
+        :param parent: optional parameter. the deadline of the budget this one is nested in
+        """
+        self.time = time.monotonic() + seconds
+        if parent is not None:
+            self.time = min(self.time, parent.time)
+
+    def is_expired(self) -> bool:
+        return time.monotonic() >= self.time
+
+    def get_remaining_seconds(self) -> float:
+        """
+        :return: the seconds left until the deadline, 0 if it passed
+        """
+        return max(self.time - time.monotonic(), 0.0)
 
 
 class TimeoutableAlgorithm(abc.ABC):
+    # the number of checks of the time (see check_time) between readings of the clock
+    clock_reading_interval = 8
+
     def __init__(self, timeout_seconds):
         self._timeout_seconds = timeout_seconds
         self.ran_out_of_time = False
+        self.deadline = None
+        self._time_checks_count = 0
 
-    def start_turn_timer(self):
+    def start_turn_timer(self, deadline: Deadline=None):
         """
-        NOTE: this is NOT implemented to be used in parallel. each time this method is invoked, the signal-handler is
-        updated to time-out "self". Which means that if this method is invoked from two different objects,
-        only the second player's "ran_out_of_time" flag will be raised
-        the algorithm should check at each iteration whether flag self.ran_out_of_time was raised. if it was,
-        it should unwind the stack. this is implemented this way in order for the algorithm to be able to revert
-        everything it did to the game board.
+        start the budget of the turn: a deadline of timeout seconds from now. the budget is the algorithm's own, so
+        several algorithms (i.e the players of games that run in threads) can be timed at once.
+        the algorithm should check the time at each iteration (see check_time), and once it runs out (flag
+        self.ran_out_of_time is raised) it should unwind the stack. this is implemented this way in order for the
+        algorithm to be able to revert everything it did to the game board.
         So the first lines in the algorithm method should be:
-        if self.ran_out_of_time:
+        if self.check_time():
             return <something>
         the player should use the algorithm iteratively, knowing his time is limited. for example:
         my_algorithm.start_turn_timer()
@@ -25,12 +56,25 @@ class TimeoutableAlgorithm(abc.ABC):
             best_move = move
             move = my_algorithm.get_best_move(state)
         return best_move
+        :param deadline: optional parameter. the deadline of a budget to nest the turn's budget in (i.e to search
+        under the deadline of another process)
         :return: None
         """
-        self.ran_out_of_time = False
+        self.deadline = Deadline(self._timeout_seconds, deadline)
+        self._time_checks_count = 0
+        self.ran_out_of_time = self.deadline.is_expired()
 
-        def signal_handler(signum, frame):
-            self.ran_out_of_time = True
-            signal.setitimer(signal.ITIMER_REAL, 0)
-        signal.signal(signal.SIGALRM, signal_handler)
-        signal.setitimer(signal.ITIMER_REAL, float(self._timeout_seconds))
+    def check_time(self, read_clock: bool=False) -> bool:
+        """
+        raise flag self.ran_out_of_time if the deadline passed. the clock is read once every
+        clock_reading_interval checks, so the algorithm can check the time at each node cheaply
+        :param read_clock: whether to read the clock regardless of the interval
+        :return: the flag self.ran_out_of_time
+        """
+        if self.ran_out_of_time or self.deadline is None:
+            return self.ran_out_of_time
+        self._time_checks_count += 1
+        if read_clock or self._time_checks_count >= self.clock_reading_interval:
+            self._time_checks_count = 0
+            self.ran_out_of_time = self.deadline.is_expired()
+        return self.ran_out_of_time
@@ -0,0 +1,139 @@
+import enum
+from collections import namedtuple
+from typing import Union
+
+
+@enum.unique
+class Bound(enum.Enum):
+    """
+    what a stored value says about the true value of the position
+    """
+    Exact = 0
+    Lower = 1
+    Upper = 2
+
+    @staticmethod
+    def of_value(value: float, alpha: float, beta: float):
+        """
+        get the bound type of a value a search returned, given the window it was searched with
+        :param value: the value the search returned
+        :param alpha: the alpha the search started with
+        :param beta: the beta the search started with
+        :return: Bound, Upper if the value failed low, Lower if it failed high, Exact otherwise
+        """
+        if value <= alpha:
+            return Bound.Upper
+        if value >= beta:
+            return Bound.Lower
+        return Bound.Exact
+
+
+class TranspositionEntry(namedtuple('TranspositionEntryTuple',
+                                    ['key', 'value', 'depth', 'bound', 'best_move_index', 'age'])):
+    """
+    an entry of the transposition table. in this order:
+     -the key (hash) of the position
+     -the value the search found
+     -the depth the position was searched to
+     -the bound type of the value (see Bound)
+     -the index of the best move among the (filtered) next moves of the position, or None
+     -the search (see TranspositionTable.new_search) the entry was stored in
+    """
+
+    def is_usable(self, depth: int, alpha: float, beta: float) -> bool:
+        """
+        indicate whether the value can be returned instead of searching the position
+        :param depth: the depth the position is about to be searched to
+        :param alpha: the current alpha
+        :param beta: the current beta
+        :return: True if the entry was searched deep enough, and its value settles the search, False otherwise
+        """
+        if self.depth < depth:
+            return False
+        return (self.bound is Bound.Exact or
+                (self.bound is Bound.Lower and self.value >= beta) or
+                (self.bound is Bound.Upper and self.value <= alpha))
+
+
+class TranspositionTable:
+    """
+    a bounded table of the positions a search already evaluated, by their keys (i.e CatanState.get_hash).
+    it has a fixed number of slots (the memory cap), and each key has a single slot (by its remainder).
+    a stored entry is replaced by an entry of another position if it's from an older search (see new_search),
+    or if the new entry was searched at least as deep
+    """
+    default_capacity = 2 ** 16
+
+    def __init__(self, capacity: int=default_capacity):
+        """
+        :param capacity: the maximal number of entries. an entry takes about 200 bytes
+        """
+        assert capacity > 0
+        self._capacity = capacity
+        self._slots = [None] * capacity
+        self._age = 0
+        self.probes_count = 0
+        self.hits_count = 0
+        self.stores_count = 0
+        self.replacements_count = 0
+
+    def new_search(self):
+        """
+        start a new search (i.e a new iteration of the iterative deepening). the entries of the previous searches
+        are kept, but are replaced by the new ones regardless of their depth
+        :return: None
+        """
+        self._age += 1
+
+    def clear(self):
+        """
+        remove all the entries, and reset the statistics
+        :return: None
+        """
+        self._slots = [None] * self._capacity
+        self._age = 0
+        self.probes_count = 0
+        self.hits_count = 0
+        self.stores_count = 0
+        self.replacements_count = 0
+
+    def lookup(self, key: int) -> Union[TranspositionEntry, None]:
+        """
+        get the entry of a position
+        :param key: the key of the position
+        :return: TranspositionEntry, the entry of the position, or None if it isn't stored
+        """
+        self.probes_count += 1
+        entry = self._slots[key % self._capacity]
+        if entry is None or entry.key != key:
+            return None
+        self.hits_count += 1
+        return entry
+
+    def store(self, key: int, value: float, depth: int, bound: Bound, best_move_index: Union[int, None]):
+        """
+        store the result of a search of a position, unless its slot holds a deeper entry of the current search
+        :param key: the key of the position
+        :param value: the value the search found
+        :param depth: the depth the position was searched to
+        :param bound: the bound type of the value
+        :param best_move_index: the index of the best move among the next moves, or None
+        :return: None
+        """
+        slot = key % self._capacity
+        entry = self._slots[slot]
+        if entry is not None and entry.key != key and entry.age == self._age and entry.depth > depth:
+            return
+        if entry is not None and entry.key != key:
+            self.replacements_count += 1
+        self.stores_count += 1
+        self._slots[slot] = TranspositionEntry(key, value, depth, bound, best_move_index, self._age)
+
+    def get_hit_rate(self) -> float:
+        """
+        :return: the fraction of the lookups that found their position, 0 if there were none
+        """
+        return self.hits_count / self.probes_count if self.probes_count else 0.0
+
+    def __len__(self):
+        return sum(1 for entry in self._slots if entry is not None)
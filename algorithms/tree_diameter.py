@@ -1,9 +1,10 @@
 import networkx
+from algorithms.audit import audit
 from algorithms.dfs import dfs
 
 
 def tree_diameter(t: networkx.Graph):
-    if __debug__:
+    if audit.is_due():
         assert networkx.is_tree(t)
     v, _ = dfs(t)
     _, longest_path_length = dfs(t, v)
@@ -10,6 +10,7 @@ from typing import List, Tuple, Set, Dict
 import networkx
 import numpy as np
 
+from algorithms.audit import audit
 from algorithms.tree_diameter import tree_diameter
 from game.pieces import Colony, Road
 from game.resource import Resource
@@ -104,6 +105,23 @@ class Land(namedtuple('LandTuple', ['resource', 'dice_value', 'identifier', 'loc
         return self
 
 
+class ProductionTables(namedtuple('ProductionTablesTuple', ['resources_pips', 'resources_probabilities',
+                                                             'locations_pips', 'paths_pips'])):
+    """
+    the static production tables of a board, computed once from its lands (the resources and dice values of the
+    lands don't change during a game), so the heuristics don't have to walk the graph for them. in this order:
+     -the pips (the dice combinations out of 36) of each resource around each location, np.ndarray of
+      shape (54, len(Resource)), indexed by the locations and the resources' values
+     -the same, as probabilities
+     -the pips of the lands around each location, List[int] indexed by the locations
+     -the pips of the lands adjacent to each path, Dict[int, int] by the paths' path_key
+    the robber is ignored, and the desert has no pips
+    """
+
+    def __deepcopy__(self, memo_dict=None):
+        return self
+
+
 def path_key(edge):
     return min(edge) * 100 + max(edge)
 
@@ -112,21 +130,92 @@ class Board:
     player = 'p'
     lands = 'l'
 
-    def __init__(self, seed: int = None):
+    # the layout is the lands' resources and dice values, and the harbor (if any) of each location
+    layout_size = 19 * 2 + 54
+    # the pieces are the colony of each location, the road of each path, and the robber's land
+    pieces_size = 54 + 72 + 1
+    _desert_byte = 255
+
+    _production_pieces = (Colony.Settlement, Colony.City, Road.Paved)
+
+    # the probability of each sum of two dice. the order of the dice values is the order the dice are rolled by
+    # (see CatanState.make_random_move), so it must not change
+    probabilities_by_dice_values = {dice_value: (6 - abs(7 - dice_value)) / 36.0
+                                    for dice_value in (2, 12, 3, 11, 4, 10, 5, 9, 6, 8, 7)}
+
+    def __init__(self, seed: int = None, layout: bytes = None):
         """
         Board of the game settlers of catan
         :param seed: optional parameter. send the same number in the range [0,1) to get the same map
+        :param layout: optional parameter. the layout of the map, as returned from get_layout.
+        if it's given, the seed is ignored
         """
         assert seed is None or (isinstance(seed, int) and seed > 0)
+        assert layout is None or len(layout) == Board.layout_size
 
         self._shuffle = np.random.RandomState(seed).shuffle
         self._player_colonies_points = defaultdict(int)
+        # the pips (see ProductionTables) around the colonies/adjacent to the roads of each player, by
+        # (player, piece). kept in integers, so making and unmaking moves doesn't accumulate rounding errors
+        self._production_pips = defaultdict(int)
         self._players_by_roads = {}
 
-        self._create_and_shuffle_lands()
+        if layout is None:
+            self._create_and_shuffle_lands()
+        else:
+            self._create_lands_from_layout(layout)
         self._create_graph()
         self._set_attributes()
-        self._create_harbors()
+        if layout is None:
+            self._create_harbors()
+        else:
+            self._create_harbors_from_layout(layout)
+
+    def get_layout(self) -> bytes:
+        """
+        get the layout of the map (the parts of the board that don't change during the game), to create
+        the same map with, regardless of the seed it was created with
+        :return: bytes, of size Board.layout_size
+        """
+        layout = [Board._desert_byte if land.resource is None else land.resource.value for land in self._lands]
+        layout += [land.dice_value for land in self._lands]
+        harbors_by_locations = [0] * len(Board._vertices)
+        for harbor, locations in self._locations_by_harbors.items():
+            for location in locations:
+                harbors_by_locations[location] = harbor.value + 1
+        return bytes(layout + harbors_by_locations)
+
+    def pieces_to_bytes(self, players_indices: Dict) -> bytes:
+        """
+        get the colonies, roads and robber on the board, in a fixed layout
+        :param players_indices: the index of each player, the players are referred to by their index
+        :return: bytes, of size Board.pieces_size
+        """
+        pieces = []
+        for location in Board._vertices:
+            player, colony = self._roads_and_colonies.node[location][Board.player]
+            pieces.append(0 if player is None else (players_indices[player] + 1) * 3 + colony.value)
+        for key in sorted(self._players_by_roads):
+            player = self._players_by_roads[key]
+            pieces.append(0 if player is None else players_indices[player] + 1)
+        pieces.append(self._robber_land.identifier)
+        return bytes(pieces)
+
+    def set_pieces_from_bytes(self, pieces: bytes, players: List):
+        """
+        put the colonies, roads and robber on a board that has no colonies and roads yet
+        :param pieces: as returned from pieces_to_bytes
+        :param players: the players, the i-th player is the player of index i
+        :return: None
+        """
+        assert len(pieces) == Board.pieces_size
+        for location, piece in zip(Board._vertices, pieces):
+            if piece != 0:
+                self.set_location(players[piece // 3 - 1], location, Colony(piece % 3))
+        for key, piece in zip(sorted(self._players_by_roads), pieces[len(Board._vertices):]):
+            if piece != 0:
+                self.set_path(players[piece - 1], (key // 100, key % 100), Road.Paved)
+        self._robber_land = self._lands[pieces[-1]]
 
     def get_settleable_locations_by_player(self, player) -> List[Location]:
         """
@@ -256,6 +345,53 @@ class Board:
         return [land.dice_value for land in self._roads_and_colonies[path[0]][path[1]][Board.lands]
                 if land.resource is not None]
 
+    def get_resources_probabilities(self, locations: List[Location]) -> np.ndarray:
+        """
+        get the probabilities of getting each resource from a settlement in each of the given locations
+        :param locations: the locations to get the probabilities of
+        :return: np.ndarray of shape (len(locations), len(Resource)), indexed by the resources' values
+        """
+        return self._production_tables.resources_probabilities[locations]
+
+    def get_location_probability(self, location: Location) -> float:
+        """
+        get the sum of the probabilities of the numbers surrounding this location
+        :param location: the location to get the probability of
+        :return: float, the sum of the probabilities
+        """
+        return self._production_tables.locations_pips[location] / 36.0
+
+    def get_path_probability(self, path: Path) -> float:
+        """
+        get the sum of the probabilities of the numbers adjacent to this path
+        :param path: the path to get the probability of
+        :return: float, the sum of the probabilities
+        """
+        return self._production_tables.paths_pips[path_key(path)] / 36.0
+
+    def get_production_probabilities(self, player) -> Dict:
+        """
+        get the sums of the probabilities of the numbers around the settlements, around the cities and adjacent to
+        the roads of the player (as get_location_probability and get_path_probability). they are maintained by
+        set_location and set_path, so it takes no traversal
+        :param player: the player to get the probabilities of
+        :return: Dict[Colony/Road, float], the sum of the probabilities of each of Colony.Settlement, Colony.City
+        and Road.Paved
+        """
+        return {piece: self._production_pips.get((player, piece), 0) / 36.0 for piece in Board._production_pieces}
+
+    def get_max_production_probabilities(self) -> Dict:
+        """
+        get the highest probability a single piece can have (the highest of get_location_probability for the
+        colonies, and of get_path_probability for the roads). the heuristics use it to bound their values
+        :return: Dict[Colony/Road, float], the highest probability of each of Colony.Settlement, Colony.City and
+        Road.Paved
+        """
+        location_pips = max(self._production_tables.locations_pips)
+        path_pips = max(self._production_tables.paths_pips.values())
+        return {Colony.Settlement: location_pips / 36.0, Colony.City: location_pips / 36.0,
+                Road.Paved: path_pips / 36.0}
+
     def get_colonies_score(self, player) -> int:
         """
         get the colonies score-count of a single player
@@ -334,10 +470,16 @@ class Board:
 
         vertex_attributes = self._roads_and_colonies.node[location]
 
-        previous_colony = self.get_colony_type_at_location(location)
+        previous_player, previous_colony = vertex_attributes[Board.player]
         self._player_colonies_points[player] -= previous_colony.value
         self._player_colonies_points[player] += colony.value
 
+        location_pips = self._production_tables.locations_pips[location]
+        if previous_colony is not Colony.Uncolonised:
+            self._production_pips[previous_player, previous_colony] -= location_pips
+        if colony is not Colony.Uncolonised:
+            self._production_pips[player, colony] += location_pips
+
         if colony is colony.Uncolonised and previous_colony is not colony.Uncolonised:
             for land in vertex_attributes[Board.lands]:
                 land.colonies.pop()
@@ -349,16 +491,20 @@ class Board:
             player = None
         vertex_attributes[Board.player] = (player, colony)
 
-        if __debug__:
-            sum_of_settlements_and_cities_points = 0
-            for v in self._roads_and_colonies.nodes():
-                sum_of_settlements_and_cities_points += self.get_colony_type_at_location(v).value
+        if audit.is_due():
+            self._audit_colonies_points()
+            self._audit_production_pips()
 
-            sum_of_points = 0
-            for points in self._player_colonies_points.values():
-                sum_of_points += points
+    def _audit_colonies_points(self):
+        sum_of_settlements_and_cities_points = 0
+        for v in self._roads_and_colonies.nodes():
+            sum_of_settlements_and_cities_points += self.get_colony_type_at_location(v).value
 
-            assert sum_of_points == sum_of_settlements_and_cities_points
+        sum_of_points = 0
+        for points in self._player_colonies_points.values():
+            sum_of_points += points
+
+        assert sum_of_points == sum_of_settlements_and_cities_points
 
     def set_path(self, player, path: Path, road: Road):
         """
@@ -372,8 +518,30 @@ class Board:
         assert not (player is None and road != Road.Unpaved)
         if road == Road.Unpaved:
             player = None
+        key = path_key(path)
+        previous_player = self._players_by_roads[key]
+        if previous_player is not None:
+            self._production_pips[previous_player, Road.Paved] -= self._production_tables.paths_pips[key]
+        if player is not None:
+            self._production_pips[player, Road.Paved] += self._production_tables.paths_pips[key]
+
         self._roads_and_colonies[path[0]][path[1]][Board.player] = (player, road)
-        self._players_by_roads[path_key(path)] = player
+        self._players_by_roads[key] = player
+
+        if audit.is_due():
+            self._audit_production_pips()
+
+    def _audit_production_pips(self):
+        production_pips = defaultdict(int)
+        for location, (player, colony) in self._roads_and_colonies.nodes(data=Board.player):
+            if player is not None:
+                production_pips[player, colony] += self._production_tables.locations_pips[location]
+        for key, player in self._players_by_roads.items():
+            if player is not None:
+                production_pips[player, Road.Paved] += self._production_tables.paths_pips[key]
+
+        assert ({key: pips for key, pips in production_pips.items() if pips != 0} ==
+                {key: pips for key, pips in self._production_pips.items() if pips != 0})
 
     def get_robber_land(self) -> Land:
         """
@@ -556,7 +724,14 @@ class Board:
         # get_lands_to_place_robber_on relies on the fact the 'desert' land.resource is None
         land_resources.append(None)
         land_numbers.append(0)
+        self._create_lands(land_resources, land_numbers)
 
+    def _create_lands_from_layout(self, layout: bytes):
+        land_resources = [None if value == Board._desert_byte else Resource(value) for value in layout[0:19]]
+        land_numbers = list(layout[19:38])
+        self._create_lands(land_resources, land_numbers)
+
+    def _create_lands(self, land_resources, land_numbers):
         ids = range(len(land_resources))
         locations = [[] for _ in range(len(land_resources))]
         surrounding_colonies = [[] for _ in range(len(land_resources))]
@@ -581,6 +756,12 @@ class Board:
         self._locations_by_harbors = {harbor: list(edge) for harbor, edge in zip(harbors, edges[0:len(harbors)])}
         self._locations_by_harbors[Harbor.HarborGeneric] = list(chain(*edges[len(harbors):]))
 
+    def _create_harbors_from_layout(self, layout: bytes):
+        self._locations_by_harbors = {harbor: [] for harbor in Harbor}
+        for location, value in zip(Board._vertices, layout[38:]):
+            if value != 0:
+                self._locations_by_harbors[Harbor(value - 1)].append(location)
+
     def _get_harbors_edges(self):
         wrapping_edges = self._get_wrapping_edges()
         offsets = [4] * 3 + [3] * 6
@@ -636,6 +817,7 @@ class Board:
         self._set_vertices_attributes(vertices_to_lands)
         self._set_edges_attributes(vertices_to_lands)
         self._set_lands_attributes(vertices_to_lands)
+        self._production_tables = self._create_production_tables()
 
     def _create_vertices_to_lands_mapping(self):
         land_rows = [
@@ -674,6 +856,21 @@ class Board:
             edge_attributes[Board.player] = (None, Road.Unpaved)
             self._players_by_roads[path_key(edge)] = None
 
+    def _create_production_tables(self) -> ProductionTables:
+        resources_pips = np.zeros((len(Board._vertices), len(Resource)), dtype=np.int64)
+        for location in Board._vertices:
+            for land in self._roads_and_colonies.node[location][Board.lands]:
+                if land.resource is not None:
+                    resources_pips[location, land.resource.value] += 6 - abs(7 - land.dice_value)
+
+        def lands_pips(lands):
+            return sum(6 - abs(7 - land.dice_value) for land in lands if land.resource is not None)
+
+        graph = self._roads_and_colonies
+        locations_pips = [lands_pips(graph.node[location][Board.lands]) for location in Board._vertices]
+        paths_pips = {path_key((u, v)): lands_pips(lands) for u, v, lands in graph.edges(data=Board.lands)}
+        return ProductionTables(resources_pips, resources_pips / 36.0, locations_pips, paths_pips)
+
     @staticmethod
     def _set_lands_attributes(vertices_to_lands):
         for location, lands in vertices_to_lands.items():
@@ -1,5 +1,6 @@
+import enum
 from collections import defaultdict
-from typing import Dict
+from typing import Dict, Union
 
 from algorithms.abstract_state import AbstractMove, AbstractRandomMove
 from game.development_cards import DevelopmentCard
@@ -19,7 +20,6 @@ class CatanMove(AbstractMove):
         self.did_get_longest_road_card = False
         self.robber_placement_land = robber_placement_land
         self.monopoly_card = None
-        self.monopoly_card_debt = {}
         self.resources_updates = {}
 
     def is_doing_anything(self):
@@ -35,13 +35,56 @@ class CatanMove(AbstractMove):
                 self.development_cards_to_be_purchased_count != 0)
 
 
+@enum.unique
+class TurnStage(enum.Enum):
+    """
+    the stages of a turn, in the order the sub-decisions of the turn are made in
+    (see CatanState.get_next_sub_moves)
+    """
+    PlaceRobber = 0
+    ExposeDevelopmentCard = 1
+    Trade = 2
+    Pave = 3
+    Settle = 4
+    SettleCity = 5
+    PurchaseDevelopmentCards = 6
+
+
+class CatanSubMove(AbstractMove):
+    def __init__(self, move: CatanMove, stage: Union[TurnStage, None], option=None):
+        """
+        a sub-decision of a turn
+        :param move: the move of the turn so far, including this sub-decision
+        :param stage: the stage the sub-decision is made in. None if it's the whole turn (in the initialisation
+        phase)
+        :param option: what is chosen in the stage (i.e the path to pave in TurnStage.Pave). None if nothing
+        more is done in the stage
+        """
+        self.move = move
+        self.stage = stage
+        self.option = option
+
+    def is_ending_turn(self):
+        """
+        indicate whether this is the last sub-decision of the turn
+        :return: True if the turn ends with this sub-decision, False otherwise
+        """
+        return self.stage is None or self.stage == TurnStage.PurchaseDevelopmentCards
+
+
 class RandomMove(AbstractRandomMove):
     @property
     def probability(self):
         return self._probability
 
     def __init__(self, rolled_dice: int, probability: float, state,
-                 development_card_purchases: Dict[DevelopmentCard, int]=defaultdict(int)):
+                 development_card_purchases: Dict[DevelopmentCard, int]=defaultdict(int),
+                 is_simulated: bool=False):
+        """
+        :param is_simulated: True if the move is part of a simulation (i.e a chance node of a search). then
+        the players' resources to drop when the dice roll 7 are looked-up, rather than decided by the players
+        (see AbstractPlayer.get_resources_to_drop_from_table)
+        """
         assert isinstance(probability, float) and 0 <= probability <= 1
         assert rolled_dice in state.probabilities_by_dice_values.keys()
 
@@ -49,37 +92,34 @@ class RandomMove(AbstractRandomMove):
         self._development_card_purchases = development_card_purchases
         self._probability = probability
         self._state = state
-        self._previous_rolled_dice = self._state.current_dice_number
-        self._resources_by_players = {}
+        self._is_simulated = is_simulated
 
     def apply(self):
+        """
+        apply the random move on the state. every change is recorded in the state's journal,
+        so it's reverted by rolling the state back (see CatanState.unmake_random_move)
+        :return: None
+        """
         if self._state.is_initialisation_phase():
             return
         if self._rolled_dice == 7:
-            update_method = AbstractPlayer.remove_resource
-            self._resources_by_players = {player: player.choose_resources_to_drop() for player in self._state.players}
+            update_method, revert_method = AbstractPlayer.remove_resource, AbstractPlayer.add_resource
+            if self._is_simulated:
+                resources_by_players = {player: player.get_resources_to_drop_from_table()
+                                        for player in self._state.players}
+            else:
+                resources_by_players = {player: player.choose_resources_to_drop() for player in self._state.players}
         else:
-            update_method = AbstractPlayer.add_resource
-            self._resources_by_players = self._state.board.get_players_to_resources_by_dice_value(self._rolled_dice)
-        AbstractPlayer.update_players_resources(self._resources_by_players, update_method)
-        self._state.current_dice_number = self._rolled_dice
+            update_method, revert_method = AbstractPlayer.add_resource, AbstractPlayer.remove_resource
+            resources_by_players = self._state.board.get_players_to_resources_by_dice_value(self._rolled_dice)
+        for player, resources_amount in resources_by_players.items():
+            player.update_resources(resources_amount, update_method)
+            self._state.record_undo(player.update_resources, resources_amount, revert_method)
+        self._state.set_journaled_attribute(self._state, 'current_dice_number', self._rolled_dice)
 
         player = self._state.get_current_player()
         for card, amount in self._development_card_purchases.items():
             for _ in range(amount):
                 player.add_unexposed_development_card(card)
-
-    def revert(self):
-        if self._state.is_initialisation_phase():
-            return
-        if self._rolled_dice == 7:
-            update_method = AbstractPlayer.add_resource
-        else:
-            update_method = AbstractPlayer.remove_resource
-        AbstractPlayer.update_players_resources(self._resources_by_players, update_method)
-        self._state.current_dice_number = self._previous_rolled_dice
-
-        player = self._state.get_current_player()
-        for card, amount in self._development_card_purchases.items():
-            for _ in range(amount):
-                player.remove_unexposed_development_card(card)
+                self._state.record_undo(player.remove_unexposed_development_card, card)
+        self._state.add_victory_points(player, self._development_card_purchases.get(DevelopmentCard.VictoryPoint, 0))
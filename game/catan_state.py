@@ -1,16 +1,19 @@
 import copy
+import hashlib
 from collections import defaultdict
 from collections import namedtuple
 from itertools import combinations_with_replacement
-from typing import List, Tuple, Dict, Union
+from typing import List, Tuple, Dict, Union, Callable
 
 import numpy as np
 
 from algorithms.abstract_state import AbstractState
+from algorithms.timeoutable_algorithm import Deadline
 from game.board import Board, Harbor, Location, Path
-from game.catan_moves import CatanMove, RandomMove
+from game.catan_moves import CatanMove, RandomMove, CatanSubMove, TurnStage
 from game.development_cards import DevelopmentCard
 from game.pieces import Colony, Road
+from game.player_state import PlayerState
 from game.resource import Resource, LastResourceIndex, FirsResourceIndex, ResourceAmounts
 from players.abstract_player import AbstractPlayer
 
@@ -20,14 +23,28 @@ KnightCardsCount = int
 
 
 class CatanState(AbstractState):
-    def __init__(self, players: List[AbstractPlayer], seed=None):
+    # the most times the largest-army/longest-road card may change hands in a game, as each holder
+    # has to exceed the previous one (see to_bytes)
+    _max_special_card_holders = 16
+    # the most combinations of trades and paths find_winning_move tries, so it's cheap even with many resources
+    _max_winning_move_combinations = 256
+
+    def __init__(self, players: List[AbstractPlayer], seed=None, board_layout: bytes=None):
+        """
+        :param board_layout: optional parameter. the layout of the map, as returned from Board.get_layout.
+        if it's given, the map isn't created from the seed
+        """
         assert seed is None or (isinstance(seed, int) and seed > 0)
 
         random_state = np.random.RandomState(seed)
         self._random_choice = random_state.choice
 
         self.players = players
-        self.board = Board(seed)
+        # the game data of the players, each player reaches its own record
+        self._players_states = [PlayerState() for _ in players]
+        for player, player_state in zip(players, self._players_states):
+            player.player_state = player_state
+        self.board = Board(seed, board_layout)
 
         self.turns_count = 0
         self._current_player_index = 0
@@ -48,52 +65,200 @@ class CatanState(AbstractState):
         self._player_with_largest_army = []
         self._player_with_longest_road = []
 
-        self.probabilities_by_dice_values = {}
-        for i, p in zip(range(2, 7), range(1, 6)):
-            self.probabilities_by_dice_values[i] = p / 36.0
-            self.probabilities_by_dice_values[14 - i] = p / 36.0
-        self.probabilities_by_dice_values[7] = 6 / 36.0
+        # points that aren't colonies' points (those are counted by the board): the largest-army and
+        # longest-road cards, and victory-point development-cards. indexed like self.players, and updated
+        # on make/unmake of moves and random-moves, so computing the scores doesn't require any traversal
+        self._players_indices = {player: i for i, player in enumerate(players)}
+        self._cards_points_by_player_index = [0] * len(players)
+
+        self.probabilities_by_dice_values = dict(Board.probabilities_by_dice_values)
 
         self._unexposed_dev_cards_counters = {card: DevelopmentCard.get_occurrences_in_deck_count(card)
                                               for card in DevelopmentCard}
         self._purchased_development_cards_in_current_turn_amount = 0
 
+        # every mutation of the state is recorded here as the (method, arguments) that undoes it.
+        # see checkpoint/rollback
+        self._journal = []
+        # the points in time the moves (and random moves) were made at, to revert them in LIFO order
+        self._moves_checkpoints = []
+
+        # the turn that is made sub-decision after sub-decision (see get_next_sub_moves): the move so far, and the
+        # stage of the next sub-decision. None when no such turn is in progress
+        self._turn_move = None
+        self._turn_stage = None
+        # the paths paved so far in the turn, each with the paths that could be paved when it was paved
+        self._turn_paved_paths = ()
+
+    def __deepcopy__(self, memo):
+        """
+        copy the state, without its journal.
+        the copy can't be rolled back to points in time before it was created
+        """
+        state = CatanState.__new__(CatanState)
+        memo[id(self)] = state
+        for name, value in self.__dict__.items():
+            if name in ('_journal', '_moves_checkpoints'):
+                state.__dict__[name] = []
+            else:
+                state.__dict__[name] = copy.deepcopy(value, memo)
+        return state
+
+    def to_bytes(self) -> bytes:
+        """
+        get a compact snapshot of the state: the dynamic data of the game (the data moves change) in a fixed
+        layout, followed by the board's layout and pieces. it takes a few hundred bytes.
+        the players are referred to by their index, so the players themselves (and their algorithms) aren't
+        part of the snapshot. nor is the journal, so the restored state can't unmake moves made before.
+        see from_bytes
+        :return: bytes, the snapshot
+        """
+        assert not self.is_turn_in_progress()
+        data = self._get_dynamic_data(self.current_dice_number)
+        return bytes(data) + self.board.get_layout() + self.board.pieces_to_bytes(self._players_indices)
+
+    def get_hash(self) -> int:
+        """
+        get a hash of the position: states that play the same from now on have the same hash, no matter the
+        moves that led to them. the dice value is only taken into account as whether it's 7 (the robber), so
+        i.e throws that don't give any resources lead to the same position. the layout of the board is left out,
+        as it doesn't change during the game. the hash is a digest of the position's bytes (unlike hash of bytes,
+        that is salted per interpreter), so it's the same in all the processes and runs
+        :return: int, the 64 bits hash of the position
+        """
+        assert not self.is_turn_in_progress()
+        data = self._get_dynamic_data(7 if self.current_dice_number == 7 else 0)
+        digest = hashlib.blake2b(bytes(data) + self.board.pieces_to_bytes(self._players_indices), digest_size=8)
+        return int.from_bytes(digest.digest(), 'little')
+
+    def _get_dynamic_data(self, dice_number: int) -> List[int]:
+        players_indices = self._players_indices
+        data = [len(self.players), self.turns_count % 256, self.turns_count // 256, self._current_player_index,
+                dice_number, self._purchased_development_cards_in_current_turn_amount]
+        data += [self._unexposed_dev_cards_counters[card] for card in DevelopmentCard]
+        deck_size = sum(DevelopmentCard.get_occurrences_in_deck_count(card) for card in DevelopmentCard)
+        data += [card.value + 1 for card in self._dev_cards] + [0] * (deck_size - len(self._dev_cards))
+        for holders in (self._player_with_largest_army, self._player_with_longest_road):
+            assert len(holders) <= CatanState._max_special_card_holders
+            for player, count in holders:
+                data += [players_indices[player] + 1, count]
+            data += [0, 0] * (CatanState._max_special_card_holders - len(holders))
+        data += self._cards_points_by_player_index
+        for player_state in self._players_states:
+            data += player_state.get_values()
+        return data
+
+    @staticmethod
+    def from_bytes(data: bytes, players: List[AbstractPlayer], seed=None):
+        """
+        restore a state from a snapshot. given players get the resources, pieces and development-cards in the
+        snapshot (as the records of the restored state, see PlayerState)
+        :param data: snapshot, as returned from to_bytes
+        :param players: the players of the game, in the same order as in the state the snapshot was taken of
+        :param seed: optional parameter. the seed of the restored state's random choices
+        :return: CatanState, the restored state
+        """
+        assert data[0] == len(players)
+        board_offset = len(data) - Board.layout_size - Board.pieces_size
+        state = CatanState(players, seed, data[board_offset:board_offset + Board.layout_size])
+        state.board.set_pieces_from_bytes(data[board_offset + Board.layout_size:], players)
+
+        values = iter(data[1:board_offset])
+        state.turns_count = next(values) + next(values) * 256
+        state._current_player_index = next(values)
+        state.current_dice_number = next(values)
+        state._purchased_development_cards_in_current_turn_amount = next(values)
+        for card in DevelopmentCard:
+            state._unexposed_dev_cards_counters[card] = next(values)
+        state._dev_cards = [DevelopmentCard(value - 1) for value in
+                            [next(values) for _ in range(len(state._dev_cards))] if value != 0]
+        for holders in (state._player_with_largest_army, state._player_with_longest_road):
+            for _ in range(CatanState._max_special_card_holders):
+                player_index, count = next(values), next(values)
+                if player_index != 0:
+                    holders.append((players[player_index - 1], count))
+        state._cards_points_by_player_index = [next(values) for _ in players]
+        for player_state in state._players_states:
+            player_state.set_values(values)
+        return state
+
     def is_final(self):
         """
         check if the current state in the game is final or not
         Returns:
             bool: indicating whether the current state is a final one
         """
-        players_points_count = self.get_scores_by_player_indexed()
-
-        highest_score = max(players_points_count)
-        return highest_score >= 10
+        for player, cards_points in zip(self.players, self._cards_points_by_player_index):
+            if self.board.get_colonies_score(player) + cards_points >= 10:
+                return True
+        return False
 
     def get_scores_by_player(self):
-        players_points_count = {player: self.board.get_colonies_score(player)
-                                for player in self.players}
-        player, _ = self._get_largest_army_player_and_size()
-        if player is not None:
-            players_points_count[player] += 2
-        player, _ = self._get_longest_road_player_and_length()
-        if player is not None:
-            players_points_count[player] += 2
-        for player in self.players:
-            players_points_count[player] += player.get_victory_point_development_cards_count()
-        return players_points_count
+        return {player: self.board.get_colonies_score(player) + cards_points
+                for player, cards_points in zip(self.players, self._cards_points_by_player_index)}
 
     def get_scores_by_player_indexed(self):
-        # TODO: Erez did it
-        players_points_count = [self.board.get_colonies_score(player) for player in self.players]
-        player, _ = self._get_largest_army_player_and_size()
-        if player is not None:
-            players_points_count[player.get_id()] += 2
-        player, _ = self._get_longest_road_player_and_length()
-        if player is not None:
-            players_points_count[player.get_id()] += 2
-        for player in self.players:
-            players_points_count[player.get_id()] += player.get_victory_point_development_cards_count()
-        return players_points_count
+        return [self.board.get_colonies_score(player) + cards_points
+                for player, cards_points in zip(self.players, self._cards_points_by_player_index)]
+
+    def add_victory_points(self, player, points: int):
+        """
+        update the score of given player with points that aren't given for colonies
+        (i.e victory-point development-cards). use negative points to revert
+        :param player: the player that received the points
+        :param points: the number of points to add
+        :return: None
+        """
+        if points == 0:
+            return
+        index = self._players_indices[player]
+        self.record_undo(self._cards_points_by_player_index.__setitem__,
+                         index, self._cards_points_by_player_index[index])
+        self._cards_points_by_player_index[index] += points
+
+    def checkpoint(self) -> int:
+        """
+        get the current point in time of the state, to roll it back to later on
+        :return: int, the point in time that can be given to rollback
+        """
+        return len(self._journal)
+
+    def rollback(self, to: int):
+        """
+        revert all the changes that were made to the state since given point in time.
+        it takes time linear in the number of changes, no matter how many moves were made
+        :param to: a point in time, as returned from checkpoint
+        :return: None
+        """
+        assert 0 <= to <= len(self._journal)
+        journal = self._journal
+        while len(journal) > to:
+            undo, args = journal.pop()
+            undo(*args)
+        # forget the moves that were reverted, if given point in time is before them
+        while self._moves_checkpoints and self._moves_checkpoints[-1] >= to:
+            self._moves_checkpoints.pop()
+
+    def record_undo(self, undo: Callable, *args):
+        """
+        record a change that was just made to the state, so it'll be reverted on rollback
+        NOTE: undo must not record changes itself
+        :param undo: the method that reverts the change
+        :param args: the arguments to call undo with
+        :return: None
+        """
+        self._journal.append((undo, args))
+
+    def set_journaled_attribute(self, obj, name: str, value):
+        """
+        set an attribute of an object that is part of the state, and record the change
+        :param obj: the object to set the attribute of
+        :param name: the name of the attribute
+        :param value: the new value of the attribute
+        :return: None
+        """
+        self.record_undo(setattr, obj, name, getattr(obj, name))
+        setattr(obj, name, value)
 
     def get_next_moves(self):
         """computes the next moves available from the current state
@@ -104,19 +269,268 @@ class CatanState(AbstractState):
             return self._get_initialisation_moves()
 
         if self.current_dice_number != 7:
-            empty_move = CatanMove(self.board.get_robber_land())
-            moves = [empty_move]
+            moves_placing_robber = [CatanMove(self.board.get_robber_land())]
         else:
-            moves = [CatanMove(land) for land in self.board.get_lands_to_place_robber_on()]
-        moves = self._get_all_possible_development_cards_exposure_moves(moves)
-        # _get_all_possible_trade_moves is assuming it's after dev_cards moves and nothing else
-        moves = self._get_all_possible_trade_moves(moves)
-        moves = self._get_all_possible_paths_moves(moves)
-        moves = self._get_all_possible_settlements_moves(moves)
-        moves = self._get_all_possible_cities_moves(moves)
-        moves = self._get_all_possible_development_cards_purchase_count_moves(moves)
+            moves_placing_robber = [CatanMove(land) for land in self.board.get_lands_to_place_robber_on()]
+        trades_options = self._get_trades_options()
+        moves = []
+        for move in moves_placing_robber:
+            self._build_development_cards_exposure_moves(move, trades_options, moves)
         return moves
 
+    # The moves are built depth-first, a stage (sub-decision) after another:
+    # development-card exposure, trades, paths, settlements, cities and development-cards purchases.
+    # Each _build_* method continues to the next stage with the move as is (doing nothing in this stage),
+    # and with every option of the stage: it applies the option on the state, continues to the next stage,
+    # and rolls the state back. That way every partial move is applied exactly once.
+    # The options are set on shallow copies of the move, so the moves share the lists they don't change.
+
+    def _build_development_cards_exposure_moves(self, move: CatanMove, trades_options, moves: List[CatanMove]):
+        self._build_trade_moves(move, trades_options, moves)
+        for new_move in self._expand_development_cards_exposure(move):
+            checkpoint = self.checkpoint()
+            self._apply_resources_updates(new_move)
+            self._apply_development_card_exposure(new_move)
+            # only these cards change the resources that can be traded. road-building's resources can only be
+            # used to pave roads
+            if (new_move.development_card_to_be_exposed == DevelopmentCard.YearOfPlenty or
+                    new_move.development_card_to_be_exposed == DevelopmentCard.Monopoly):
+                self._build_trade_moves(new_move, self._get_trades_options(), moves)
+            else:
+                self._build_trade_moves(new_move, trades_options, moves)
+            self.rollback(checkpoint)
+
+    def _build_trade_moves(self, move: CatanMove, trades_options, moves: List[CatanMove]):
+        self._build_paths_moves(move, moves)
+        for new_move in self._expand_trades(move, trades_options):
+            checkpoint = self.checkpoint()
+            self._apply_resources_exchanges(new_move)
+            self._build_paths_moves(new_move, moves)
+            self.rollback(checkpoint)
+
+    def _build_paths_moves(self, move: CatanMove, moves: List[CatanMove]):
+        # All the moves that expose road-building card and don't pave 2 new roads are illegal
+        if move.development_card_to_be_exposed != DevelopmentCard.RoadBuilding:
+            self._build_settlements_moves(move, moves)
+        for new_move in self._expand_paths(move):
+            checkpoint = self.checkpoint()
+            self._apply_paths(new_move)
+            self._build_settlements_moves(new_move, moves)
+            self.rollback(checkpoint)
+
+    def _build_settlements_moves(self, move: CatanMove, moves: List[CatanMove]):
+        self._build_cities_moves(move, moves)
+        for new_move in self._expand_settlements(move):
+            checkpoint = self.checkpoint()
+            self._apply_settlements(new_move)
+            self._build_cities_moves(new_move, moves)
+            self.rollback(checkpoint)
+
+    def _build_cities_moves(self, move: CatanMove, moves: List[CatanMove]):
+        moves.append(move)
+        moves.extend(self._expand_development_cards_purchases(move))
+        for new_move in self._expand_cities(move):
+            checkpoint = self.checkpoint()
+            self._apply_cities(new_move)
+            moves.append(new_move)
+            moves.extend(self._expand_development_cards_purchases(new_move))
+            self.rollback(checkpoint)
+
+    # The factored turn: instead of choosing the whole turn at once (a move of get_next_moves), the turn is made
+    # one sub-decision after another, in the order of TurnStage. a stage with several choices (i.e paths to pave)
+    # is a choice at a time, until choosing to do nothing more in it. that way each sub-decision has a few
+    # options, and the number of options of a turn is the sum of the stages' options rather than their product.
+    # stages without options are skipped. the robber is placed, and the cards the turn gained are given, when the
+    # turn ends (with the development-cards purchases). the choices of a stage are made in a canonical order, so
+    # the same choices aren't made in different orders (transpositions of the same turn).
+
+    def is_turn_in_progress(self) -> bool:
+        """
+        indicate whether a turn is being made sub-decision after sub-decision
+        :return: True if some sub-decisions of the turn were made but not the last one, False otherwise
+        """
+        return self._turn_move is not None
+
+    def get_next_sub_moves(self) -> List[CatanSubMove]:
+        """
+        computes the next sub-decisions of the current turn
+        :return: List[CatanSubMove], the options of the next sub-decision
+        """
+        if self.is_initialisation_phase():
+            return [CatanSubMove(move, None, move) for move in self._get_initialisation_moves()]
+
+        if self.is_turn_in_progress():
+            move, stage = self._turn_move, self._turn_stage
+        else:
+            move = CatanMove(self.board.get_robber_land())
+            stage = TurnStage.PlaceRobber if self.current_dice_number == 7 else TurnStage.ExposeDevelopmentCard
+        while True:
+            sub_moves = self._get_sub_moves_of_stage(move, stage)
+            if sub_moves:
+                return sub_moves
+            stage = TurnStage(stage.value + 1)
+
+    def make_sub_move(self, sub_move: CatanSubMove):
+        """
+        apply a sub-decision of the turn. the last sub-decision ends the turn, like make_move of the whole move
+        :param sub_move: sub-decision to apply, one of get_next_sub_moves
+        :return: None
+        """
+        self._moves_checkpoints.append(self.checkpoint())
+        stage, option, move = sub_move.stage, sub_move.option, sub_move.move
+        if stage is None:
+            self._apply_move(move)
+            self._end_turn(move)
+            return
+
+        if option is not None:
+            applied_move = CatanMove(move.robber_placement_land)
+            if stage == TurnStage.ExposeDevelopmentCard:
+                self._apply_resources_updates(move)
+                self._apply_development_card_exposure(move)
+            elif stage == TurnStage.Trade:
+                applied_move.resources_exchanges = [option]
+                self._apply_resources_exchanges(applied_move)
+            elif stage == TurnStage.Pave:
+                available_paths = frozenset(self.board.get_unpaved_paths_near_player(self.get_current_player()))
+                self.set_journaled_attribute(self, '_turn_paved_paths',
+                                             self._turn_paved_paths + ((option, available_paths),))
+                applied_move.paths_to_be_paved = [option]
+                self._apply_paths(applied_move)
+            elif stage == TurnStage.Settle:
+                applied_move.locations_to_be_set_to_settlements = [option]
+                self._apply_settlements(applied_move)
+            elif stage == TurnStage.SettleCity:
+                applied_move.locations_to_be_set_to_cities = [option]
+                self._apply_cities(applied_move)
+
+        if sub_move.is_ending_turn():
+            self._apply_development_cards_purchases(move)
+            self.record_undo(self.board.set_robber_land, self.board.get_robber_land())
+            self.board.set_robber_land(move.robber_placement_land)
+            self.set_journaled_attribute(self, '_turn_move', None)
+            self.set_journaled_attribute(self, '_turn_stage', None)
+            self.set_journaled_attribute(self, '_turn_paved_paths', ())
+            self._end_turn(move)
+            return
+
+        # the stages with several choices go on until choosing to do nothing more in them
+        if option is None or stage.value <= TurnStage.ExposeDevelopmentCard.value:
+            stage = TurnStage(stage.value + 1)
+        self.set_journaled_attribute(self, '_turn_move', move)
+        self.set_journaled_attribute(self, '_turn_stage', stage)
+
+    def unmake_sub_move(self, sub_move: CatanSubMove):
+        """
+        revert sub-decision
+        :param sub_move: sub-decision to revert. it must be the last move (or random move) that was made
+        :return: None
+        """
+        self.rollback(self._moves_checkpoints[-1])
+
+    def _get_sub_moves_of_stage(self, move: CatanMove, stage: TurnStage) -> List[CatanSubMove]:
+        """
+        get the options of the sub-decision in given stage, following given move (the turn so far)
+        :param move: the move of the turn so far (already applied)
+        :param stage: the stage to get the options of
+        :return: List[CatanSubMove], empty if there's nothing to choose in this stage
+        """
+        player = self.get_current_player()
+        options = []
+        if stage == TurnStage.PlaceRobber:
+            return [CatanSubMove(CatanMove(land), stage, land) for land in self.board.get_lands_to_place_robber_on()]
+        elif stage == TurnStage.ExposeDevelopmentCard:
+            options = [CatanSubMove(new_move, stage, new_move.development_card_to_be_exposed)
+                       for new_move in self._expand_development_cards_exposure(move)
+                       if (new_move.development_card_to_be_exposed != DevelopmentCard.RoadBuilding or
+                           self._can_pave_two_roads())]
+        elif stage == TurnStage.Trade:
+            last_exchange = move.resources_exchanges[-1] if move.resources_exchanges else None
+            for source_resource in Resource:
+                if player.get_resource_count(source_resource) < self._calc_curr_player_trade_ratio(source_resource):
+                    continue
+                for target_resource in Resource:
+                    # the trades are made in order, so the same trades aren't made in different orders
+                    if target_resource == source_resource or (
+                            last_exchange is not None and
+                            (source_resource.value, target_resource.value) <
+                            (last_exchange.source_resource.value, last_exchange.target_resource.value)):
+                        continue
+                    if (move.development_card_to_be_exposed == DevelopmentCard.RoadBuilding and
+                            not self._can_afford_two_roads_after_trade(source_resource, target_resource)):
+                        continue
+                    new_move = copy.copy(move)
+                    new_move.resources_exchanges = move.resources_exchanges + [
+                        ResourceExchange(source_resource, target_resource, 1)]
+                    options.append(CatanSubMove(new_move, stage, new_move.resources_exchanges[-1]))
+        elif stage == TurnStage.Pave:
+            if player.can_pave_road():
+                for path in self.board.get_unpaved_paths_near_player(player):
+                    # the paths are paved in order, so the same roads aren't paved in different orders. a path may
+                    # come before a greater one, only if it couldn't be paved when the greater one was paved
+                    if any(path < paved_path and path in available_paths
+                           for paved_path, available_paths in self._turn_paved_paths):
+                        continue
+                    new_move = copy.copy(move)
+                    new_move.paths_to_be_paved = frozenset(move.paths_to_be_paved) | {path}
+                    options.append(CatanSubMove(new_move, stage, path))
+            # All the moves that expose road-building card and don't pave 2 new roads are illegal
+            if (move.development_card_to_be_exposed == DevelopmentCard.RoadBuilding and
+                    len(move.paths_to_be_paved) < 2):
+                return options
+        elif stage == TurnStage.Settle:
+            if player.can_settle_settlement():
+                locations = move.locations_to_be_set_to_settlements
+                for location in self.board.get_settleable_locations_by_player(player):
+                    # the settlements are settled in order, so the same settlements aren't settled in different orders
+                    if locations and location < locations[-1]:
+                        continue
+                    new_move = copy.copy(move)
+                    new_move.locations_to_be_set_to_settlements = locations + [location]
+                    options.append(CatanSubMove(new_move, stage, location))
+        elif stage == TurnStage.SettleCity:
+            if player.can_settle_city():
+                locations = move.locations_to_be_set_to_cities
+                for location in self.board.get_settlements_by_player(player):
+                    if locations and location < locations[-1]:
+                        continue
+                    new_move = copy.copy(move)
+                    new_move.locations_to_be_set_to_cities = locations + [location]
+                    options.append(CatanSubMove(new_move, stage, location))
+        else:
+            assert stage == TurnStage.PurchaseDevelopmentCards
+            return [CatanSubMove(new_move, stage, new_move.development_cards_to_be_purchased_count)
+                    for new_move in [move] + self._expand_development_cards_purchases(move)]
+
+        if not options:
+            return options
+        return options + [CatanSubMove(move, stage)]
+
+    def _can_afford_two_roads_after_trade(self, source_resource: Resource, target_resource: Resource) -> bool:
+        """
+        indicate whether the current player can still afford two roads (i.e of road-building card) after a trade
+        :param source_resource: the resource the player gives
+        :param target_resource: the resource the player gets
+        :return: True if the player has the resources for two roads after the trade, False otherwise
+        """
+        player = self.get_current_player()
+        ratio = self._calc_curr_player_trade_ratio(source_resource)
+        for resource in (Resource.Brick, Resource.Lumber):
+            count = (player.get_resource_count(resource) -
+                     ratio * (resource == source_resource) + (resource == target_resource))  # c style
+            if count < 2:
+                return False
+        return True
+
+    def _can_pave_two_roads(self) -> bool:
+        """
+        indicate whether the current player has paths to pave two roads at (i.e using road-building card)
+        :return: True if there are two paths the current player can pave one after the other, False otherwise
+        """
+        player = self.get_current_player()
+        return (player.pieces[Road.Paved] >= 2 and
+                any(len(option) == 2 for option in self._paths_options_up_to_i_chosen(2)))
+
     def get_random_move(self):
         if self.current_dice_number != 7:
             move = CatanMove(self.board.get_robber_land())
@@ -134,33 +548,172 @@ class CatanState(AbstractState):
         move = self._get_random_card_purchases_count_move(move, player)
         return move
 
+    def find_winning_move(self, deadline: Deadline=None) -> Union[CatanMove, None]:
+        """
+        find a move that makes the current player win in the current turn, without enumerating all the moves.
+        the missing points are looked for greedily: largest-army card (exposing a knight), trades, longest-road
+        card (paving the fewest roads that may cross the threshold), and as many settlements and cities as
+        affordable. other development cards aren't considered. each candidate is verified by making it.
+        it's cheap when no win is possible, since the points the player may gain are bounded first. otherwise, at
+        most _max_winning_move_combinations combinations of trades and paths are tried, and the search gives up once
+        the deadline expires
+        :param deadline: optional deadline of the search (i.e the deadline of the turn)
+        :return: a winning move if one was found, None otherwise
+        """
+        if self.is_initialisation_phase():
+            return None
+        player = self.get_current_player()
+        missing_points = 10 - self.get_scores_by_player_indexed()[self._current_player_index]
+
+        player_with_largest_army, size_threshold = self._get_largest_army_player_and_size()
+        can_get_largest_army = (player_with_largest_army is not player and
+                                player.unexposed_development_cards[DevelopmentCard.Knight] > 0 and
+                                player.get_exposed_knights_count() + 1 > size_threshold)
+        player_with_longest_road, length_threshold = self._get_longest_road_player_and_length()
+        roads_for_longest_road = length_threshold + 1 - self.board.get_longest_road_length_of_player(player)
+        can_get_longest_road = (player_with_longest_road is not player and
+                                roads_for_longest_road <= player.amount_of_roads_can_afford())
+        # a settlement costs 4 resources and a city 5, so with trades, each point costs at least 4 resources
+        max_colonies_points = min(sum(player.resources.values()) // 4,
+                                  player.pieces[Colony.Settlement] + player.pieces[Colony.City])
+        max_cards_points = 2 * can_get_largest_army + 2 * can_get_longest_road
+        if max_cards_points + max_colonies_points < missing_points:
+            return None
+
+        if self.current_dice_number != 7:
+            move = CatanMove(self.board.get_robber_land())
+        else:
+            move = CatanMove(self.board.get_lands_to_place_robber_on()[0])
+        moves = [move]
+        if can_get_largest_army:
+            moves += [new_move for new_move in self._expand_development_cards_exposure(move)
+                      if new_move.development_card_to_be_exposed == DevelopmentCard.Knight][:1]
+        trades_options = self._get_trades_options()
+        # the trades don't change the board, so the paths are the same for all of them
+        paths_options = []
+        if can_get_longest_road:
+            paths_options = [option for option in set(frozenset(p) for p in
+                                                      self._paths_options_up_to_i_chosen(roads_for_longest_road))
+                             if len(option) == roads_for_longest_road]
+
+        candidates = []
+        combinations_count = 0
+
+        def should_stop() -> bool:
+            return (combinations_count >= CatanState._max_winning_move_combinations or
+                    (deadline is not None and deadline.is_expired()))
+
+        for move in moves:
+            checkpoint = self.checkpoint()
+            self._apply_development_card_exposure(move)
+            for trade_move in [move] + self._expand_trades(move, trades_options):
+                if should_stop():
+                    break
+                trade_checkpoint = self.checkpoint()
+                self._apply_resources_exchanges(trade_move)
+                paths_moves = [trade_move]
+                if roads_for_longest_road <= player.amount_of_roads_can_afford():
+                    for option in paths_options:
+                        paths_move = copy.copy(trade_move)
+                        paths_move.paths_to_be_paved = option
+                        paths_moves.append(paths_move)
+                for paths_move in paths_moves:
+                    if should_stop():
+                        break
+                    combinations_count += 1
+                    paths_checkpoint = self.checkpoint()
+                    self._apply_paths(paths_move)
+                    new_move, colonies_points = self._get_max_colonies_move(paths_move)
+                    self.rollback(paths_checkpoint)
+                    cards_points = (2 * (new_move.development_card_to_be_exposed == DevelopmentCard.Knight) +
+                                    2 * (len(new_move.paths_to_be_paved) != 0))  # c style
+                    if cards_points + colonies_points >= missing_points:
+                        candidates.append(new_move)
+                self.rollback(trade_checkpoint)
+            self.rollback(checkpoint)
+
+        if deadline is not None and deadline.is_expired():
+            return None
+        for move in candidates:
+            self.make_move(move)
+            is_winning = self.get_scores_by_player_indexed()[self._current_player_index] >= 10
+            self.unmake_move(move)
+            if is_winning:
+                return move
+        return None
+
+    def _get_max_colonies_move(self, move: CatanMove) -> Tuple[CatanMove, int]:
+        """
+        get the move that settles as many settlements and cities as the current player can afford (greedily),
+        in addition to given (already applied) move
+        :param move: move that doesn't settle settlements or cities
+        :return: Tuple[CatanMove, int], new move (given move isn't changed), and the number of colonies it settles
+        """
+        player = self.get_current_player()
+        checkpoint = self.checkpoint()
+        settlements_locations = []
+        while player.can_settle_settlement():
+            # settle the location that leaves the most locations to settle
+            best_location, best_locations_count = None, -1
+            for location in self.board.get_settleable_locations_by_player(player):
+                self.board.set_location(player, location, Colony.Settlement)
+                locations_count = len(self.board.get_settleable_locations_by_player(player))
+                self.board.set_location(player, location, Colony.Uncolonised)
+                if locations_count > best_locations_count:
+                    best_location, best_locations_count = location, locations_count
+            if best_location is None:
+                break
+            settlements_locations.append(best_location)
+            settlement_move = copy.copy(move)
+            settlement_move.locations_to_be_set_to_settlements = [best_location]
+            self._apply_settlements(settlement_move)
+        self.rollback(checkpoint)
+
+        # every settlement costs grain that cities may need, so fewer settlements may give more points
+        best_move, best_points = move, 0
+        for settlements_count in range(len(settlements_locations), -1, -1):
+            new_move = copy.copy(move)
+            new_move.locations_to_be_set_to_settlements = settlements_locations[:settlements_count]
+            self._apply_settlements(new_move)
+            cities_locations = self.board.get_settlements_by_player(player)[:player.amount_of_cities_can_afford()]
+            self.rollback(checkpoint)
+            if settlements_count + len(cities_locations) > best_points:
+                new_move.locations_to_be_set_to_cities = cities_locations
+                best_move, best_points = new_move, settlements_count + len(cities_locations)
+        return best_move, best_points
+
     def make_move(self, move: CatanMove):
         """
         apply move
         :param move: move to apply
         :return: None
         """
-        self.turns_count += 1
-        self._pretend_to_make_a_move(move)
-
-        self._update_longest_road(move)
-        self._update_largest_army(move)
-
-        self._purchased_development_cards_in_current_turn_amount = move.development_cards_to_be_purchased_count
+        assert not self.is_turn_in_progress()
+        self._moves_checkpoints.append(self.checkpoint())
+        self._apply_move(move)
+        self._end_turn(move)
 
     def unmake_move(self, move: CatanMove):
         """
         revert move
-        :param move: move to revert
+        :param move: move to revert. it must be the last move (or random move) that was made
         :return: None
         """
-        self._purchased_development_cards_in_current_turn_amount = 0
+        self.rollback(self._moves_checkpoints[-1])
 
-        self._revert_update_longest_road(move)
-        self._revert_update_largest_army(move)
+    def _end_turn(self, move: CatanMove):
+        """
+        advance the turn, after given move of the turn was applied, and give the cards it gained
+        :param move: the move of the turn
+        :return: None
+        """
+        self.set_journaled_attribute(self, 'turns_count', self.turns_count + 1)
 
-        self._unpretend_to_make_a_move(move)
-        self.turns_count -= 1
+        self._update_longest_road(move)
+        self._update_largest_army(move)
+
+        self.set_journaled_attribute(self, '_purchased_development_cards_in_current_turn_amount',
+                                     move.development_cards_to_be_purchased_count)
 
     def get_next_random_moves(self) -> List[RandomMove]:
         if self.is_initialisation_phase():
@@ -170,16 +723,19 @@ class CatanState(AbstractState):
             for purchase_option, purchase_probability in self._get_all_possible_development_cards_purchase_options(
                     self._purchased_development_cards_in_current_turn_amount):
                 random_moves.append(
-                    RandomMove(dice_value, dice_probability * purchase_probability, self, purchase_option))
+                    RandomMove(dice_value, dice_probability * purchase_probability, self, purchase_option,
+                               is_simulated=True))
         return random_moves
 
     def make_random_move(self, random_move: RandomMove = None):
+        self._moves_checkpoints.append(self.checkpoint())
         if random_move is None:
             rolled_dice_value = self._random_choice(a=list(self.probabilities_by_dice_values.keys()),
                                                     p=list(self.probabilities_by_dice_values.values()))
             purchased_development_cards = defaultdict(int)
             for _ in range(self._purchased_development_cards_in_current_turn_amount):
                 card = self.pop_development_card()
+                self.record_undo(self._dev_cards.append, card)
                 purchased_development_cards[card] += 1
 
             random_move = RandomMove(rolled_dice=rolled_dice_value,
@@ -187,24 +743,24 @@ class CatanState(AbstractState):
                                      state=self,
                                      development_card_purchases=purchased_development_cards)
         random_move.apply()
-        self._purchased_development_cards_in_current_turn_amount = 0
+        self.set_journaled_attribute(self, '_purchased_development_cards_in_current_turn_amount', 0)
 
         # Updating the current_player_index (Default - next player, Initilisation Phase - next/same/previous player).
         if self.turns_count == len(self.players) or self.turns_count == 2 * len(self.players):
             return
         elif len(self.players) < self.turns_count < 2 * len(self.players):
-            self._current_player_index = (self._current_player_index - 1) % len(self.players)
+            next_player_index = (self._current_player_index - 1) % len(self.players)
         else:
-            self._current_player_index = (self._current_player_index + 1) % len(self.players)
+            next_player_index = (self._current_player_index + 1) % len(self.players)
+        self.set_journaled_attribute(self, '_current_player_index', next_player_index)
 
     def unmake_random_move(self, random_move: RandomMove):
-        if self.turns_count == len(self.players) or self.turns_count == 2 * len(self.players):
-            pass
-        elif len(self.players) < self.turns_count < 2 * len(self.players):
-            self._current_player_index = (self._current_player_index + 1) % len(self.players)
-        else:
-            self._current_player_index = (self._current_player_index - 1) % len(self.players)
-        random_move.revert()
+        """
+        revert random move
+        :param random_move: random move to revert. it must be the last move (or random move) that was made
+        :return: None
+        """
+        self.rollback(self._moves_checkpoints[-1])
 
     def get_current_player(self):
         """returns the player that should play next"""
@@ -229,11 +785,9 @@ class CatanState(AbstractState):
 
         if longest_road_length > length_threshold:
             self._player_with_longest_road.append((self.get_current_player(), longest_road_length))
-            move.did_get_longest_road_card = True
-
-    def _revert_update_longest_road(self, move: CatanMove):
-        if move.did_get_longest_road_card:
-            self._player_with_longest_road.pop()
+            self.record_undo(self._player_with_longest_road.pop)
+            self._transfer_card_points(player_with_longest_road, self.get_current_player())
+            self.set_journaled_attribute(move, 'did_get_longest_road_card', True)
 
     def _update_largest_army(self, move: CatanMove):
         if move.development_card_to_be_exposed != DevelopmentCard.Knight:
@@ -244,11 +798,21 @@ class CatanState(AbstractState):
 
         if army_size > size_threshold:
             self._player_with_largest_army.append((self.get_current_player(), army_size))
-            move.did_get_largest_army_card = True
+            self.record_undo(self._player_with_largest_army.pop)
+            self._transfer_card_points(player_with_largest_army, self.get_current_player())
+            self.set_journaled_attribute(move, 'did_get_largest_army_card', True)
 
-    def _revert_update_largest_army(self, move: CatanMove):
-        if move.did_get_largest_army_card:
-            self._player_with_largest_army.pop()
+    def _transfer_card_points(self, previous_holder, new_holder):
+        """
+        move the 2 points of the largest-army/longest-road card between players
+        :param previous_holder: the player that held the card, None if no-one held it
+        :param new_holder: the player that holds the card now, None if no-one holds it
+        :return: None
+        """
+        if previous_holder is not None:
+            self.add_victory_points(previous_holder, -2)
+        if new_holder is not None:
+            self.add_victory_points(new_holder, 2)
 
     def _get_longest_road_player_and_length(self) -> Tuple[None, int]:
         """
@@ -317,42 +881,44 @@ class CatanState(AbstractState):
         :param moves: moves so far
         :return: moves with trades
         """
-        player = self.get_current_player()
+        no_dev_card_side_effect_trades = self._get_trades_options()
         new_moves = []
-
-        no_dev_card_side_effect_trades = []
-        for source_resource in Resource:
-
-            max_num_of_trades = (int(player.get_resource_count(source_resource) /
-                                     self._calc_curr_player_trade_ratio(source_resource)))
-            for i in range(1, max_num_of_trades + 1):
-                no_dev_card_side_effect_trades += self._trade_options_with_i_trades_and_min_resource_index(i,
-                                                                                                           source_resource,
-                                                                                                           FirsResourceIndex)
-
         for move in moves:
             # assuming it's after dev_cards moves and nothing else (bad programming but better performance)
             if (move.development_card_to_be_exposed == DevelopmentCard.YearOfPlenty or
                     move.development_card_to_be_exposed == DevelopmentCard.Monopoly):
                 self._pretend_to_make_a_move(move)
-                for source_resource in Resource:
-                    max_num_of_trades = int(player.get_resource_count(source_resource) /
-                                            self._calc_curr_player_trade_ratio(source_resource))
-                    for i in range(1, max_num_of_trades + 1):
-                        for trades in self._trade_options_with_i_trades_and_min_resource_index(i, source_resource,
-                                                                                               FirsResourceIndex):
-                            new_move = copy.deepcopy(move)
-                            new_move.resources_exchanges = trades
-                            new_moves.append(new_move)
+                new_moves += self._expand_trades(move, self._get_trades_options())
                 self._unpretend_to_make_a_move(move)
             else:
-                for trades in no_dev_card_side_effect_trades:
-                    new_move = copy.deepcopy(move)
-                    new_move.resources_exchanges = trades
-                    new_moves.append(new_move)
+                new_moves += self._expand_trades(move, no_dev_card_side_effect_trades)
 
         return moves + new_moves
 
+    def _get_trades_options(self) -> List[List[ResourceExchange]]:
+        """
+        get all the trades combinations the current player can make, given his current resources
+        :return: List[List[ResourceExchange]], each list is an option to set the 'resources_exchanges' of a move to
+        """
+        player = self.get_current_player()
+        trades_options = []
+        for source_resource in Resource:
+            max_num_of_trades = (int(player.get_resource_count(source_resource) /
+                                     self._calc_curr_player_trade_ratio(source_resource)))
+            for i in range(1, max_num_of_trades + 1):
+                trades_options += self._trade_options_with_i_trades_and_min_resource_index(i, source_resource,
+                                                                                           FirsResourceIndex)
+        return trades_options
+
+    @staticmethod
+    def _expand_trades(move: CatanMove, trades_options) -> List[CatanMove]:
+        new_moves = []
+        for trades in trades_options:
+            new_move = copy.copy(move)
+            new_move.resources_exchanges = trades
+            new_moves.append(new_move)
+        return new_moves
+
     def _trade_options_with_i_trades_and_min_resource_index(self, i, source_resource, min_resource_index) \
             -> List[List[ResourceExchange]]:
         """
@@ -442,59 +1008,53 @@ class CatanState(AbstractState):
 
 
     def _get_all_possible_development_cards_exposure_moves(self, moves: List[CatanMove]) -> List[CatanMove]:
+        new_moves = []
+        for move in moves:
+            new_moves += self._expand_development_cards_exposure(move)
+        return moves + new_moves
+
+    def _expand_development_cards_exposure(self, move: CatanMove) -> List[CatanMove]:
+        """
+        get the moves that expose a development card of the current player, in addition to given move.
+        knight card moves the robber, unless given move already moves it (when the dice rolled 7)
+        :param move: move that doesn't expose a card
+        :return: List[CatanMove], new moves (given move isn't changed)
+        """
         player = self.get_current_player()
         new_moves = []
         if not player.has_unexposed_development_card():
-            return moves
+            return new_moves
 
         for dev_card_type in DevelopmentCard:
             if dev_card_type == DevelopmentCard.VictoryPoint or player.unexposed_development_cards[dev_card_type] == 0:  # player doesn't have this card
                 continue
-            for move in moves:
-                new_move = copy.deepcopy(move)
-                new_move.development_card_to_be_exposed = dev_card_type
-                new_moves.append(new_move)
-        # Knight
-        knight_applied_moves, non_knight_applied_moves = [], []
-        for move in new_moves:
-            if move.development_card_to_be_exposed != DevelopmentCard.Knight or \
-                            move.robber_placement_land != self.board.get_robber_land():
-                non_knight_applied_moves.append(move)
-                continue
-            for land in self.board.get_lands_to_place_robber_on():
-                new_move = copy.deepcopy(move)
-                new_move.robber_placement_land = land
-                knight_applied_moves.append(new_move)
-        new_moves = knight_applied_moves + non_knight_applied_moves
-        # year of plenty
-        year_of_plenty_applied_moves = []
-        moves_without_y_o_p = []
-        for move in new_moves:
-            if move.development_card_to_be_exposed == DevelopmentCard.YearOfPlenty:
+            if (dev_card_type == DevelopmentCard.Knight and
+                    move.robber_placement_land == self.board.get_robber_land()):
+                for land in self.board.get_lands_to_place_robber_on():
+                    new_move = copy.copy(move)
+                    new_move.development_card_to_be_exposed = dev_card_type
+                    new_move.robber_placement_land = land
+                    new_moves.append(new_move)
+            elif dev_card_type == DevelopmentCard.YearOfPlenty:
                 for two_cards in combinations_with_replacement(Resource, 2):
-                    new_move = copy.deepcopy(move)
+                    new_move = copy.copy(move)
+                    new_move.development_card_to_be_exposed = dev_card_type
                     if two_cards[0] != two_cards[1]:  # two different cards
-                        new_move.resources_updates[two_cards[0]] = 1
-                        new_move.resources_updates[two_cards[1]] = 1
+                        new_move.resources_updates = {two_cards[0]: 1, two_cards[1]: 1}
                     else:  # same card twice
-                        new_move.resources_updates[two_cards[0]] = 2
-                    year_of_plenty_applied_moves.append(new_move)
-            else:
-                moves_without_y_o_p.append(move)
-        new_moves = moves_without_y_o_p + year_of_plenty_applied_moves
-        # monopoly
-        monopoly_applied_moves = []
-        moves_without_monopoly = []
-        for move in new_moves:
-            if move.development_card_to_be_exposed == DevelopmentCard.Monopoly:
+                        new_move.resources_updates = {two_cards[0]: 2}
+                    new_moves.append(new_move)
+            elif dev_card_type == DevelopmentCard.Monopoly:
                 for resource in Resource:
-                    new_move = copy.deepcopy(move)
+                    new_move = copy.copy(move)
+                    new_move.development_card_to_be_exposed = dev_card_type
                     new_move.monopoly_card = resource
-                    monopoly_applied_moves.append(new_move)
+                    new_moves.append(new_move)
             else:
-                moves_without_monopoly.append(move)
-        new_moves = moves_without_monopoly + monopoly_applied_moves
-        return moves + new_moves
+                new_move = copy.copy(move)
+                new_move.development_card_to_be_exposed = dev_card_type
+                new_moves.append(new_move)
+        return new_moves
 
     def _get_random_paths_move(self, move: CatanMove, player):
         min_paths = 0
@@ -514,26 +1074,41 @@ class CatanState(AbstractState):
         return move
 
     def _get_all_possible_paths_moves(self, moves: List[CatanMove]) -> List[CatanMove]:
-        player = self.get_current_player()
         new_moves = []
         for move in moves:
             self._pretend_to_make_a_move(move)
-            if player.can_pave_road():  # optimization
-                paths_options_with_duplicates = self._paths_options_up_to_i_chosen(player.amount_of_roads_can_afford())
-                paths_options = set(frozenset(p) for p in paths_options_with_duplicates)
-                for option in paths_options:
-                    new_move = copy.deepcopy(move)
-                    new_move.paths_to_be_paved = option
-                    new_moves.append(new_move)
+            new_moves += self._expand_paths(move)
             self._unpretend_to_make_a_move(move)
 
         # RoadBuilding
-        if player.unexposed_development_cards[DevelopmentCard.RoadBuilding] == 0:  # optimization
+        if self.get_current_player().unexposed_development_cards[DevelopmentCard.RoadBuilding] == 0:  # optimization
             return moves + new_moves
         return [move for move in moves + new_moves if
                 len(move.paths_to_be_paved) >=
                 2 * (move.development_card_to_be_exposed == DevelopmentCard.RoadBuilding)]  # c style
 
+    def _expand_paths(self, move: CatanMove) -> List[CatanMove]:
+        """
+        get the moves that pave roads, in addition to given (already applied) move.
+        if the move exposes road-building card, only the options with at least 2 roads are returned
+        :param move: move that doesn't pave roads
+        :return: List[CatanMove], new moves (given move isn't changed)
+        """
+        player = self.get_current_player()
+        new_moves = []
+        if not player.can_pave_road():  # optimization
+            return new_moves
+        min_paths_count = 2 * (move.development_card_to_be_exposed == DevelopmentCard.RoadBuilding)  # c style
+        paths_options_with_duplicates = self._paths_options_up_to_i_chosen(player.amount_of_roads_can_afford())
+        paths_options = set(frozenset(p) for p in paths_options_with_duplicates)
+        for option in paths_options:
+            if len(option) < min_paths_count:
+                continue
+            new_move = copy.copy(move)
+            new_move.paths_to_be_paved = option
+            new_moves.append(new_move)
+        return new_moves
+
     def _get_random_paving_option(self, i, player):
         if i == 0:
             return set()
@@ -596,20 +1171,32 @@ class CatanState(AbstractState):
         return move
 
     def _get_all_possible_settlements_moves(self, moves: List[CatanMove]) -> List[CatanMove]:
-        player = self.get_current_player()
         new_moves = []
         for move in moves:
             self._pretend_to_make_a_move(move)
-            locations = self.board.get_settleable_locations_by_player(player)
-            for i in range(1, player.amount_of_settlements_can_afford() + 1):
-                settlement_options = self._locations_options_i_chosen_min_location_index(i, locations)
-                for option in settlement_options:
-                    new_move = copy.deepcopy(move)
-                    new_move.locations_to_be_set_to_settlements = option
-                    new_moves.append(new_move)
+            new_moves += self._expand_settlements(move)
             self._unpretend_to_make_a_move(move)
         return moves + new_moves
 
+    def _expand_settlements(self, move: CatanMove) -> List[CatanMove]:
+        """
+        get the moves that settle settlements, in addition to given (already applied) move
+        :param move: move that doesn't settle settlements
+        :return: List[CatanMove], new moves (given move isn't changed)
+        """
+        player = self.get_current_player()
+        new_moves = []
+        settlements_count = player.amount_of_settlements_can_afford()
+        if settlements_count == 0:  # optimization
+            return new_moves
+        locations = self.board.get_settleable_locations_by_player(player)
+        for i in range(1, settlements_count + 1):
+            for option in self._locations_options_i_chosen_min_location_index(i, locations):
+                new_move = copy.copy(move)
+                new_move.locations_to_be_set_to_settlements = option
+                new_moves.append(new_move)
+        return new_moves
+
     def _get_random_cities_move(self, move: CatanMove, player):
         self._pretend_to_make_a_move(move)
         locations = self.board.get_settlements_by_player(player)
@@ -625,20 +1212,24 @@ class CatanState(AbstractState):
         move.locations_to_be_set_to_cities = new_cities_locations
         return move
 
-    def _get_all_possible_cities_moves(self, moves: List[CatanMove]) -> List[CatanMove]:
+    def _expand_cities(self, move: CatanMove) -> List[CatanMove]:
+        """
+        get the moves that settle cities, in addition to given (already applied) move
+        :param move: move that doesn't settle cities
+        :return: List[CatanMove], new moves (given move isn't changed)
+        """
         player = self.get_current_player()
         new_moves = []
-        for move in moves:
-            self._pretend_to_make_a_move(move)
-            locations = self.board.get_settlements_by_player(player)
-            for i in range(1, player.amount_of_cities_can_afford() + 1):
-                settlement_options = self._locations_options_i_chosen_min_location_index(i, locations)
-                for option in settlement_options:
-                    new_move = copy.deepcopy(move)
-                    new_move.locations_to_be_set_to_cities = option
-                    new_moves.append(new_move)
-            self._unpretend_to_make_a_move(move)
-        return moves + new_moves
+        cities_count = player.amount_of_cities_can_afford()
+        if cities_count == 0:  # optimization
+            return new_moves
+        locations = self.board.get_settlements_by_player(player)
+        for i in range(1, cities_count + 1):
+            for option in self._locations_options_i_chosen_min_location_index(i, locations):
+                new_move = copy.copy(move)
+                new_move.locations_to_be_set_to_cities = option
+                new_moves.append(new_move)
+        return new_moves
 
     def _locations_options_i_chosen_min_location_index(self, i: int, locations: List[Location],
                                                        min_location_index=0) -> List[List[Location]]:
@@ -678,20 +1269,25 @@ class CatanState(AbstractState):
         move.development_cards_to_be_purchased_count += num_cards
         return move
 
-    def _get_all_possible_development_cards_purchase_count_moves(self, moves: List[CatanMove]) -> List[CatanMove]:
+    def _expand_development_cards_purchases(self, move: CatanMove) -> List[CatanMove]:
+        """
+        get the moves that purchase development cards, in addition to given (already applied) move
+        :param move: move that doesn't purchase development cards
+        :return: List[CatanMove], new moves (given move isn't changed)
+        """
         player = self.get_current_player()
         new_moves = []
-        for move in moves:
-            self._pretend_to_make_a_move(move)
-            if (player.has_resources_for_development_card() and
-                    len(self._dev_cards) > move.development_cards_to_be_purchased_count):
-                new_move = copy.deepcopy(move)
-                new_move.development_cards_to_be_purchased_count += 1
-                new_moves.append(new_move)
-            self._unpretend_to_make_a_move(move)
-        if not new_moves:  # End of recursion
-            return moves
-        return moves + self._get_all_possible_development_cards_purchase_count_moves(new_moves)
+        if not player.has_resources_for_development_card():  # optimization
+            return new_moves
+        max_cards_count = min(player.get_resource_count(Resource.Wool),
+                              player.get_resource_count(Resource.Grain),
+                              player.get_resource_count(Resource.Ore),
+                              len(self._dev_cards))
+        for cards_count in range(1, max_cards_count + 1):
+            new_move = copy.copy(move)
+            new_move.development_cards_to_be_purchased_count = cards_count
+            new_moves.append(new_move)
+        return new_moves
 
     def _get_all_possible_development_cards_purchase_options(
             self, cards_to_purchase_count: int,
@@ -726,11 +1322,38 @@ class CatanState(AbstractState):
         return with_card + without_card
 
     def _pretend_to_make_a_move(self, move: CatanMove):
+        self._moves_checkpoints.append(self.checkpoint())
+        self._apply_move(move)
+
+    def _unpretend_to_make_a_move(self, move: CatanMove):
+        self.rollback(self._moves_checkpoints[-1])
+
+    def _apply_move(self, move: CatanMove):
+        """
+        apply the side effects of the move, recording each of them in the journal
+        (it doesn't advance the turn - see make_move)
+        :param move: move to apply
+        :return: None
+        """
+        self._apply_resources_updates(move)
+        self.record_undo(self.board.set_robber_land, self.board.get_robber_land())
+        self.board.set_robber_land(move.robber_placement_land)
+        self._apply_development_card_exposure(move)
+        self._apply_resources_exchanges(move)
+        self._apply_paths(move)
+        self._apply_settlements(move)
+        self._apply_cities(move)
+        self._apply_development_cards_purchases(move)
+
+    def _apply_resources_updates(self, move: CatanMove):
         player = self.get_current_player()
         player.update_resources(move.resources_updates, AbstractPlayer.add_resource)
-        previous_robber_land_placement = self.board.get_robber_land()
-        self.board.set_robber_land(move.robber_placement_land)
-        move.robber_placement_land = previous_robber_land_placement
+        self.record_undo(player.update_resources, move.resources_updates, AbstractPlayer.remove_resource)
+
+    def _apply_development_card_exposure(self, move: CatanMove):
+        if move.development_card_to_be_exposed is None:
+            return
+        player = self.get_current_player()
         if move.development_card_to_be_exposed == DevelopmentCard.RoadBuilding:
             self._apply_road_building_dev_card_side_effect(1)
         elif move.development_card_to_be_exposed == DevelopmentCard.Monopoly:
@@ -740,62 +1363,55 @@ class CatanState(AbstractState):
                     continue
                 resource = move.monopoly_card
                 resource_count = other_player.get_resource_count(resource)
-                move.monopoly_card_debt[other_player] = resource_count
                 other_player.remove_resource(resource, resource_count)
                 player.add_resource(resource, resource_count)
-        if move.development_card_to_be_exposed is not None:
-            player.expose_development_card(move.development_card_to_be_exposed)
-            self._unexposed_dev_cards_counters[move.development_card_to_be_exposed] -= 1
-            assert self._unexposed_dev_cards_counters[move.development_card_to_be_exposed] >= 0
+                self.record_undo(other_player.add_resource, resource, resource_count)
+                self.record_undo(player.remove_resource, resource, resource_count)
+        card = move.development_card_to_be_exposed
+        player.expose_development_card(card)
+        self.record_undo(player.un_expose_development_card, card)
+        self.record_undo(self._unexposed_dev_cards_counters.__setitem__,
+                         card, self._unexposed_dev_cards_counters[card])
+        self._unexposed_dev_cards_counters[card] -= 1
+        assert self._unexposed_dev_cards_counters[card] >= 0
+
+    def _apply_resources_exchanges(self, move: CatanMove):
+        player = self.get_current_player()
         for exchange in move.resources_exchanges:
-            player.trade_resources(exchange.source_resource, exchange.target_resource, exchange.count,
-                                   self._calc_curr_player_trade_ratio(exchange.source_resource))
+            ratio = self._calc_curr_player_trade_ratio(exchange.source_resource)
+            player.trade_resources(exchange.source_resource, exchange.target_resource, exchange.count, ratio)
+            self.record_undo(player.un_trade_resources,
+                             exchange.source_resource, exchange.target_resource, exchange.count, ratio)
+
+    def _apply_paths(self, move: CatanMove):
+        player = self.get_current_player()
         for path in move.paths_to_be_paved:
             self.board.set_path(player, path, Road.Paved)
             player.remove_resources_and_piece_for_road()
+            self.record_undo(self.board.set_path, player, path, Road.Unpaved)
+            self.record_undo(player.add_resources_and_piece_for_road)
+
+    def _apply_settlements(self, move: CatanMove):
+        player = self.get_current_player()
         for loc1 in move.locations_to_be_set_to_settlements:
             self.board.set_location(player, loc1, Colony.Settlement)
             player.remove_resources_and_piece_for_settlement()
+            self.record_undo(self.board.set_location, player, loc1, Colony.Uncolonised)
+            self.record_undo(player.add_resources_and_piece_for_settlement)
+
+    def _apply_cities(self, move: CatanMove):
+        player = self.get_current_player()
         for loc2 in move.locations_to_be_set_to_cities:
             self.board.set_location(player, loc2, Colony.City)
             player.remove_resources_and_piece_for_city()
-        for count in range(0, move.development_cards_to_be_purchased_count):
-            player.remove_resources_for_development_card()
+            self.record_undo(self.board.set_location, player, loc2, Colony.Settlement)
+            self.record_undo(player.add_resources_and_piece_for_city)
 
-    def _unpretend_to_make_a_move(self, move: CatanMove):
+    def _apply_development_cards_purchases(self, move: CatanMove):
         player = self.get_current_player()
         for count in range(0, move.development_cards_to_be_purchased_count):
-            player.add_resources_for_development_card()
-        for loc2 in move.locations_to_be_set_to_cities:
-            self.board.set_location(player, loc2, Colony.Settlement)
-            player.add_resources_and_piece_for_city()
-        for loc1 in move.locations_to_be_set_to_settlements:
-            self.board.set_location(player, loc1, Colony.Uncolonised)
-            player.add_resources_and_piece_for_settlement()
-        for path in move.paths_to_be_paved:
-            self.board.set_path(player, path, Road.Unpaved)
-            player.add_resources_and_piece_for_road()
-        for exchange in move.resources_exchanges:
-            player.un_trade_resources(exchange.source_resource, exchange.target_resource, exchange.count,
-                                      self._calc_curr_player_trade_ratio(exchange.source_resource))
-        if move.development_card_to_be_exposed is not None:
-            player.un_expose_development_card(move.development_card_to_be_exposed)
-            self._unexposed_dev_cards_counters[move.development_card_to_be_exposed] += 1
-        if move.development_card_to_be_exposed == DevelopmentCard.RoadBuilding:
-            self._revert_road_building_dev_card_side_effect(1)
-        elif move.development_card_to_be_exposed == DevelopmentCard.Monopoly:
-            assert move.monopoly_card is not None
-            for other_player in self.players:
-                if other_player is player:
-                    continue
-                resource = move.monopoly_card
-                resource_count = move.monopoly_card_debt[other_player]
-                other_player.add_resource(resource, resource_count)
-                player.remove_resource(resource, resource_count)
-        robber_land_placement_to_undo = self.board.get_robber_land()  # this is done just in case, probably redundant
-        self.board.set_robber_land(move.robber_placement_land)
-        move.robber_placement_land = robber_land_placement_to_undo  # this is done just in case, probably redundant
-        player.update_resources(move.resources_updates, AbstractPlayer.remove_resource)
+            player.remove_resources_for_development_card()
+            self.record_undo(player.add_resources_for_development_card)
 
     def _apply_road_building_dev_card_side_effect(self, count: int):
         """
@@ -807,74 +1423,40 @@ class CatanState(AbstractState):
         # All the moves that expose the card and don't make count * 2 new roads are removed
         curr_player.add_resource(Resource.Brick, count * 2)
         curr_player.add_resource(Resource.Lumber, count * 2)
-
-    def _revert_road_building_dev_card_side_effect(self, count: int):
-        curr_player = self.get_current_player()
-        curr_player.remove_resource(Resource.Brick, count * 2)
-        curr_player.remove_resource(Resource.Lumber, count * 2)
+        self.record_undo(curr_player.remove_resource, Resource.Brick, count * 2)
+        self.record_undo(curr_player.remove_resource, Resource.Lumber, count * 2)
 
     initialisation_resources = ResourceAmounts().add_road().add_settlement()
 
     def _get_initialisation_moves(self):
+        """
+        get the moves of the setup phase: a settlement in any settleable location, and a road next to it.
+        the moves are built directly (not with the generic settlements and paths generators), since nothing
+        else can be done in a setup turn
+        :return: List[CatanMove], the setup phase moves
+        """
         player = self.get_current_player()
         assert sum(player.resources.values()) == 0
         assert self.is_initialisation_phase()
 
-        player.update_resources(ResourceAmounts.settlement, AbstractPlayer.add_resource)
-        moves = self._add_settlements_to_initialisation_moves()
-
-        player.update_resources(ResourceAmounts.road, AbstractPlayer.add_resource)
-        moves = self._add_roads_to_initialisation_moves(moves)
-
-        # remove resources given to player now, and give it to him when the move will actually be made.
+        # the resources are given to the player when the move is actually made.
         # that way there's no side-effect to this method, and 'revert' the move would be easy.
-        # it also simplifies the way a user gets
         is_second_initialisation_move = self.board.get_colonies_score(player) == 1
-        player.update_resources(CatanState.initialisation_resources, AbstractPlayer.remove_resource)
-        for move in moves:
-            move.resources_updates = CatanState.initialisation_resources
+        robber_land = self.board.get_robber_land()
+        graph = self.board._roads_and_colonies
+        moves = []
+        for location in self.board.get_settleable_locations_by_player(player):
+            resources_updates = CatanState.initialisation_resources
             if is_second_initialisation_move:
-                move.resources_updates = copy.deepcopy(move.resources_updates)
-                initial_resources = self.board.get_surrounding_resources(move.locations_to_be_set_to_settlements[0])
-                for resource in initial_resources:
-                    move.resources_updates[resource] += 1
-
-        return moves
-
-    def _add_roads_to_initialisation_moves(self, moves):
-        moves = [move for move in self._get_all_possible_paths_moves(moves) if move not in moves]
-        assert all([(len(move.resources_exchanges) == 0 and
-                     move.development_card_to_be_exposed is None and
-                     len(move.paths_to_be_paved) == 1 and
-                     len(move.locations_to_be_set_to_settlements) == 1 and
-                     len(move.locations_to_be_set_to_cities) == 0 and
-                     move.development_cards_to_be_purchased_count == 0 and
-                     not move.did_get_largest_army_card and
-                     not move.did_get_longest_road_card and
-                     move.robber_placement_land == self.board.get_robber_land())
-                    for move in moves])
-
-        def valid_path_paved(move):
-            path = next(iter(move.paths_to_be_paved))
-            settlement = next(iter(move.locations_to_be_set_to_settlements))
-            return settlement in path
-
-        moves = [move for move in moves if valid_path_paved(move)]
-        return moves
-
-    def _add_settlements_to_initialisation_moves(self):
-        empty_move = CatanMove(self.board.get_robber_land())
-        moves = [empty_move]
-        moves = self._get_all_possible_settlements_moves(moves)
-        moves.remove(empty_move)
-        for move in moves:
-            assert len(move.resources_exchanges) == 0
-            assert move.development_card_to_be_exposed is None
-            assert len(move.paths_to_be_paved) == 0
-            assert len(move.locations_to_be_set_to_settlements) == 1
-            assert len(move.locations_to_be_set_to_cities) == 0
-            assert move.development_cards_to_be_purchased_count == 0
-            assert not move.did_get_largest_army_card
-            assert not move.did_get_longest_road_card
-            assert (move.robber_placement_land == self.board.get_robber_land() or move.robber_placement_land is None)
+                resources_updates = copy.deepcopy(resources_updates)
+                for resource in self.board.get_surrounding_resources(location):
+                    resources_updates[resource] += 1
+            for neighbour in graph.neighbors(location):
+                if not self.board.has_road_been_paved_by(None, (location, neighbour)):
+                    continue
+                move = CatanMove(robber_land)
+                move.locations_to_be_set_to_settlements = [location]
+                move.paths_to_be_paved = frozenset({(max(location, neighbour), min(location, neighbour))})
+                move.resources_updates = resources_updates
+                moves.append(move)
         return moves
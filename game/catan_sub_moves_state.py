@@ -0,0 +1,67 @@
+from typing import List
+
+import numpy as np
+
+from algorithms.abstract_state import AbstractState, AbstractRandomMove
+from game.catan_moves import CatanSubMove
+from game.catan_state import CatanState
+
+
+class NoRandomMove(AbstractRandomMove):
+    """the random move between sub-decisions of the same turn, nothing happens in it"""
+    @property
+    def probability(self):
+        return 1.0
+
+
+class CatanSubMovesState(AbstractState):
+    """
+    a view of a CatanState, whose moves are the sub-decisions of the turns (see CatanState.get_next_sub_moves),
+    so the search algorithms (i.e AlphaBetaExpectimax, MCTS) search the sub-decisions trees.
+    the dice are thrown only when a turn ends. between sub-decisions of the same turn the only random move is
+    NoRandomMove, so a sub-decision takes a move and a random move, like a whole turn.
+    the other methods of the state (i.e get_scores_by_player, used by heuristics) are the state's methods
+    """
+    _no_random_move = NoRandomMove()
+
+    def __init__(self, state: CatanState):
+        self.state = state
+
+    def __getattr__(self, name):
+        if name.startswith('__') or 'state' not in self.__dict__:
+            raise AttributeError(name)
+        return getattr(self.state, name)
+
+    def is_final(self):
+        return self.state.is_final()
+
+    def get_next_moves(self) -> List[CatanSubMove]:
+        return self.state.get_next_sub_moves()
+
+    def get_random_move(self) -> CatanSubMove:
+        sub_moves = self.state.get_next_sub_moves()
+        return sub_moves[np.random.randint(len(sub_moves))]
+
+    def make_move(self, move: CatanSubMove):
+        self.state.make_sub_move(move)
+
+    def unmake_move(self, move: CatanSubMove):
+        self.state.unmake_sub_move(move)
+
+    def get_current_player(self):
+        return self.state.get_current_player()
+
+    def get_next_random_moves(self) -> List[AbstractRandomMove]:
+        if self.state.is_turn_in_progress():
+            return [CatanSubMovesState._no_random_move]
+        return self.state.get_next_random_moves()
+
+    def make_random_move(self, move: AbstractRandomMove = None):
+        if move is CatanSubMovesState._no_random_move or (move is None and self.state.is_turn_in_progress()):
+            return
+        self.state.make_random_move(move)
+
+    def unmake_random_move(self, move: AbstractRandomMove):
+        if move is CatanSubMovesState._no_random_move:
+            return
+        self.state.unmake_random_move(move)
@@ -0,0 +1,122 @@
+from typing import List
+
+import numpy as np
+
+from game.board import Board, Location
+from game.catan_moves import CatanMove
+from game.pieces import Colony
+from game.resource import Resource
+
+
+class InitialisationPlacements:
+    """
+    scores the placements of the setup phase (a settlement, and a road next to it) in all the locations at once.
+    the board is turned into arrays: the pips (dice combinations out of 36) of every resource next to each
+    location (from the board's production tables), and the harbor of each location. a placement's features are
+    then the features of the player's colonies together with the new settlement, as in the players'
+    initialisation heuristics (see MCTSPlayer.initialization_phase_heuaristic):
+    the expectation of each resource, the total expectation, whether the player has 'decent' road, settlement
+    and city resources, and the number of harbors the player is on
+    """
+    features_count = 10
+    # the harbors (last feature) aren't weighted by default, as in the players' initialisation heuristics
+    default_weights = np.append(np.ones(features_count - 1), 0)
+
+    # 'decent' resources come from dice values at least as probable as 4 (i.e 4,5,6,8,9,10), ore from 5
+    _decent_pips = 3
+    _decent_ore_pips = 4
+    _colonies_yields = {Colony.Settlement: 1, Colony.City: 2}
+    _no_harbor = -1
+
+    def __init__(self, board: Board):
+        self._board = board
+        self._pips = board._production_tables.resources_pips
+        self._harbors = np.full(len(Board._vertices), InitialisationPlacements._no_harbor, dtype=np.int64)
+        for harbor, locations in board._locations_by_harbors.items():
+            self._harbors[locations] = harbor.value
+
+    def get_features(self, player, locations: List[Location]) -> np.ndarray:
+        """
+        get the features of the given player after settling in each of the given locations
+        :param player: the player that settles
+        :param locations: the locations to settle in, one at a time
+        :return: np.ndarray of shape (len(locations), features_count), a row of features per location
+        """
+        colonised = self._board.get_locations_colonised_by_player(player)
+        yields = np.array([InitialisationPlacements._colonies_yields[self._board.get_colony_type_at_location(l)]
+                           for l in colonised], dtype=np.int64)
+        pips = yields.dot(self._pips[colonised]) + self._pips[locations]
+        player_harbors = np.unique(self._harbors[colonised])
+        player_harbors = player_harbors[player_harbors != InitialisationPlacements._no_harbor]
+        new_harbors = self._harbors[locations]
+        new_harbors = (new_harbors != InitialisationPlacements._no_harbor) & ~np.isin(new_harbors, player_harbors)
+        return self._features(pips, len(player_harbors) + new_harbors)
+
+    def score_locations(self, player, locations: List[Location], weights: np.ndarray=default_weights) -> np.ndarray:
+        """
+        score settling the given player in each of the given locations
+        :param player: the player that settles
+        :param locations: the locations to settle in, one at a time
+        :param weights: the weights of the features
+        :return: np.ndarray of the scores, one per location
+        """
+        return self.get_features(player, locations).dot(weights)
+
+    def score_locations_pairs(self, locations: List[Location], weights: np.ndarray=default_weights) -> np.ndarray:
+        """
+        score settling both locations of each pair of the given locations, for a player without colonies.
+        pairs that can't be both settled (the same location, or neighbours) score -inf
+        :param locations: the locations to settle in, two at a time
+        :param weights: the weights of the features
+        :return: np.ndarray of shape (len(locations), len(locations)), the score of each pair
+        """
+        pips = self._pips[locations]
+        pairs_pips = pips[:, np.newaxis, :] + pips[np.newaxis, :, :]
+        harbors = self._harbors[locations]
+        has_harbor = harbors != InitialisationPlacements._no_harbor
+        pairs_harbors = (has_harbor[:, np.newaxis].astype(np.int64) + has_harbor[np.newaxis, :] -
+                         (has_harbor[:, np.newaxis] & (harbors[:, np.newaxis] == harbors[np.newaxis, :])))
+        scores = self._features(pairs_pips, pairs_harbors).dot(weights)
+
+        graph = self._board._roads_and_colonies
+        for i, location in enumerate(locations):
+            scores[i, i] = -np.inf
+            for j, other_location in enumerate(locations):
+                if graph.has_edge(location, other_location):
+                    scores[i, j] = -np.inf
+        return scores
+
+    def rank_moves(self, player, moves: List[CatanMove], weights: np.ndarray=default_weights,
+                   plan_pairs: bool=False) -> List[CatanMove]:
+        """
+        rank the setup phase moves of the given player, the best placements first
+        :param player: the player that makes the moves
+        :param moves: the setup phase moves (see CatanState.get_next_moves)
+        :param weights: the weights of the features
+        :param plan_pairs: if True, and it's the player's first placement, the locations are scored by the best
+        pair they make with another settleable location (the player's second placement), then by themselves
+        :return: List[CatanMove], the given moves ranked by their scores
+        """
+        locations = sorted(set(move.locations_to_be_set_to_settlements[0] for move in moves))
+        scores = self.score_locations(player, locations, weights)
+        if plan_pairs and self._board.get_colonies_score(player) == 0:
+            pairs_scores = self.score_locations_pairs(locations, weights)
+            scores = np.stack((pairs_scores.max(axis=1), scores), axis=1)
+        scores_by_location = {location: tuple(np.atleast_1d(score)) for location, score in zip(locations, scores)}
+        # the sort is stable, so the first of the best moves is first, as when choosing the maximal score
+        return sorted(moves, key=lambda move: scores_by_location[move.locations_to_be_set_to_settlements[0]],
+                      reverse=True)
+
+    @staticmethod
+    def _features(pips: np.ndarray, harbors_count: np.ndarray) -> np.ndarray:
+        features = np.empty(pips.shape[:-1] + (InitialisationPlacements.features_count,))
+        features[..., 0:5] = pips / 36.0
+        features[..., 5] = pips.sum(axis=-1) / 36.0
+        decent = pips >= InitialisationPlacements._decent_pips
+        brick, lumber, wool, grain = (decent[..., r.value] for r in
+                                      (Resource.Brick, Resource.Lumber, Resource.Wool, Resource.Grain))
+        features[..., 6] = brick & lumber
+        features[..., 7] = brick & lumber & wool & grain
+        features[..., 8] = (pips[..., Resource.Ore.value] >= InitialisationPlacements._decent_ore_pips) & grain
+        features[..., 9] = harbors_count
+        return features
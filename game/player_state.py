@@ -0,0 +1,148 @@
+from typing import Iterator, List
+
+import numpy as np
+
+from game.development_cards import DevelopmentCard
+from game.pieces import Colony, Road
+from game.resource import Resource, ResourceAmounts
+
+
+class EnumCounts:
+    """
+    a dict-like view of a fixed-size array of counts, indexed by the values of the keys (enum members, in the order
+    of their values). the array (the 'counts' list) can be used directly where speed matters,
+    i.e counts[Resource.Ore.value]
+    """
+    __slots__ = ('_keys', 'counts')
+
+    def __init__(self, keys: tuple, counts: List[int]=None):
+        self._keys = keys
+        self.counts = [0] * len(keys) if counts is None else counts
+
+    def __getitem__(self, key):
+        return self.counts[key._value_]
+
+    def __setitem__(self, key, value):
+        self.counts[key._value_] = value
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __eq__(self, other):
+        return dict(self.items()) == (dict(other.items()) if isinstance(other, EnumCounts) else other)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+    def __deepcopy__(self, memo):
+        return self.__class__(self._keys, list(self.counts))
+
+    def get(self, key, default=None):
+        return self[key] if key in self._keys else default
+
+    def keys(self):
+        return self._keys
+
+    def values(self) -> List[int]:
+        return list(self.counts)
+
+    def items(self):
+        return list(zip(self._keys, self.counts))
+
+
+class PiecesCounts(EnumCounts):
+    """
+    the counts of the pieces, which are of different enums. indexed by PlayerState.pieces_indices
+    """
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        return self.counts[PlayerState.pieces_indices[key]]
+
+    def __setitem__(self, key, value):
+        self.counts[PlayerState.pieces_indices[key]] = value
+
+
+class PlayerState:
+    """
+    the game data of a player: the resources, the pieces left and the development cards.
+    the records are owned by the CatanState (see CatanState.__init__), while the players (see AbstractPlayer) hold
+    their policies, and reach their record through it. that way copying a player (i.e when a state is copied)
+    copies only its record.
+    the data is kept in fixed-size arrays, indexed by the values of the enums (see EnumCounts), with the pieces
+    in the order of pieces_types. the affordability of many hands at once is computed by get_affordable_counts
+    """
+    __slots__ = ('resources', 'pieces', 'unexposed_development_cards', 'exposed_development_cards')
+
+    pieces_types = (Colony.Settlement, Colony.City, Road.Paved)
+    pieces_indices = {piece: i for i, piece in enumerate(pieces_types)}
+    values_count = len(Resource) + len(pieces_types) + 2 * len(DevelopmentCard)
+
+    # the resources each purchase costs, a row per purchase (road, settlement, city, development card), and the
+    # pieces it takes (a city takes a city piece, and gives a settlement piece back)
+    purchases_costs = np.array([[amounts[resource] for resource in Resource] for amounts in
+                                (ResourceAmounts.road, ResourceAmounts.settlement,
+                                 ResourceAmounts.city, ResourceAmounts.development_card)])
+    _purchases_pieces = np.array([pieces_types.index(Road.Paved), pieces_types.index(Colony.Settlement),
+                                  pieces_types.index(Colony.City), -1])
+
+    def __init__(self):
+        self.resources = EnumCounts(tuple(Resource))
+        self.pieces = PiecesCounts(PlayerState.pieces_types, [5, 4, 15])
+        self.unexposed_development_cards = EnumCounts(tuple(DevelopmentCard))
+        self.exposed_development_cards = EnumCounts(tuple(DevelopmentCard))
+
+    def __deepcopy__(self, memo):
+        player_state = PlayerState.__new__(PlayerState)
+        memo[id(self)] = player_state
+        player_state.resources = EnumCounts(self.resources._keys, list(self.resources.counts))
+        player_state.pieces = PiecesCounts(self.pieces._keys, list(self.pieces.counts))
+        player_state.unexposed_development_cards = EnumCounts(self.unexposed_development_cards._keys,
+                                                              list(self.unexposed_development_cards.counts))
+        player_state.exposed_development_cards = EnumCounts(self.exposed_development_cards._keys,
+                                                            list(self.exposed_development_cards.counts))
+        return player_state
+
+    def get_values(self) -> List[int]:
+        """
+        get the data of the record as a list of values_count integers, in a fixed order. see set_values
+        :return: List[int], the values of the record
+        """
+        return (self.resources.counts + self.pieces.counts +
+                self.unexposed_development_cards.counts + self.exposed_development_cards.counts)
+
+    def set_values(self, values: Iterator[int]):
+        """
+        set the data of the record from values, in the order of get_values
+        :param values: iterator of the values, values_count of them are consumed
+        :return: None
+        """
+        for counts in (self.resources, self.pieces, self.unexposed_development_cards, self.exposed_development_cards):
+            counts.counts[:] = [next(values) for _ in range(len(counts))]
+
+    @staticmethod
+    def get_affordable_counts(resources: np.ndarray, pieces: np.ndarray=None) -> np.ndarray:
+        """
+        get how many of each purchase (road, settlement, city, development card, as in purchases_costs) can be
+        afforded with each of the given hands, in one operation
+        :param resources: np.ndarray of shape (..., len(Resource)), the hands, indexed by the resources' values
+        :param pieces: optional parameter. np.ndarray of shape (..., len(pieces_types)), the pieces left with each
+        hand. if given, the purchases of pieces are limited by them too
+        :return: np.ndarray of shape (..., 4), the number of each purchase each hand can afford
+        """
+        resources = np.asarray(resources)
+        costs = PlayerState.purchases_costs
+        counts = np.where(costs > 0, resources[..., np.newaxis, :] // np.maximum(costs, 1), np.iinfo(np.int64).max)
+        counts = counts.min(axis=-1)
+        if pieces is not None:
+            pieces = np.asarray(pieces)
+            has_piece = PlayerState._purchases_pieces >= 0
+            counts[..., has_piece] = np.minimum(counts[..., has_piece],
+                                                pieces[..., PlayerState._purchases_pieces[has_piece]])
+        return counts
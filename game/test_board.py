@@ -1,5 +1,6 @@
 from unittest import TestCase
 
+from algorithms.audit import audit, AuditLevel
 from game.board import *
 from game.pieces import Colony, Road
 
@@ -8,6 +9,8 @@ class TestBoard(TestCase):
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
+        cls.audit_level = audit.level
+        audit.set_level(AuditLevel.Full)
         cls.b = Board()
         cls.player1 = 'player 1'
         cls.player2 = 'player 2'
@@ -47,6 +50,11 @@ class TestBoard(TestCase):
         cls.b.set_path(cls.player2, (19, 14), Road.Paved)
         cls.b.set_path(cls.player2, (14, 10), Road.Paved)
 
+    @classmethod
+    def tearDownClass(cls):
+        audit.set_level(cls.audit_level)
+        super().tearDownClass()
+
     def test___init__(self):
         self.assertIsNotNone(self.b)
         self.assertEqual(len(self.b._roads_and_colonies.nodes()), 54)
@@ -100,3 +108,50 @@ class TestBoard(TestCase):
 
     def test_is_player_on_harbor(self):
         self.assertTrue(self.b.is_player_on_harbor(self.player2, self.harbor))
+
+    def test_board_created_from_layout_and_pieces(self):
+        b = Board(layout=self.b.get_layout())
+        players = [self.player1, self.player2]
+        b.set_pieces_from_bytes(self.b.pieces_to_bytes({self.player1: 0, self.player2: 1}), players)
+
+        self.assertListEqual([(land.resource, land.dice_value) for land in b._lands],
+                             [(land.resource, land.dice_value) for land in self.b._lands])
+        self.assertTrue(b.is_player_on_harbor(self.player2, self.harbor))
+        self.assertEqual(b.get_colonies_score(self.player2), 4)
+        self.assertEqual(b.get_longest_road_length_of_player(self.player2), 12)
+
+    def test_get_production_probabilities(self):
+        b = Board(layout=self.b.get_layout())
+        p = 'player'
+        b.set_location(p, 0, Colony.Settlement)
+        b.set_location(p, 7, Colony.City)
+        b.set_path(p, (0, 3), Road.Paved)
+        b.set_path(p, (3, 7), Road.Paved)
+
+        def probability(dice_values):
+            return sum(Board.probabilities_by_dice_values[dice_value] for dice_value in dice_values)
+
+        probabilities = b.get_production_probabilities(p)
+        self.assertAlmostEqual(probabilities[Colony.Settlement], probability(b.get_surrounding_dice_values(0)))
+        self.assertAlmostEqual(probabilities[Colony.City], probability(b.get_surrounding_dice_values(7)))
+        self.assertAlmostEqual(probabilities[Road.Paved],
+                               probability(b.get_adjacent_to_path_dice_values((0, 3)) +
+                                           b.get_adjacent_to_path_dice_values((3, 7))))
+
+        b.set_location(p, 7, Colony.Uncolonised)
+        b.set_path(p, (3, 7), Road.Unpaved)
+        probabilities = b.get_production_probabilities(p)
+        self.assertEqual(probabilities[Colony.City], 0)
+        self.assertAlmostEqual(probabilities[Road.Paved], probability(b.get_adjacent_to_path_dice_values((0, 3))))
+
+    def test_get_max_production_probabilities(self):
+        max_probabilities = self.b.get_max_production_probabilities()
+        # the highest probabilities are of all the locations and paths, colonised and paved ones included
+        locations_probabilities = [self.b.get_location_probability(location)
+                                   for locations in self.b.get_locations_by_players().values()
+                                   for location in locations]
+        paths_probabilities = [self.b.get_path_probability(path)
+                               for paths in self.b.get_paths_by_players().values() for path in paths]
+        self.assertEqual(max_probabilities[Colony.Settlement], max(locations_probabilities))
+        self.assertEqual(max_probabilities[Colony.City], max(locations_probabilities))
+        self.assertEqual(max_probabilities[Road.Paved], max(paths_probabilities))
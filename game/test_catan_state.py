@@ -1,20 +1,29 @@
-from itertools import combinations_with_replacement, combinations
+import os
+import subprocess
+import sys
+from itertools import combinations_with_replacement, combinations, product
 from math import ceil
 from unittest import TestCase
 
+import numpy as np
+
 from algorithms.abstract_state import AbstractState
+from algorithms.audit import audit, AuditLevel
+from algorithms.timeoutable_algorithm import Deadline
 from game.board import Harbor
-from game.catan_moves import CatanMove, RandomMove
+from game.catan_moves import CatanMove, RandomMove, TurnStage
 from game.catan_state import CatanState
 from game.development_cards import DevelopmentCard
+from game.initialisation_placements import InitialisationPlacements
 from game.pieces import Colony, Road
+from game.player_state import PlayerState
 from game.resource import Resource
 from players.abstract_player import AbstractPlayer
 
 
 class FakePlayer(AbstractPlayer):
     def __init__(self, identifier):
-        super().__init__()
+        super().__init__(identifier)
         self.id = identifier
 
     def choose_move(self, state: AbstractState):
@@ -39,6 +48,17 @@ class FakePlayer(AbstractPlayer):
 
 
 class TestCatanState(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.audit_level = audit.level
+        audit.set_level(AuditLevel.Full)
+
+    @classmethod
+    def tearDownClass(cls):
+        audit.set_level(cls.audit_level)
+        super().tearDownClass()
+
     def setUp(self):
         super().setUp()
         self.players = [FakePlayer(i) for i in range(2)]
@@ -52,6 +72,35 @@ class TestCatanState(TestCase):
 
         self.assertTrue(self.state.is_final())
 
+    def test_scores_are_updated_on_make_and_unmake(self):
+        self.state.board.set_location(self.players[0], 0, Colony.Settlement)
+        self.state.board.set_location(self.players[0], 7, Colony.Settlement)
+        self.state.board.set_path(self.players[0], (3, 0), Road.Paved)
+        self.state.board.set_path(self.players[0], (3, 7), Road.Paved)
+        self.state.board.set_location(self.players[1], 39, Colony.Settlement)
+        self.state.board.set_location(self.players[1], 40, Colony.Settlement)
+        self.state.turns_count = 4
+        self.assertListEqual(self.state.get_scores_by_player_indexed(), [2, 2])
+
+        # pave 3 more roads, to get the longest-road card
+        move = CatanMove(self.state.board.get_robber_land())
+        move.paths_to_be_paved = {(4, 0), (8, 4), (12, 7)}
+        for _ in move.paths_to_be_paved:
+            self.players[0].add_resources_and_piece_for_road()
+        self.state.make_move(move)
+        self.assertListEqual(self.state.get_scores_by_player_indexed(), [4, 2])
+
+        # purchase a victory-point card
+        purchase = {card: 1 if card is DevelopmentCard.VictoryPoint else 0 for card in DevelopmentCard}
+        roll_dice = RandomMove(2, self.state.probabilities_by_dice_values[2], self.state, purchase)
+        self.state.make_random_move(roll_dice)
+        self.assertListEqual(self.state.get_scores_by_player_indexed(), [5, 2])
+        self.assertDictEqual(self.state.get_scores_by_player(), {self.players[0]: 5, self.players[1]: 2})
+
+        self.state.unmake_random_move(roll_dice)
+        self.state.unmake_move(move)
+        self.assertListEqual(self.state.get_scores_by_player_indexed(), [2, 2])
+
     def test_get_next_moves_given_resources_for_single_road(self):
         # given this board
         self.state.board.set_location(self.players[0], 0, Colony.Settlement)
@@ -93,6 +142,256 @@ class TestCatanState(TestCase):
 
         self.assertSetEqual(expected_possible_roads, actual_possible_roads)
 
+    def test_get_next_moves_settles_on_paths_paved_in_the_same_move(self):
+        # given this board
+        self.state.board.set_location(self.players[0], 0, Colony.Settlement)
+        self.state.board.set_location(self.players[0], 7, Colony.Settlement)
+        self.state.board.set_path(self.players[0], (3, 0), Road.Paved)
+        self.state.board.set_path(self.players[0], (3, 7), Road.Paved)
+        self.state.board.set_location(self.players[1], 39, Colony.Settlement)
+        self.state.board.set_location(self.players[1], 40, Colony.Settlement)
+        self.state.turns_count = 4
+
+        # add resources to pave two roads and settle a settlement
+        self.players[0].add_resources_and_piece_for_road()
+        self.players[0].add_resources_and_piece_for_road()
+        self.players[0].add_resources_and_piece_for_settlement()
+        resources = dict(self.players[0].resources)
+
+        moves = self.state.get_next_moves()
+
+        # assert location 16 can be settled only after paving 7-11-16 in the same move
+        settling_moves = [move for move in moves if move.locations_to_be_set_to_settlements == [16]]
+        self.assertEqual(len(settling_moves), 1)
+        self.assertSetEqual(set(settling_moves[0].paths_to_be_paved), {(11, 7), (16, 11)})
+
+        # assert building the moves didn't change the state
+        self.assertFalse(self.state.board.is_colonised(16))
+        self.assertTrue(self.state.board.has_road_been_paved_by(None, (11, 7)))
+        self.assertDictEqual(dict(self.players[0].resources), resources)
+
+    def test_find_winning_move(self):
+        # given this board
+        self.state.board.set_location(self.players[0], 0, Colony.Settlement)
+        self.state.board.set_location(self.players[0], 7, Colony.Settlement)
+        self.state.board.set_path(self.players[0], (3, 0), Road.Paved)
+        self.state.board.set_path(self.players[0], (3, 7), Road.Paved)
+        self.state.board.set_location(self.players[1], 39, Colony.Settlement)
+        self.state.board.set_location(self.players[1], 40, Colony.Settlement)
+        self.state.turns_count = 4
+        self.state.add_victory_points(self.players[0], 7)
+
+        # assert there's no winning move without resources
+        self.assertIsNone(self.state.find_winning_move())
+
+        # assert settling a city wins the game
+        self.players[0].add_resources_and_piece_for_city()
+        move = self.state.find_winning_move()
+        self.assertIsNotNone(move)
+        self.assertEqual(len(move.locations_to_be_set_to_cities), 1)
+
+        # assert looking for it didn't change the state
+        self.assertFalse(self.state.is_final())
+        self.assertEqual(self.state.get_scores_by_player()[self.players[0]], 9)
+
+        self.state.make_move(move)
+        self.assertTrue(self.state.is_final())
+
+    def test_find_winning_move_is_bounded(self):
+        # given this board, where 6 points are missing, with many resources to trade
+        self.state.board.set_location(self.players[0], 0, Colony.Settlement)
+        self.state.board.set_location(self.players[0], 7, Colony.Settlement)
+        self.state.board.set_path(self.players[0], (3, 0), Road.Paved)
+        self.state.board.set_path(self.players[0], (3, 7), Road.Paved)
+        self.state.board.set_location(self.players[1], 39, Colony.Settlement)
+        self.state.board.set_location(self.players[1], 40, Colony.Settlement)
+        self.state.turns_count = 4
+        self.state.add_victory_points(self.players[0], 2)
+        for resource in Resource:
+            self.players[0].resources[resource] += 10
+        resources = dict(self.players[0].resources)
+
+        # assert it gives up once the deadline expired
+        self.assertIsNone(self.state.find_winning_move(Deadline(0)))
+
+        # assert no more than the allowed combinations are tried
+        colonies_moves_count = 0
+        get_max_colonies_move = self.state._get_max_colonies_move
+
+        def count_colonies_moves(move):
+            nonlocal colonies_moves_count
+            colonies_moves_count += 1
+            return get_max_colonies_move(move)
+        self.state._get_max_colonies_move = count_colonies_moves
+        self.state.find_winning_move(Deadline(60))
+        self.assertLessEqual(colonies_moves_count, CatanState._max_winning_move_combinations)
+
+        # assert looking for it didn't change the state
+        self.assertDictEqual(dict(self.players[0].resources), resources)
+        self.assertEqual(self.state.get_scores_by_player()[self.players[0]], 4)
+
+    def test_get_hash_is_the_same_in_other_interpreters(self):
+        # given this board
+        self.state.board.set_location(self.players[0], 0, Colony.Settlement)
+        self.state.board.set_path(self.players[0], (3, 0), Road.Paved)
+        self.state.board.set_location(self.players[1], 39, Colony.City)
+        self.state.turns_count = 4
+
+        # assert interpreters with other hash salts hash the same position the same
+        script = ('import sys\n'
+                  'from game.catan_state import CatanState\n'
+                  'from players.random_player import RandomPlayer\n'
+                  'state = CatanState.from_bytes(bytes.fromhex(sys.argv[1]), [RandomPlayer(i) for i in range(2)])\n'
+                  'print(state.get_hash())\n')
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        for hash_seed in ('1', '2'):
+            output = subprocess.check_output([sys.executable, '-c', script, self.state.to_bytes().hex()], cwd=root,
+                                             env=dict(os.environ, PYTHONHASHSEED=hash_seed))
+            self.assertEqual(int(output.split()[-1]), self.state.get_hash())
+
+    def test_from_bytes_restores_to_bytes_snapshot(self):
+        # given this board
+        self.state.board.set_location(self.players[0], 0, Colony.Settlement)
+        self.state.board.set_location(self.players[0], 7, Colony.City)
+        self.state.board.set_path(self.players[0], (3, 0), Road.Paved)
+        self.state.board.set_path(self.players[0], (3, 7), Road.Paved)
+        self.state.board.set_location(self.players[1], 39, Colony.Settlement)
+        self.state.board.set_location(self.players[1], 40, Colony.Settlement)
+        self.state.turns_count = 4
+        self.players[0].add_resources_and_piece_for_settlement()
+        self.players[1].add_unexposed_development_card(self.state.pop_development_card())
+        self.state.make_move(CatanMove(self.state.board.get_lands_to_place_robber_on()[0]))
+        self.state.make_random_move(RandomMove(8, 5 / 36, self.state))
+
+        data = self.state.to_bytes()
+        players = [FakePlayer(i) for i in range(2)]
+        state = CatanState.from_bytes(data, players)
+
+        self.assertLess(len(data), 500)
+        self.assertEqual(state.to_bytes(), data)
+        self.assertEqual(state.get_current_player(), players[1])
+        self.assertListEqual(state.get_scores_by_player_indexed(), self.state.get_scores_by_player_indexed())
+        self.assertEqual(state.board.get_robber_land().identifier, self.state.board.get_robber_land().identifier)
+        self.assertTrue(state.board.has_road_been_paved_by(players[0], (3, 7)))
+        self.assertEqual(state.board.get_colony_type_at_location(7), Colony.City)
+        self.assertDictEqual(dict(players[0].resources), dict(self.players[0].resources))
+        self.assertDictEqual(dict(players[1].unexposed_development_cards),
+                             dict(self.players[1].unexposed_development_cards))
+        self.assertEqual(len(state.get_next_moves()), len(self.state.get_next_moves()))
+
+    def test_sub_moves_make_a_turn(self):
+        # given this board
+        self.state.board.set_location(self.players[0], 0, Colony.Settlement)
+        self.state.board.set_location(self.players[0], 7, Colony.Settlement)
+        self.state.board.set_path(self.players[0], (3, 0), Road.Paved)
+        self.state.board.set_path(self.players[0], (3, 7), Road.Paved)
+        self.state.board.set_location(self.players[1], 39, Colony.Settlement)
+        self.state.board.set_location(self.players[1], 40, Colony.Settlement)
+        self.state.turns_count = 4
+
+        # add resources to pave two roads and settle a settlement
+        self.players[0].add_resources_and_piece_for_road()
+        self.players[0].add_resources_and_piece_for_road()
+        self.players[0].add_resources_and_piece_for_settlement()
+
+        # pave 7-11-16 and settle 16, one sub-decision at a time (the stages with nothing to choose are skipped)
+        sub_moves = []
+        for stage, option in [(TurnStage.Pave, (7, 11)), (TurnStage.Pave, (11, 16)), (TurnStage.Settle, 16),
+                              (TurnStage.PurchaseDevelopmentCards, 0)]:
+            next_sub_moves = self.state.get_next_sub_moves()
+            # do nothing in the stages before (i.e trade, in case the player is settled near a harbor)
+            while next_sub_moves[0].stage != stage:
+                self.state.make_sub_move(next_sub_moves[-1])
+                sub_moves.append(next_sub_moves[-1])
+                next_sub_moves = self.state.get_next_sub_moves()
+            # assert each sub-decision has a few options
+            self.assertLess(len(next_sub_moves), 10)
+            sub_move = next(sub_move for sub_move in next_sub_moves
+                            if sub_move.option == option or
+                            (stage == TurnStage.Pave and set(sub_move.option or ()) == set(option)))
+            self.state.make_sub_move(sub_move)
+            sub_moves.append(sub_move)
+
+        self.assertFalse(self.state.is_turn_in_progress())
+        self.assertEqual(self.state.turns_count, 5)
+        self.assertTrue(self.state.board.is_colonised_by(self.players[0], 16))
+        self.assertEqual(sum(self.players[0].resources.values()), 0)
+        self.assertListEqual(sub_moves[-1].move.locations_to_be_set_to_settlements, [16])
+        self.assertEqual(len(sub_moves[-1].move.paths_to_be_paved), 2)
+
+        for sub_move in reversed(sub_moves):
+            self.state.unmake_sub_move(sub_move)
+        self.assertEqual(self.state.turns_count, 4)
+        self.assertFalse(self.state.board.is_colonised(16))
+        self.assertEqual(sum(self.players[0].resources.values()), 8)
+
+    def test_sub_moves_pave_each_set_of_roads_once(self):
+        # given this board
+        self.state.board.set_location(self.players[0], 0, Colony.Settlement)
+        self.state.board.set_location(self.players[0], 7, Colony.Settlement)
+        self.state.board.set_path(self.players[0], (3, 0), Road.Paved)
+        self.state.board.set_path(self.players[0], (3, 7), Road.Paved)
+        self.state.board.set_location(self.players[1], 39, Colony.Settlement)
+        self.state.board.set_location(self.players[1], 40, Colony.Settlement)
+        self.state.turns_count = 4
+
+        # add resources to pave two roads
+        self.players[0].add_resources_and_piece_for_road()
+        self.players[0].add_resources_and_piece_for_road()
+
+        # do nothing in the stages before paving (i.e trade, in case the player is settled near a harbor)
+        next_sub_moves = self.state.get_next_sub_moves()
+        while next_sub_moves[0].stage != TurnStage.Pave:
+            self.state.make_sub_move(next_sub_moves[-1])
+            next_sub_moves = self.state.get_next_sub_moves()
+
+        # pave two roads in all the orders of the sub-decisions
+        paths_options = []
+
+        def pave(paths):
+            for sub_move in self.state.get_next_sub_moves():
+                if sub_move.stage != TurnStage.Pave:
+                    continue
+                if sub_move.option is None or len(paths) == 1:
+                    paths_options.append(paths + [sub_move.option] if sub_move.option is not None else paths)
+                    continue
+                self.state.make_sub_move(sub_move)
+                pave(paths + [sub_move.option])
+                self.state.unmake_sub_move(sub_move)
+        pave([])
+
+        # assert each set of roads is paved once, including the roads that are paved only after others
+        paths_sets = [frozenset(paths) for paths in paths_options]
+        self.assertEqual(len(paths_sets), len(set(paths_sets)))
+        self.assertIn(frozenset({(11, 7), (16, 11)}), paths_sets)
+        self.assertSetEqual(set(option for option in paths_sets if len(option) == 2),
+                            set(frozenset(option) for option in self.state._paths_options_up_to_i_chosen(2)
+                                if len(option) == 2))
+
+    def test_simulated_dice_roll_7_looks_up_resources_to_drop(self):
+        drops_count = 0
+
+        def choose_resources_to_drop():
+            nonlocal drops_count
+            drops_count += 1
+            return {Resource.Brick: 4}
+
+        self.state.turns_count = 4
+        self.players[0].add_resource(Resource.Brick, 8)
+        self.players[0].choose_resources_to_drop = choose_resources_to_drop
+
+        # assert the drop is decided once, and looked-up in the next simulations of the same hand
+        for _ in range(3):
+            random_move = RandomMove(7, 1.0, self.state, is_simulated=True)
+            self.state.make_random_move(random_move)
+            self.assertEqual(self.players[0].resources[Resource.Brick], 4)
+            self.state.unmake_random_move(random_move)
+            self.assertEqual(self.players[0].resources[Resource.Brick], 8)
+        self.assertEqual(drops_count, 1)
+
+        # assert hands that don't have to drop don't need a decision at all
+        self.assertDictEqual(self.players[1].get_resources_to_drop_from_table(), {})
+
     def test_get_next_moves_returns_only_moves_that_change_robber_placement_when_dice_roll_7(self):
         # given this board
         self.state.board.set_location(self.players[0], 0, Colony.Settlement)
@@ -242,6 +541,46 @@ class TestCatanState(TestCase):
 
         self.state.unmake_move(move)
 
+    def test_rollback_to_checkpoint_reverts_several_turns(self):
+        self.state.board.set_location(self.players[0], 0, Colony.Settlement)
+        self.state.board.set_location(self.players[0], 7, Colony.Settlement)
+        self.state.board.set_path(self.players[0], (3, 0), Road.Paved)
+        self.state.board.set_path(self.players[0], (3, 7), Road.Paved)
+        self.state.turns_count = 4
+        self.players[0].add_resources_and_piece_for_road()
+        self.players[0].add_unexposed_development_card(DevelopmentCard.Knight)
+        robber_land = self.state.board.get_robber_land()
+        resources = [dict(player.resources) for player in self.players]
+
+        checkpoint = self.state.checkpoint()
+
+        # pave a road, and place the robber with a knight card
+        move = CatanMove(self.state.board._lands[0])
+        move.development_card_to_be_exposed = DevelopmentCard.Knight
+        move.paths_to_be_paved = {(4, 0)}
+        self.state.make_move(move)
+        self.state.make_random_move(RandomMove(2, self.state.probabilities_by_dice_values[2], self.state))
+        self.state.make_move(CatanMove(self.state.board.get_robber_land()))
+        self.state.make_random_move(RandomMove(2, self.state.probabilities_by_dice_values[2], self.state))
+
+        self.state.rollback(checkpoint)
+
+        self.assertEqual(self.state.turns_count, 4)
+        self.assertEqual(self.state.get_current_player(), self.players[0])
+        self.assertIs(self.state.board.get_robber_land(), robber_land)
+        self.assertTrue(self.state.board.has_road_been_paved_by(None, (4, 0)))
+        self.assertListEqual([dict(player.resources) for player in self.players], resources)
+        self.assertEqual(self.players[0].unexposed_development_cards[DevelopmentCard.Knight], 1)
+        self.assertEqual(self.state.checkpoint(), checkpoint)
+
+        # moves made after the rollback are reverted as usual
+        self.state.make_move(move)
+        self.state.unmake_move(move)
+        self.assertEqual(self.state.checkpoint(), checkpoint)
+
+        # the move still holds the land to place the robber on, so it can be made again
+        self.assertIs(move.robber_placement_land, self.state.board._lands[0])
+
     def test_get_current_player(self):
         self.assertEqual(self.state.get_current_player(), self.players[0])
         self.state.make_move(CatanMove(self.state.board.get_robber_land()))
@@ -514,3 +853,53 @@ class TestCatanState(TestCase):
         moves = [empty_move]
         moves = self.state._get_all_possible_paths_moves(moves)
         self.assertEqual(len(moves), 6)
+
+    def test_initialisation_placements_rank_moves(self):
+        moves = self.state.get_next_moves()
+        for move in moves:
+            location = move.locations_to_be_set_to_settlements[0]
+            self.assertEqual(len(move.paths_to_be_paved), 1)
+            self.assertIn(location, next(iter(move.paths_to_be_paved)))
+
+        player = self.state.get_current_player()
+        placements = InitialisationPlacements(self.state.board)
+        locations = sorted(set(move.locations_to_be_set_to_settlements[0] for move in moves))
+        features = placements.get_features(player, locations)
+        for location, location_features in zip(locations, features):
+            pips = {resource: 0 for resource in Resource}
+            for resource, dice_value in zip(self.state.board.get_surrounding_resources(location),
+                                            self.state.board.get_surrounding_dice_values(location)):
+                pips[resource] += self.state.probabilities_by_dice_values[dice_value]
+            for resource in Resource:
+                self.assertAlmostEqual(location_features[resource.value], pips[resource])
+            self.assertAlmostEqual(location_features[5], sum(pips.values()))
+
+        ranked_moves = placements.rank_moves(player, moves)
+        self.assertCountEqual(ranked_moves, moves)
+        scores = placements.score_locations(player, [move.locations_to_be_set_to_settlements[0]
+                                                     for move in ranked_moves])
+        self.assertTrue(all(scores[:-1] >= scores[1:]))
+
+        pairs_scores = placements.score_locations_pairs(locations)
+        for i, location in enumerate(locations):
+            self.assertEqual(pairs_scores[i, i], -float('inf'))
+            for j, other_location in enumerate(locations):
+                if other_location in self.state.board._roads_and_colonies.neighbors(location):
+                    self.assertEqual(pairs_scores[i, j], -float('inf'))
+
+    def test_get_affordable_counts_of_many_hands(self):
+        player = self.players[0]
+        hands = list(product(range(4), repeat=len(Resource)))
+        pieces = [player.pieces[piece] for piece in PlayerState.pieces_types]
+        affordable_counts = PlayerState.get_affordable_counts(np.array(hands), np.array(pieces))
+        self.assertEqual(affordable_counts.shape, (len(hands), 4))
+
+        for hand, counts in zip(hands[::7], affordable_counts[::7]):
+            for resource, amount in zip(Resource, hand):
+                player.resources[resource] = amount
+            self.assertListEqual(list(counts), [player.amount_of_roads_can_afford(),
+                                                player.amount_of_settlements_can_afford(),
+                                                player.amount_of_cities_can_afford(),
+                                                min(hand[Resource.Ore.value], hand[Resource.Wool.value],
+                                                    hand[Resource.Grain.value])])
+            self.assertListEqual(list(player.get_affordable_counts()), list(counts))
@@ -1,4 +1,5 @@
 import abc
+import copy
 from typing import Dict
 
 import numpy as np
@@ -6,11 +7,23 @@ import numpy as np
 from algorithms.abstract_state import AbstractState, AbstractMove
 from game.development_cards import DevelopmentCard
 from game.pieces import *
-from game.resource import Resource
+from game.player_state import PlayerState
+from game.resource import Resource, ResourceAmounts
+
+# indices of the resources and pieces in the players' arrays (see PlayerState)
+_brick, _lumber, _wool, _grain, _ore = (resource.value for resource in
+                                        (Resource.Brick, Resource.Lumber, Resource.Wool, Resource.Grain, Resource.Ore))
+_settlement, _city, _road = (PlayerState.pieces_indices[piece] for piece in PlayerState.pieces_types)
+# the (index, amount) of the resources each purchase costs
+_road_costs, _settlement_costs, _city_costs, _development_card_costs = (
+    tuple((resource.value, amount) for resource, amount in costs.items() if amount != 0)
+    for costs in (ResourceAmounts.road, ResourceAmounts.settlement, ResourceAmounts.city,
+                  ResourceAmounts.development_card))
 
 
 class AbstractPlayer(abc.ABC):
     c = 1
+    resources_to_drop_table_max_size = 1024
 
     def __init__(self, id, seed: int=None, timeout_seconds=5):
         assert seed is None or (isinstance(seed, int) and seed > 0)
@@ -22,14 +35,35 @@ class AbstractPlayer(abc.ABC):
         self._random_choice = np.random.RandomState(seed).choice
 
         self._timeout_seconds = timeout_seconds
-        self.resources = {r: 0 for r in Resource}
-        self.pieces = {
-            Colony.Settlement: 5,
-            Colony.City: 4,
-            Road.Paved: 15
-        }
-        self.unexposed_development_cards = {card: 0 for card in DevelopmentCard}
-        self.exposed_development_cards = {card: 0 for card in DevelopmentCard}
+        # the game data of the player. the state of the game the player plays gives it its own record
+        self.player_state = PlayerState()
+        self._resources_to_drop_table = {}
+
+    def __deepcopy__(self, memo):
+        """
+        copy the game data of the player (see PlayerState). the policy of the player (i.e its algorithms,
+        weights and random generator) is shared with the copy
+        """
+        player = copy.copy(self)
+        memo[id(self)] = player
+        player.player_state = copy.deepcopy(self.player_state, memo)
+        return player
+
+    @property
+    def resources(self) -> Dict[Resource, int]:
+        return self.player_state.resources
+
+    @property
+    def pieces(self) -> Dict:
+        return self.player_state.pieces
+
+    @property
+    def unexposed_development_cards(self) -> Dict[DevelopmentCard, int]:
+        return self.player_state.unexposed_development_cards
+
+    @property
+    def exposed_development_cards(self) -> Dict[DevelopmentCard, int]:
+        return self.player_state.exposed_development_cards
 
     def __lt__(self, other):
         return self._id < other._id
@@ -61,6 +95,35 @@ class AbstractPlayer(abc.ABC):
         """
         raise NotImplementedError()
 
+    def get_resources_to_drop_from_table(self) -> Dict[Resource, int]:
+        """
+        memoized choose_resources_to_drop, to be used in simulations (i.e chance nodes of a search).
+        the decision is made once per hand (and per the other inputs of the decision, see
+        _get_resources_to_drop_policy_key), and then it's looked-up. that way it's cheap, and consistent
+        between simulations of the same state, even if the decision is randomized
+        NOTE: the returned dictionary is shared, it must not be changed
+        :return: Dict[Resource, int] from resources to the number of resources to drop
+        """
+        if sum(self.resources.values()) < 8:
+            return {}
+        key = (tuple(self.player_state.resources.counts), tuple(self.player_state.pieces.counts),
+               self._get_resources_to_drop_policy_key())
+        resources_to_drop = self._resources_to_drop_table.get(key)
+        if resources_to_drop is None:
+            if len(self._resources_to_drop_table) >= AbstractPlayer.resources_to_drop_table_max_size:
+                self._resources_to_drop_table.clear()
+            resources_to_drop = self.choose_resources_to_drop()
+            self._resources_to_drop_table[key] = resources_to_drop
+        return resources_to_drop
+
+    def _get_resources_to_drop_policy_key(self):
+        """
+        the inputs choose_resources_to_drop depends on, besides the resources and pieces of the player
+        override this if the decision depends on anything else (i.e the phase of the game)
+        :return: hashable object
+        """
+        return None
+
     def add_resource(self, resource_type: Resource, how_many=1):
         """
         As the name implies
@@ -68,7 +131,7 @@ class AbstractPlayer(abc.ABC):
         :param how_many: number of resource units to add
         :return: None
         """
-        self.resources[resource_type] += how_many
+        self.player_state.resources.counts[resource_type._value_] += how_many
 
     def remove_resource(self, resource_type: Resource, how_many=1):
         """
@@ -108,7 +171,7 @@ class AbstractPlayer(abc.ABC):
         :param resource_type: Brick, Lumber, Wool, Grain, Ore, Desert
         :return: the number of resource units the player has
         """
-        return self.resources[resource_type]
+        return self.player_state.resources.counts[resource_type._value_]
 
     def add_unexposed_development_card(self, card: DevelopmentCard):
         """
@@ -185,46 +248,44 @@ class AbstractPlayer(abc.ABC):
         indicate whether there are enough resources to pave a road
         :return: True if enough resources to pave a road, False otherwise
         """
-        return (self.resources[Resource.Brick] >= 1 and
-                self.resources[Resource.Lumber] >= 1 and
-                self.pieces[Road.Paved] > 0)
+        resources = self.player_state.resources.counts
+        return resources[_brick] >= 1 and resources[_lumber] >= 1 and self.player_state.pieces.counts[_road] > 0
 
     def amount_of_roads_can_afford(self):
-        return min(self.resources[Resource.Brick],
-                   self.resources[Resource.Lumber],
-                   self.pieces[Road.Paved])
+        resources = self.player_state.resources.counts
+        return min(resources[_brick], resources[_lumber], self.player_state.pieces.counts[_road])
 
     def can_settle_settlement(self):
         """
         indicate whether there are enough resources to build a settlement
         :return: True if enough resources to build a settlement, False otherwise
         """
-        return (self.resources[Resource.Brick] >= 1 and
-                self.resources[Resource.Lumber] >= 1 and
-                self.resources[Resource.Wool] >= 1 and
-                self.resources[Resource.Grain] >= 1 and
-                self.pieces[Colony.Settlement] > 0)
+        resources = self.player_state.resources.counts
+        return (resources[_brick] >= 1 and
+                resources[_lumber] >= 1 and
+                resources[_wool] >= 1 and
+                resources[_grain] >= 1 and
+                self.player_state.pieces.counts[_settlement] > 0)
 
     def amount_of_settlements_can_afford(self):
-        return min(self.pieces[Colony.Settlement],
-                   self.resources[Resource.Brick],
-                   self.resources[Resource.Lumber],
-                   self.resources[Resource.Wool],
-                   self.resources[Resource.Grain])
+        resources = self.player_state.resources.counts
+        return min(self.player_state.pieces.counts[_settlement],
+                   resources[_brick],
+                   resources[_lumber],
+                   resources[_wool],
+                   resources[_grain])
 
     def can_settle_city(self):
         """
         indicate whether there are enough resources to build a city
         :return: True if enough resources to build a city, False otherwise
         """
-        return (self.resources[Resource.Ore] >= 3 and
-                self.resources[Resource.Grain] >= 2 and
-                self.pieces[Colony.City] > 0)
+        resources = self.player_state.resources.counts
+        return resources[_ore] >= 3 and resources[_grain] >= 2 and self.player_state.pieces.counts[_city] > 0
 
     def amount_of_cities_can_afford(self):
-        return min(int(self.resources[Resource.Ore] / 3),
-                   int(self.resources[Resource.Grain] / 2),
-                   self.pieces[Colony.City])
+        resources = self.player_state.resources.counts
+        return min(resources[_ore] // 3, resources[_grain] // 2, self.player_state.pieces.counts[_city])
 
     def has_resources_for_development_card(self):
         """
@@ -233,59 +294,53 @@ class AbstractPlayer(abc.ABC):
         pieces (in this case develpoment-cards in the deck)
         :return: True if enough resources to buy a development card, False otherwise
         """
-        return (self.resources[Resource.Ore] >= 1 and
-                self.resources[Resource.Wool] >= 1 and
-                self.resources[Resource.Grain] >= 1)
+        resources = self.player_state.resources.counts
+        return resources[_ore] >= 1 and resources[_wool] >= 1 and resources[_grain] >= 1
+
+    def get_affordable_counts(self) -> np.ndarray:
+        """
+        get how many roads, settlements, cities and development cards the player can afford (each on its own).
+        see PlayerState.get_affordable_counts, which computes it for many hands at once
+        :return: np.ndarray of the 4 counts, in the order of PlayerState.purchases_costs
+        """
+        return PlayerState.get_affordable_counts(self.player_state.resources.counts, self.player_state.pieces.counts)
 
     def remove_resources_and_piece_for_road(self):
         assert self.can_pave_road()
-        self.remove_resource(Resource.Brick)
-        self.remove_resource(Resource.Lumber)
-        self.pieces[Road.Paved] -= 1
+        self._update_resources_and_pieces(_road_costs, -1, _road)
 
     def remove_resources_and_piece_for_settlement(self):
         assert self.can_settle_settlement()
-        self.remove_resource(Resource.Brick)
-        self.remove_resource(Resource.Lumber)
-        self.remove_resource(Resource.Wool)
-        self.remove_resource(Resource.Grain)
-        self.pieces[Colony.Settlement] -= 1
+        self._update_resources_and_pieces(_settlement_costs, -1, _settlement)
 
     def remove_resources_and_piece_for_city(self):
         assert self.can_settle_city()
-        self.remove_resource(Resource.Ore, 3)
-        self.remove_resource(Resource.Grain, 2)
-        self.pieces[Colony.City] -= 1
-        self.pieces[Colony.Settlement] += 1
+        self._update_resources_and_pieces(_city_costs, -1, _city)
+        self.player_state.pieces.counts[_settlement] += 1
 
     def remove_resources_for_development_card(self):
         assert self.has_resources_for_development_card()
-        self.remove_resource(Resource.Ore)
-        self.remove_resource(Resource.Wool)
-        self.remove_resource(Resource.Grain)
+        self._update_resources_and_pieces(_development_card_costs, -1)
 
     def add_resources_and_piece_for_road(self):
-        self.add_resource(Resource.Brick)
-        self.add_resource(Resource.Lumber)
-        self.pieces[Road.Paved] += 1
+        self._update_resources_and_pieces(_road_costs, 1, _road)
 
     def add_resources_and_piece_for_settlement(self):
-        self.add_resource(Resource.Brick)
-        self.add_resource(Resource.Lumber)
-        self.add_resource(Resource.Wool)
-        self.add_resource(Resource.Grain)
-        self.pieces[Colony.Settlement] += 1
+        self._update_resources_and_pieces(_settlement_costs, 1, _settlement)
 
     def add_resources_and_piece_for_city(self):
-        self.add_resource(Resource.Ore, 3)
-        self.add_resource(Resource.Grain, 2)
-        self.pieces[Colony.City] += 1
-        self.pieces[Colony.Settlement] -= 1
+        self._update_resources_and_pieces(_city_costs, 1, _city)
+        self.player_state.pieces.counts[_settlement] -= 1
 
     def add_resources_for_development_card(self):
-        self.add_resource(Resource.Ore)
-        self.add_resource(Resource.Wool)
-        self.add_resource(Resource.Grain)
+        self._update_resources_and_pieces(_development_card_costs, 1)
+
+    def _update_resources_and_pieces(self, costs, sign: int, piece_index: int=None):
+        resources = self.player_state.resources.counts
+        for i, cost in costs:
+            resources[i] += sign * cost
+        if piece_index is not None:
+            self.player_state.pieces.counts[piece_index] += sign
 
     def trade_resources(self, source_resource: Resource, target_resource: Resource, count: int, ratio: int):
         self.remove_resource(source_resource, count * ratio)
@@ -1,18 +1,26 @@
 import copy
 from collections import Counter
 from math import ceil
-from typing import Dict, Callable, List
+from typing import Dict, Callable, List, Sequence, Tuple, Union
 
 from algorithms.abstract_state import AbstractState, AbstractMove
 from algorithms.alpha_beta_pruning_expectimax import AlphaBetaExpectimax
+from algorithms.evaluation_cache import EvaluationCache
+from algorithms.moves_cache import MovesCache
+from algorithms.parallel_root_search import ParallelRootSearch
+from algorithms.random_moves_sampler import RandomMovesSampler
+from algorithms.transposition_table import TranspositionTable
 from game.catan_state import CatanState
 from game.resource import Resource, ResourceAmounts
 from players.abstract_player import AbstractPlayer
+from players.move_ordering import score_moves_by_gains
 from players.random_player import RandomPlayer
 from train_and_test.logger import logger
 
 
 class ExpectimaxBaselinePlayer(AbstractPlayer):
+    # the score is at most 5 settlements, 4 cities, the longest road, the largest army and 5 victory-point cards
+    default_heuristic_bounds = (0.0, 22.0)
 
 
     def default_heuristic(self, state: CatanState):
@@ -23,37 +31,135 @@ class ExpectimaxBaselinePlayer(AbstractPlayer):
         return float(state.get_scores_by_player()[self])
 
 
-    def __init__(self, id, seed=None, timeout_seconds=5, heuristic=None, filter_moves=lambda x, y: x):
+    def __init__(self, id, seed=None, timeout_seconds=5, heuristic=None, filter_moves=lambda x, y: x,
+                 heuristic_of_moves=None, heuristic_bounds=None, search_processes_count=1,
+                 evaluation_cache_capacity=None, keep_evaluations_between_turns=False, random_moves_budget=None,
+                 score_moves=score_moves_by_gains, moves_cache_capacity=MovesCache.default_capacity):
         assert seed is None or (isinstance(seed, int) and seed > 0)
 
         super().__init__(id, seed, timeout_seconds)
 
         if heuristic is None:
             heuristic = self.default_heuristic
+            heuristic_bounds = ExpectimaxBaselinePlayer.default_heuristic_bounds
+        self._heuristic_bounds = heuristic_bounds
+        # with a capacity, the heuristic values of the positions the search evaluates are cached (it pays off for
+        # expensive heuristics). they're kept for the next turns of the game only if asked to, as the heuristic
+        # may change between turns
+        self.evaluation_cache = None
+        if evaluation_cache_capacity is not None:
+            self.evaluation_cache = EvaluationCache(evaluation_cache_capacity)
+        self.keep_evaluations_between_turns = keep_evaluations_between_turns
+        # the board of the game the cached values are of
+        self._evaluation_cache_board = None
+        # with a budget, the random nodes are expanded with at most this number of random moves: the most probable
+        # half of it, and samples of the others (see RandomMovesSampler). it trades the accuracy of the values of the
+        # random nodes (i.e those of development-cards purchases) for depth
+        random_moves_sampler = None
+        if random_moves_budget is not None:
+            exact_moves_count = random_moves_budget // 2
+            random_moves_sampler = RandomMovesSampler(exact_moves_count, random_moves_budget - exact_moves_count,
+                                                      seed if seed is not None else 0)
 
         self.expectimax_alpha_beta = AlphaBetaExpectimax(
             is_maximizing_player=lambda p: p is self,
             evaluate_heuristic_value=heuristic,
             timeout_seconds=self._timeout_seconds,
-            filter_moves=filter_moves)
+            filter_moves=filter_moves,
+            evaluate_heuristic_values=heuristic_of_moves,
+            transposition_table=TranspositionTable(),
+            evaluation_cache=self.evaluation_cache,
+            random_moves_sampler=random_moves_sampler,
+            score_moves=score_moves,
+            moves_cache=MovesCache(moves_cache_capacity) if moves_cache_capacity is not None else None)
+        # with more than a single process, the root's moves are searched in parallel by worker processes, that are
+        # forked in the first turn of each game (see _get_search)
+        self._parallel_search = None
+        if search_processes_count > 1:
+            self._parallel_search = ParallelRootSearch(self.expectimax_alpha_beta, search_processes_count)
+        self._parallel_search_players = None
+        # the statistics of the search of the last turn (see SearchStatistics)
+        self.search_statistics = None
 
 
     def choose_move(self, state: CatanState):
-        self.expectimax_alpha_beta.start_turn_timer()
-        best_move, move, depth = None, None, 1
+        search = self._get_search(state)
+        search.start_turn_timer()
+        # the winning move is looked for within the turn's time, and the search gets what's left of it
+        winning_move = state.find_winning_move(self.expectimax_alpha_beta.deadline)
+        if winning_move is not None:
+            logger.info('found a winning move, skipping the search')
+            return winning_move
+        self.expectimax_alpha_beta.heuristic_bounds = self.get_heuristic_bounds(state)
+        # the heuristics of the players may change between turns (i.e by training), so the positions are
+        # remembered for the iterations of a single turn, and so are their moves
+        self.expectimax_alpha_beta.transposition_table.clear()
+        if self.expectimax_alpha_beta.moves_cache is not None:
+            self.expectimax_alpha_beta.moves_cache.clear()
+        # the hashes of the positions leave out the layout of the board, so the values of other games are cleared
+        if self.evaluation_cache is not None and (not self.keep_evaluations_between_turns or
+                                                  self._evaluation_cache_board is not state.board):
+            self.evaluation_cache.clear()
+            self._evaluation_cache_board = state.board
+            # and so are those of the workers of the parallel search, whose caches are their own
+            if self._parallel_search is not None:
+                self._parallel_search.clear_evaluations()
+        best_move, depth = None, 1
         while not self.expectimax_alpha_beta.ran_out_of_time:
-        #for i in range(1):
-            best_move = move
             logger.info('starting depth {}'.format(depth))
-            move = self.expectimax_alpha_beta.get_best_move(state, max_depth=depth)
+            # an interrupted iteration returns its best move so far only if it beat the previous iteration's move
+            move = search.get_best_move(state, max_depth=depth)
+            if move is not None:
+                best_move = move
             depth += 2
+        transposition_table = self.expectimax_alpha_beta.transposition_table
+        logger.info('transposition table: {} lookups, hit rate {:.2f}'.format(
+            transposition_table.probes_count, transposition_table.get_hit_rate()))
+        moves_cache = self.expectimax_alpha_beta.moves_cache
+        if moves_cache is not None:
+            logger.info('moves cache: {} lookups, hit rate {:.2f}'.format(moves_cache.probes_count,
+                                                                          moves_cache.get_hit_rate()))
+        if self.evaluation_cache is not None:
+            logger.info('evaluation cache: {} lookups, hit rate {:.2f}, {} values'.format(
+                self.evaluation_cache.probes_count, self.evaluation_cache.get_hit_rate(), len(self.evaluation_cache)))
+        self.search_statistics = self.expectimax_alpha_beta.statistics
+        logger.info('search: {}'.format(self.search_statistics))
         if best_move is not None:
             return best_move
         else:
-            logger.warning('did not finish depth 1, returning a random move')
+            logger.warning('did not search any move to depth 1, returning a random move')
             return RandomPlayer.choose_move(self, state)
 
 
+    def _get_search(self, state: CatanState):
+        """
+        get the search of the turn: the algorithm itself, or the parallel search, with its worker processes
+        started for the players of the game
+        :param state: the state of the game
+        :return: AlphaBetaExpectimax or ParallelRootSearch
+        """
+        if self._parallel_search is None:
+            return self.expectimax_alpha_beta
+        players = list(state.players)
+        # the players are kept referenced, so a new game's players can't be mistaken for them
+        started_players = self._parallel_search_players
+        if started_players is None or list(map(id, started_players)) != list(map(id, players)):
+            self._parallel_search.close()
+            self._parallel_search.start(lambda data: CatanState.from_bytes(data, players))
+            self._parallel_search_players = players
+        return self._parallel_search
+
+
+    def close_search_processes(self):
+        """
+        stop the worker processes of the parallel search, if any (they're started again if needed)
+        :return: None
+        """
+        if self._parallel_search is not None:
+            self._parallel_search.close()
+        self._parallel_search_players = None
+
+
     def choose_resources_to_drop(self) -> Dict[Resource, int]:
         if sum(self.resources.values()) < 8:
             return {}
@@ -87,12 +193,34 @@ class ExpectimaxBaselinePlayer(AbstractPlayer):
         return Counter(self._random_choice(resources_to_drop, resources_to_drop_count, replace=False))
 
 
-    def set_heuristic(self, evaluate_heuristic_value: Callable[[AbstractState], float]):
+    def get_heuristic_bounds(self, state: CatanState) -> Union[Tuple[float, float], None]:
+        """
+        get the lowest and highest values the heuristic can return in the game of given state. the search prunes
+        the random nodes by them (see AlphaBetaExpectimax._search_random_moves)
+        :param state: the state of the game
+        :return: the bounds of the heuristic, or None if it has none (then the random nodes aren't pruned)
+        """
+        return self._heuristic_bounds
+
+
+    def set_heuristic(self, evaluate_heuristic_value: Callable[[AbstractState], float],
+                      evaluate_heuristic_values: Callable[[AbstractState, List[AbstractMove]], Sequence[float]]=None,
+                      heuristic_bounds: Tuple[float, float]=None):
         """
         set heuristic evaluation of a state in a game
         :param evaluate_heuristic_value: a callable that given state returns a float. higher means "better" state
+        :param evaluate_heuristic_values: optional parameter. the same heuristic, evaluating the states after each of
+        given moves in bulk (see AlphaBetaExpectimax). if None, the states are evaluated one by one
+        :param heuristic_bounds: optional parameter. the lowest and highest values the heuristic can return
+        (see get_heuristic_bounds). if None, the random nodes aren't pruned
         """
         self.expectimax_alpha_beta.evaluate_heuristic_value = evaluate_heuristic_value
+        self.expectimax_alpha_beta.evaluate_heuristic_values = evaluate_heuristic_values
+        self._heuristic_bounds = heuristic_bounds
+        self.expectimax_alpha_beta.transposition_table.clear()
+        if self.evaluation_cache is not None:
+            self.evaluation_cache.clear()
+        self.close_search_processes()
 
 
     def set_filter(self, filter_moves: Callable[[List[AbstractMove]], List[AbstractMove]]):
@@ -101,6 +229,9 @@ class ExpectimaxBaselinePlayer(AbstractPlayer):
         :param filter_moves: a callable that given list of moves, returns a list of moves that will be further developed
         """
         self.expectimax_alpha_beta.filter_moves = filter_moves
+        if self.expectimax_alpha_beta.moves_cache is not None:
+            self.expectimax_alpha_beta.moves_cache.clear()
+        self.close_search_processes()
 
 
     def __str__(self):
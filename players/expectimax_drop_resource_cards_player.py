@@ -2,8 +2,9 @@ from players.expectimax_baseline_player import ExpectimaxBaselinePlayer
 
 
 class ExpectimaxDropResourceCardsPlayer(ExpectimaxBaselinePlayer):
-    def __init__(self, id, seed=None, timeout_seconds=5):
-        super().__init__(id, seed, timeout_seconds, self.drop_resource_cards_heuristic)
+    def __init__(self, id, seed=None, timeout_seconds=5, search_processes_count=1, random_moves_budget=None):
+        super().__init__(id, seed, timeout_seconds, self.drop_resource_cards_heuristic,
+                         search_processes_count=search_processes_count, random_moves_budget=random_moves_budget)
 
     def drop_resource_cards_heuristic(self, s):
         return -sum(self.resources.values())
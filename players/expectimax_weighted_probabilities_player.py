@@ -1,6 +1,12 @@
+from typing import Tuple, Union, List
+
+import numpy as np
+
+from game.catan_moves import CatanMove
 from game.catan_state import CatanState
 from game.development_cards import DevelopmentCard
 from game.pieces import Road, Colony
+from game.player_state import PlayerState
 from players.expectimax_baseline_player import ExpectimaxBaselinePlayer
 
 
@@ -8,11 +14,28 @@ class ExpectimaxWeightedProbabilitiesPlayer(ExpectimaxBaselinePlayer):
     default_weights = {Colony.City: 2, Colony.Settlement: 1, Road.Paved: 0.4,
                        DevelopmentCard.VictoryPoint: 1, DevelopmentCard.Knight: 2.0 / 3.0}
 
-    def __init__(self, id, seed=None, timeout_seconds=5, weights=default_weights, filter_moves=lambda x, y: x):
-        super().__init__(id, seed, timeout_seconds, self.weighted_probabilities_heuristic, filter_moves)
+    def __init__(self, id, seed=None, timeout_seconds=5, weights=default_weights, filter_moves=lambda x, y: x,
+                 search_processes_count=1, random_moves_budget=None):
+        super().__init__(id, seed, timeout_seconds, self.weighted_probabilities_heuristic, filter_moves,
+                         heuristic_of_moves=self.weighted_probabilities_heuristic_of_moves,
+                         search_processes_count=search_processes_count, random_moves_budget=random_moves_budget)
         self.weights = weights
         self._players_and_factors = None
 
+    def get_heuristic_bounds(self, state: CatanState) -> Union[Tuple[float, float], None]:
+        """
+        the weighted probabilities of the player count len(players) - 1 times, and those of each of the others count
+        once against it, so the value is within len(players) - 1 times the highest weighted probabilities a player
+        can have, either way. the development cards are the player's own in all the terms, so they cancel out
+        """
+        if self.expectimax_alpha_beta.evaluate_heuristic_value != self.weighted_probabilities_heuristic:
+            return super().get_heuristic_bounds(state)
+        pieces_counts = PlayerState().pieces
+        highest = sum(abs(self.weights[piece]) * pieces_counts[piece] * probability
+                      for piece, probability in state.board.get_max_production_probabilities().items())
+        highest *= len(state.players) - 1
+        return -highest, highest
+
     def weighted_probabilities_heuristic(self, s: CatanState):
         if self._players_and_factors is None:
             self._players_and_factors = [(self, len(s.players) - 1)] + [(p, -1) for p in s.players if p is not self]
@@ -20,17 +43,38 @@ class ExpectimaxWeightedProbabilitiesPlayer(ExpectimaxBaselinePlayer):
         score = 0
         # noinspection PyTypeChecker
         for player, factor in self._players_and_factors:
-            for location in s.board.get_locations_colonised_by_player(player):
-                weight = self.weights[s.board.get_colony_type_at_location(location)]
-                for dice_value in s.board.get_surrounding_dice_values(location):
-                    score += s.probabilities_by_dice_values[dice_value] * weight * factor
-
-            for road in s.board.get_roads_paved_by_player(player):
-                weight = self.weights[Road.Paved]
-                for dice_value in s.board.get_adjacent_to_path_dice_values(road):
-                    score += s.probabilities_by_dice_values[dice_value] * weight * factor
+            for piece, probability in s.board.get_production_probabilities(player).items():
+                score += probability * self.weights[piece] * factor
 
             for development_card in {DevelopmentCard.VictoryPoint, DevelopmentCard.Knight}:
                 weight = self.weights[development_card]
                 score += self.get_unexposed_development_cards()[development_card] * weight * factor
         return score
+
+    def weighted_probabilities_heuristic_of_moves(self, s: CatanState, moves: List[CatanMove]) -> np.ndarray:
+        """
+        the weighted probabilities heuristic of the states after each of given moves, evaluated in bulk: the
+        production probabilities of the players' pieces and the player's development cards in the states are
+        gathered into a matrix, that is multiplied at once by the weights (with the factors of the players)
+        :param s: the state of the game. it's left as it was
+        :param moves: the moves to evaluate the states after
+        :return: np.ndarray of the scores, one per move
+        """
+        if self._players_and_factors is None:
+            self._players_and_factors = [(self, len(s.players) - 1)] + [(p, -1) for p in s.players if p is not self]
+        development_cards = (DevelopmentCard.VictoryPoint, DevelopmentCard.Knight)
+        factors_sum = sum(factor for _, factor in self._players_and_factors)
+        weights = ([self.weights[piece] * factor for _, factor in self._players_and_factors
+                    for piece in s.board.get_production_probabilities(self)] +
+                   [self.weights[development_card] * factors_sum for development_card in development_cards])
+
+        features = np.empty((len(moves), len(weights)))
+        for i, move in enumerate(moves):
+            s.make_move(move)
+            row = [probability for player, _ in self._players_and_factors
+                   for probability in s.board.get_production_probabilities(player).values()]
+            unexposed_development_cards = self.get_unexposed_development_cards()
+            row += [unexposed_development_cards[development_card] for development_card in development_cards]
+            features[i] = row
+            s.unmake_move(move)
+        return features.dot(weights)
@@ -3,8 +3,11 @@ from players.filters import create_bad_robber_placement_and_monte_carlo_filter
 
 
 class ExpectimaxWeightedProbabilitiesWithFilterPlayer(ExpectimaxWeightedProbabilitiesPlayer):
-    def __init__(self, id, seed=None, timeout_seconds=5, branching_factor=387):
+    def __init__(self, id, seed=None, timeout_seconds=5, branching_factor=387, search_processes_count=1,
+                 random_moves_budget=None):
         super().__init__(id,
                          seed=seed,
                          timeout_seconds=timeout_seconds,
-                         filter_moves=create_bad_robber_placement_and_monte_carlo_filter(seed, self, branching_factor))
+                         filter_moves=create_bad_robber_placement_and_monte_carlo_filter(seed, self, branching_factor),
+                         search_processes_count=search_processes_count,
+                         random_moves_budget=random_moves_budget)
@@ -3,10 +3,12 @@ from typing import Dict
 
 from game.board import Harbor, Board
 from game.catan_state import CatanState
+from game.initialisation_placements import InitialisationPlacements
 from game.resource import Resource, ResourceAmounts
 
 from players.abstract_player import AbstractPlayer, Colony
 from algorithms.mcts import MCTS, MCTSNode
+from algorithms.timeoutable_algorithm import Deadline
 from collections import Counter
 import numpy as np
 
@@ -27,19 +29,14 @@ class MCTSPlayer(AbstractPlayer):
 
     def choose_move(self, state: CatanState):
         self.scores_by_player = state.get_scores_by_player_indexed()
+        winning_move = state.find_winning_move(Deadline(self._timeout_seconds))
+        if winning_move is not None:
+            return winning_move
         next_moves = state.get_next_moves()
         if len(next_moves) <= 1:
             return next_moves[0]
         if state.is_initialisation_phase():
-            best_move, best_score = None, 0
-            for move in next_moves:
-                state.make_move(move)
-                score = self.initialization_phase_heuaristic(state)
-                state.unmake_move(move)
-                if score > best_score:
-                    best_move = move
-                    best_score = score
-            return best_move
+            return InitialisationPlacements(state.board).rank_moves(self, next_moves)[0]
         mcts = MCTS(MCTSNode(state), next_moves, self.exploration_param)
         mcts.do_n_rollouts(self.iterations)
         return mcts.choose().move
@@ -50,6 +47,9 @@ class MCTSPlayer(AbstractPlayer):
             return self.drop_resources_in_first_phase()
         return self.drop_resources_in_final_phase()
 
+    def _get_resources_to_drop_policy_key(self):
+        return self.in_first_phase()
+
 
     def drop_resources_in_first_phase(self):
         resources_count = sum(self.resources.values())
@@ -151,17 +151,11 @@ class MCTSPlayer(AbstractPlayer):
         each resource is a key, and it's value is that player's expected yield.
         """
         res_yield = {Colony.Settlement: 1, Colony.City: 2}
-        resources = {r: 0 for r in Resource}
-
-        for location in state.board.get_locations_colonised_by_player(player):
-            colony_yield = res_yield[state.board.get_colony_type_at_location(location)]
-            for land in state.board._roads_and_colonies.node[location][Board.lands]:  # The adjacent lands to the location we check
-                if land.resource is None:  # If this is a desert - do nothing
-                    continue
-                calc = colony_yield * state.probabilities_by_dice_values[land.dice_value]
-                resources[land.resource] += calc
+        colonies = state.board.get_locations_colonised_by_player(player)
+        colonies_yields = [res_yield[state.board.get_colony_type_at_location(location)] for location in colonies]
+        resources = np.dot(colonies_yields, state.board.get_resources_probabilities(colonies))
 
-        return resources
+        return {r: resources[r.value] for r in Resource}
 
     def drop_resources_in_final_phase(self):
         resources_count = sum(self.resources.values())
@@ -0,0 +1,48 @@
+from typing import List
+
+from game.catan_moves import CatanMove
+from game.catan_state import CatanState
+from game.pieces import Colony
+
+
+def score_moves_by_gains(moves: List[CatanMove], state: CatanState) -> List[float]:
+    """
+    score the moves of a state for the ordering of the search (see AlphaBetaExpectimax.score_moves), by what they
+    gain at a glance, without making them: the points of their new settlements and cities, the production
+    probabilities of these (a city adds that of its settlement again), and the production the robber takes from the
+    leading opponent (less the player's own production it takes)
+    :param moves: the moves to score
+    :param state: the state of the game, before the moves
+    :return: the scores of the moves, higher for the moves that are likely better for the current player
+    """
+    board = state.board
+    player = state.get_current_player()
+    scores_by_player = state.get_scores_by_player()
+    opponents = [opponent for opponent in state.players if opponent is not player]
+    leader = max(opponents, key=lambda opponent: scores_by_player[opponent]) if opponents else None
+    robber_land = board.get_robber_land()
+
+    def get_blocked_production(land, colonies_player) -> float:
+        if land.resource is None:
+            return 0.0
+        colonies_count = sum(board.get_colony_type_at_location(location).value for location in land.locations
+                             if board.is_colonised_by(colonies_player, location))
+        return colonies_count * state.probabilities_by_dice_values[land.dice_value]
+
+    robber_scores_by_lands = {}
+    scores = []
+    for move in moves:
+        settlements, cities = move.locations_to_be_set_to_settlements, move.locations_to_be_set_to_cities
+        score = len(settlements) + len(cities)
+        score += sum(board.get_location_probability(location) for location in settlements)
+        score += sum(board.get_location_probability(location) for location in cities)
+
+        land = move.robber_placement_land
+        if land is not robber_land:
+            robber_score = robber_scores_by_lands.get(land.identifier)
+            if robber_score is None:
+                robber_score = get_blocked_production(land, leader) - get_blocked_production(land, player)
+                robber_scores_by_lands[land.identifier] = robber_score
+            score += robber_score
+        scores.append(score)
+    return scores
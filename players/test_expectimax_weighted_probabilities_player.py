@@ -0,0 +1,36 @@
+from unittest import TestCase
+
+from game.catan_state import CatanState
+from game.resource import Resource
+from players.expectimax_weighted_probabilities_player import ExpectimaxWeightedProbabilitiesPlayer
+from players.random_player import RandomPlayer
+
+
+class TestExpectimaxWeightedProbabilitiesPlayer(TestCase):
+    def setUp(self):
+        self.player = ExpectimaxWeightedProbabilitiesPlayer(0, seed=1, timeout_seconds=0.1)
+        self.players = [self.player] + [RandomPlayer(i, seed=i + 1) for i in range(1, 4)]
+        self.state = CatanState(self.players, seed=1)
+
+    def test_heuristic_of_moves_evaluates_as_heuristic(self):
+        # play the setup phase, and give the player resources for a few moves
+        while self.state.is_initialisation_phase():
+            self.state.make_move(self.state.get_current_player().choose_move(self.state))
+            self.state.make_random_move()
+        while self.state.get_current_player() is not self.player:
+            self.state.make_move(self.state.get_current_player().choose_move(self.state))
+            self.state.make_random_move()
+        for resource in Resource:
+            self.player.add_resource(resource, 2)
+        moves = self.state.get_next_moves()
+        snapshot = self.state.to_bytes()
+
+        # assert the moves are evaluated in bulk as they're evaluated one by one
+        values = self.player.weighted_probabilities_heuristic_of_moves(self.state, moves)
+        self.assertEqual(self.state.to_bytes(), snapshot)
+        self.assertGreater(len(moves), 1)
+        self.assertEqual(len(values), len(moves))
+        for move, value in zip(moves, values):
+            self.state.make_move(move)
+            self.assertAlmostEqual(value, self.player.weighted_probabilities_heuristic(self.state))
+            self.state.unmake_move(move)
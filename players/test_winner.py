@@ -0,0 +1,26 @@
+from unittest import TestCase
+
+from game.catan_moves import RandomMove
+from game.catan_state import CatanState
+from game.resource import Resource
+from players.winner import Winner
+
+
+class TestWinner(TestCase):
+    def setUp(self):
+        self.players = [Winner(i, seed=i + 1, timeout_seconds=0.1) for i in range(4)]
+        self.state = CatanState(self.players, seed=1)
+
+    def test_drops_resources_when_dice_roll_7_right_after_setup(self):
+        # play the setup phase, where the placements are ranked rather than searched for
+        while self.state.is_initialisation_phase():
+            self.state.make_move(self.state.get_current_player().choose_move(self.state))
+            self.state.make_random_move()
+        for player in self.players:
+            player.add_resource(Resource.Brick, 8)
+        resources_counts = [sum(player.resources.values()) for player in self.players]
+
+        # assert the players decide what to drop on a 7 (with the scores of the setup phase)
+        self.state.make_random_move(RandomMove(7, 1.0, self.state))
+        for player, resources_count in zip(self.players, resources_counts):
+            self.assertEqual(sum(player.resources.values()), resources_count // 2)
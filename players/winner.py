@@ -1,4 +1,7 @@
+from algorithms.evaluation_cache import EvaluationCache
 from game.catan_state import CatanState
+from game.catan_moves import CatanMove
+from game.initialisation_placements import InitialisationPlacements
 from players.expectimax_baseline_player import ExpectimaxBaselinePlayer
 from players.expectimax_weighted_probabilities_with_filter_player import *
 from players.abstract_player import *
@@ -11,7 +14,8 @@ import numpy as np
 
 import copy
 from players.random_player import RandomPlayer
-from collections import Counter
+from collections import Counter, defaultdict
+from typing import Dict, List
 from players.filters import *
 
 
@@ -22,6 +26,248 @@ TOTAL_WEIGHTS = 35
 NUM_OF_WEIGHTS =7
 
 
+class WinnerFeaturesEvaluator:
+    """
+    the first (and final) phase heuristic of Winner (see Winner.heuristic_first_phase), compiled once from the
+    weights of its features:
+    -only the features with non-zero weights are computed (a feature whose weight is zero adds nothing)
+    -the intermediate results (the colonies and roads of the players, the trade ratios and the resource
+     expectation) are computed once per evaluation, and shared by the features that need them
+    -the features are written into a buffer that is reused between evaluations
+    the computations are the same as the original ones, so the scores are the same (up to rounding)
+    """
+    # the paths of the map with their keys, in the order of the graph's edges (the same in all the boards)
+    _paths = None
+
+    def __init__(self, weights: np.ndarray):
+        assert len(weights) == TOTAL_WEIGHTS
+        self._weights = np.array(weights, dtype=float)
+        self._values = np.zeros(TOTAL_WEIGHTS)
+
+        def needed(first, last=None):
+            return bool(np.any(self._weights[first:(first if last is None else last) + 1] != 0))
+
+        self._needs_hand = needed(0, 4)
+        self._needs_hand_by_trade_ratios = needed(5, 9)
+        self._needs_expectation = needed(10, 14)
+        self._needs_expectation_by_trade_ratios = needed(15, 19)
+        self._needs_total_expectation = needed(20)
+        self._needs_development_cards_count = needed(21)
+        self._needs_avg_vp_difference = needed(22)
+        self._needs_max_vp_difference = needed(23)
+        self._needs_can_settle_settlement = needed(24)
+        self._needs_can_settle_city = needed(25)
+        self._needs_has_resources_for_development_card = needed(26)
+        self._needs_settleable_locations_count = needed(27)
+        self._needs_turns_till_pieces = needed(28, 31)
+        self._needs_vp = needed(32)
+        self._needs_weighted_probabilities = needed(33)
+        self._needs_exposed_knights_difference = needed(34)
+
+        self._needs_trade_ratios = self._needs_hand_by_trade_ratios or self._needs_expectation_by_trade_ratios
+        self._needs_resource_expectation = (self._needs_expectation or self._needs_expectation_by_trade_ratios or
+                                            self._needs_total_expectation or self._needs_turns_till_pieces)
+        self._needs_scores = self._needs_avg_vp_difference or self._needs_max_vp_difference or self._needs_vp
+
+    def evaluate(self, player, state: CatanState) -> float:
+        """
+        evaluate the state for given player
+        :param player: the Winner player the state is evaluated for
+        :param state: the state of the game
+        :return: the score of the state, the weighted sum of the features
+        """
+        return self.evaluate_features(self.get_features(player, state))
+
+    def evaluate_features(self, features: np.ndarray) -> np.ndarray:
+        """
+        evaluate many states at once, from their features
+        :param features: np.ndarray of shape (states count, TOTAL_WEIGHTS), the features of the states, a row per
+        state (see get_features). a single row (of shape (TOTAL_WEIGHTS,)) evaluates a single state
+        :return: np.ndarray of the scores of the states
+        """
+        # multiplied and summed along the rows (rather than a matrix product), so a state scores the same, to the
+        # last bit, whether it's evaluated alone or with others
+        return (features * self._weights).sum(axis=-1)
+
+    def get_features(self, player, state: CatanState) -> np.ndarray:
+        """
+        get the features of the state for given player. the features with zero weights aren't computed
+        NOTE: the features are written into a buffer that is reused by the next call, copy them to keep them
+        :param player: the Winner player the state is evaluated for
+        :param state: the state of the game
+        :return: np.ndarray of the TOTAL_WEIGHTS features
+        """
+        values = self._values
+        board = state.board
+        current_resources = player.resources
+
+        colonies_by_players, roads_by_players = None, None
+        if self._needs_resource_expectation or self._needs_trade_ratios or self._needs_settleable_locations_count:
+            colonies_by_players = WinnerFeaturesEvaluator._get_colonies_by_players(board)
+        if self._needs_settleable_locations_count:
+            roads_by_players = WinnerFeaturesEvaluator._get_roads_by_players(board)
+
+        # how many cards of each resource we have right now
+        if self._needs_hand:
+            for r in Resource:
+                values[r.value] = current_resources[r]
+
+        # what is our trading ratio for each resource
+        if self._needs_trade_ratios:
+            trade_ratios = WinnerFeaturesEvaluator._get_trade_ratios(board, colonies_by_players.get(player, []))
+            # current resources * trade ratios
+            if self._needs_hand_by_trade_ratios:
+                for r in Resource:
+                    values[5 + r.value] = current_resources[r] * (1 / trade_ratios[r])
+
+        if self._needs_resource_expectation:
+            resource_expectation = WinnerFeaturesEvaluator._get_resource_expectation(
+                state, colonies_by_players.get(player, []))
+            if self._needs_expectation:
+                for r in Resource:
+                    values[10 + r.value] = resource_expectation[r]
+            # resource expectations * trade ratios
+            if self._needs_expectation_by_trade_ratios:
+                for r in Resource:
+                    values[15 + r.value] = resource_expectation[r] * (1 / trade_ratios[r])
+            # total resource expectation
+            if self._needs_total_expectation:
+                values[20] = sum(resource_expectation[r] for r in Resource)
+
+        # the number of unexposed development cards, except for VP dev cards. (num dev cards)
+        if self._needs_development_cards_count:
+            values[21] = (sum(player.unexposed_development_cards.values()) +
+                          sum(player.exposed_development_cards.values()) -
+                          player.unexposed_development_cards[DevelopmentCard.VictoryPoint])
+
+        # average and max difference between player's VP, and other's VP. should be with negative weights.
+        if self._needs_scores:
+            scores_by_players = state.get_scores_by_player()
+            if self._needs_avg_vp_difference:
+                values[22] = Winner.get_avg_vp_difference(scores_by_players, player)
+            if self._needs_max_vp_difference:
+                values[23] = Winner.get_vp_diff(scores_by_players, player)
+            # our VP
+            if self._needs_vp:
+                values[32] = scores_by_players[player]
+
+        if self._needs_can_settle_settlement:
+            values[24] = 1 if player.can_settle_settlement() else 0
+        if self._needs_can_settle_city:
+            values[25] = 1 if player.can_settle_city() else 0
+        if self._needs_has_resources_for_development_card:
+            values[26] = 1 if player.has_resources_for_development_card() else 0
+
+        # number of places we could build a settlement
+        if self._needs_settleable_locations_count:
+            values[27] = WinnerFeaturesEvaluator._get_settleable_locations_count(
+                player, board, colonies_by_players, roads_by_players)
+
+        # estimate how many turns it would take to get the resources for a road, settlement, city or dev card.
+        if self._needs_turns_till_pieces:
+            for i, amounts in enumerate((ResourceAmounts.road, ResourceAmounts.settlement,
+                                         ResourceAmounts.city, ResourceAmounts.development_card)):
+                values[28 + i] = Winner.get_turns_till_piece(current_resources, resource_expectation, amounts)
+
+        # the other heuristic
+        if self._needs_weighted_probabilities:
+            values[33] = WinnerFeaturesEvaluator._get_weighted_probabilities(player, state)
+
+        # difference between number of exposed knights.
+        if self._needs_exposed_knights_difference:
+            values[34] = Winner.get_exposed_knights_diff(player, state)
+
+        return values
+
+    @staticmethod
+    def _get_colonies_by_players(board: Board) -> Dict:
+        """
+        the colonised locations of each player, in the order of the locations (as in
+        Board.get_locations_colonised_by_player), in one pass over the locations
+        """
+        colonies_by_players = defaultdict(list)
+        for location, (owner, _) in board._roads_and_colonies.nodes(data=Board.player):
+            if owner is not None:
+                colonies_by_players[owner].append(location)
+        return colonies_by_players
+
+    @staticmethod
+    def _get_roads_by_players(board: Board) -> Dict:
+        """
+        the paved roads of each player, in the order of the paths (as in Board.get_roads_paved_by_player),
+        in one pass over the paths
+        """
+        if WinnerFeaturesEvaluator._paths is None:
+            WinnerFeaturesEvaluator._paths = [(path, path_key(path)) for path in board._roads_and_colonies.edges()]
+        roads_by_players = defaultdict(list)
+        players_by_roads = board._players_by_roads
+        for path, key in WinnerFeaturesEvaluator._paths:
+            owner = players_by_roads[key]
+            if owner is not None:
+                roads_by_players[owner].append(path)
+        return roads_by_players
+
+    @staticmethod
+    def _get_settleable_locations_count(player, board: Board, colonies_by_players: Dict, roads_by_players: Dict) -> int:
+        """
+        the number of locations given player can settle (see Board.get_settleable_locations_by_player), computed
+        from the colonies and roads of the players: the locations that aren't colonised nor next to a colony, and
+        (after the first two colonies of the player) are at the end of one of its roads
+        """
+        graph = board._roads_and_colonies
+        blocked = set()
+        for colonies in colonies_by_players.values():
+            for location in colonies:
+                blocked.add(location)
+                blocked.update(graph.neighbors(location))
+        if len(colonies_by_players.get(player, [])) < 2:
+            return len(Board._vertices) - len(blocked)
+        roads_ends = set()
+        for road in roads_by_players.get(player, []):
+            roads_ends.update(road)
+        return len(roads_ends - blocked)
+
+    @staticmethod
+    def _get_trade_ratios(board: Board, colonies: List[Location]) -> Dict[Resource, int]:
+        """
+        the trade ratio of each resource (see Winner.calc_player_trade_ratio), for a player with given colonies
+        """
+        colonies = set(colonies)
+
+        def is_on_harbor(harbor: Harbor):
+            return any(location in colonies for location in board._locations_by_harbors[harbor])
+
+        generic_ratio = 3 if is_on_harbor(Harbor.HarborGeneric) else 4
+        return {r: 2 if is_on_harbor(Harbor(r.value)) else generic_ratio for r in Resource}
+
+    @staticmethod
+    def _get_resource_expectation(state: CatanState, colonies: List[Location]) -> Dict[Resource, float]:
+        """
+        the resource expectation (see Winner.get_resource_expectation), for a player with given colonies
+        """
+        res_yield = {Colony.Settlement: 1, Colony.City: 2}
+        colonies_yields = [res_yield[state.board.get_colony_type_at_location(location)] for location in colonies]
+        resources = np.dot(colonies_yields, state.board.get_resources_probabilities(colonies))
+        return {r: resources[r.value] for r in Resource}
+
+    @staticmethod
+    def _get_weighted_probabilities(player, state: CatanState) -> float:
+        """
+        the weighted probabilities heuristic (see Winner.weighted_probabilities_heuristic), with the players of
+        given state
+        """
+        players_and_factors = [(player, len(state.players) - 1)] + [(p, -1) for p in state.players if p is not player]
+        score = 0
+        for other, factor in players_and_factors:
+            for piece, probability in state.board.get_production_probabilities(other).items():
+                score += probability * player.expectimax_weights[piece] * factor
+
+            for development_card in {DevelopmentCard.VictoryPoint, DevelopmentCard.Knight}:
+                weight = player.expectimax_weights[development_card]
+                score += player.get_unexposed_development_cards()[development_card] * weight * factor
+        return score
+
+
 class Winner(ExpectimaxBaselinePlayer):
     """
     an AI player of the game Settlers Of Catan.
@@ -33,11 +279,20 @@ class Winner(ExpectimaxBaselinePlayer):
     default_winning_weights = np.array([0, 45, -1, -0.1, 1, 1,-1, 0, 8, -1, -0.1, 3, 1,-2]) # 7 weights for first phase, 7 weights for last phase
 
 
-    def __init__(self, id, seed=None, timeout_seconds=5, weights=default_winning_weights):
-        super().__init__(id=id, seed=seed, timeout_seconds=timeout_seconds, heuristic=self.winning_heuristic, filter_moves=self.filter_moves(seed))
+    def __init__(self, id, seed=None, timeout_seconds=5, weights=default_winning_weights, search_processes_count=1,
+                 evaluation_cache_capacity=EvaluationCache.default_capacity, keep_evaluations_between_turns=False,
+                 random_moves_budget=None):
+        super().__init__(id=id, seed=seed, timeout_seconds=timeout_seconds, heuristic=self.winning_heuristic, filter_moves=self.filter_moves(seed),
+                         heuristic_of_moves=self.winning_heuristic_of_moves,
+                         search_processes_count=search_processes_count,
+                         evaluation_cache_capacity=evaluation_cache_capacity,
+                         keep_evaluations_between_turns=keep_evaluations_between_turns,
+                         random_moves_budget=random_moves_budget)
 
         self.scores_by_player = None
         self._players_and_factors = None
+        # the compiled heuristics, by the bytes of their weights (see heuristic_first_phase)
+        self._features_evaluators = {}
         self.winner_initialization_phase_weights = None
         self.winner_first_phase_weights = None
         self.winner_last_phase_weights = None
@@ -102,6 +357,21 @@ class Winner(ExpectimaxBaselinePlayer):
 
 
 
+    def choose_move(self, state: CatanState):
+        """
+        in the setup phase, the placements are ranked at once by the initialisation heuristic's features (with a
+        look at the player's second placement), instead of searching. otherwise, the move is searched for
+        :param state: the state of the game
+        :return: the chosen move
+        """
+        # the scores are known before the heuristic is ever evaluated, i.e for dropping resources on a 7 that is
+        # rolled right after the setup phase
+        self.scores_by_player = state.get_scores_by_player_indexed()
+        if state.is_initialisation_phase():
+            return InitialisationPlacements(state.board).rank_moves(self, state.get_next_moves(), plan_pairs=True)[0]
+        return super().choose_move(state)
+
+
     def choose_resources_to_drop(self) -> Dict[Resource, int]:
         """
         a function to determine which resources should be discarded in case a 7 was rolled and we have too many cards in hand.
@@ -111,6 +381,9 @@ class Winner(ExpectimaxBaselinePlayer):
             return self.drop_resources_in_first_phase()
         return self.drop_resources_in_final_phase()
 
+    def _get_resources_to_drop_policy_key(self):
+        return self.in_first_phase()
+
 
     def drop_resources_in_first_phase(self):
 
@@ -234,6 +507,51 @@ class Winner(ExpectimaxBaselinePlayer):
         return self.heuristic_final_phase(state, self.winner_last_phase_weights)
 
 
+    def winning_heuristic_of_moves(self, state: CatanState, moves: List[CatanMove]) -> np.ndarray:
+        """
+        the winning heuristic of the states after each of given moves, evaluated in bulk: the features of the states
+        are gathered into a matrix (one per phase weights), that is multiplied by the weights at once.
+        the states that are scored without features (won, lost or in the initialisation phase) are scored as in
+        winning_heuristic. the scores are looked up in the evaluation cache (if the player has one) before they're
+        evaluated, and the evaluated ones are stored in it
+        :param state: the state of the game. it's left as it was
+        :param moves: the moves to evaluate the states after
+        :return: np.ndarray of the scores, one per move
+        """
+        scores = np.empty(len(moves))
+        features_by_evaluators = defaultdict(list)
+        keys = [None] * len(moves)
+        for i, move in enumerate(moves):
+            state.make_move(move)
+            score = None
+            if self.evaluation_cache is not None:
+                keys[i] = state.get_hash()
+                score = self.evaluation_cache.lookup(keys[i])
+            self.scores_by_player = state.get_scores_by_player_indexed()
+            if score is not None:
+                scores[i] = score
+                keys[i] = None
+            elif self.scores_by_player[self.get_id()] >= 10:
+                scores[i] = inf
+            elif max(self.scores_by_player) >= 10:
+                scores[i] = -inf
+            elif state.is_initialisation_phase():
+                scores[i] = self.heuristic_initialisation_phase(state)
+            else:
+                weights = self.winner_first_phase_weights if self.in_first_phase() else self.winner_last_phase_weights
+                evaluator = self._get_features_evaluator(weights)
+                features_by_evaluators[evaluator].append((i, evaluator.get_features(self, state).copy()))
+            state.unmake_move(move)
+
+        for evaluator, indices_and_features in features_by_evaluators.items():
+            indices, features = zip(*indices_and_features)
+            scores[list(indices)] = evaluator.evaluate_features(np.array(features))
+        for key, score in zip(keys, scores):
+            if key is not None:
+                self.evaluation_cache.store(key, score)
+        return scores
+
+
     def in_first_phase(self):
         """
         indicates if we re in the first stages of the game, or in the final stages.
@@ -292,95 +610,19 @@ class Winner(ExpectimaxBaselinePlayer):
         """
         prefer higher expected resource yield, rather than VP.
         also reward having places to build settlements.
+        the features are computed by a WinnerFeaturesEvaluator, compiled once per weights.
         :param state: the current state of the game.
         :param weights: a np array of weights to each value that the heuristic takes into account.
         :return: returns a score for this state.
         """
+        return self._get_features_evaluator(weights).evaluate(self, state)
 
-        values = np.zeros(TOTAL_WEIGHTS)
-        board = state.board
-        scores_by_players = state.get_scores_by_player()
-        currentResouces = self.resources
-
-        # how many cards of each resource we have right now
-        values[0] = currentResouces[Resource.Brick]
-        values[1] = currentResouces[Resource.Lumber]
-        values[2] = currentResouces[Resource.Wool]
-        values[3] = currentResouces[Resource.Grain]
-        values[4] = currentResouces[Resource.Ore]
-
-        # what is our trading ratio for each resource
-        brick_trade_ratio = Winner.calc_player_trade_ratio(self, state, Resource.Brick)
-        lumber_trade_ratio = Winner.calc_player_trade_ratio(self, state, Resource.Lumber)
-        wool_trade_ratio = Winner.calc_player_trade_ratio(self, state, Resource.Wool)
-        grain_trade_ratio = Winner.calc_player_trade_ratio(self, state, Resource.Grain)
-        ore_trade_ratio = Winner.calc_player_trade_ratio(self, state, Resource.Ore)
-
-        # current resources * trade ratios
-        values[5] = currentResouces[Resource.Brick] * (1 / brick_trade_ratio)
-        values[6] = currentResouces[Resource.Lumber] * (1 / lumber_trade_ratio)
-        values[7] = currentResouces[Resource.Wool] * (1 / wool_trade_ratio)
-        values[8] = currentResouces[Resource.Grain] * (1 / grain_trade_ratio)
-        values[9] = currentResouces[Resource.Ore] * (1 / ore_trade_ratio)
-
-        resource_expectation = Winner.get_resource_expectation(self, state)
-
-        # resource expectation
-        values[10] = resource_expectation[Resource.Brick]
-        values[11] = resource_expectation[Resource.Lumber]
-        values[12] = resource_expectation[Resource.Wool]
-        values[13] = resource_expectation[Resource.Grain]
-        values[14] = resource_expectation[Resource.Ore]
-
-        # resource expectations * trade ratios
-        values[15] = resource_expectation[Resource.Brick] * (1 / brick_trade_ratio)
-        values[16] = resource_expectation[Resource.Lumber] * (1 / lumber_trade_ratio)
-        values[17] = resource_expectation[Resource.Wool] * (1 / wool_trade_ratio)
-        values[18] = resource_expectation[Resource.Grain] * (1 / grain_trade_ratio)
-        values[19] = resource_expectation[Resource.Ore] * (1 / ore_trade_ratio)
-
-        # total resource expectation
-        values[20] = np.sum(values[i] for i in range(10, 15))
-
-        # the number of unexposed development cards, except for VP dev cards. (num dev cards)
-        values[21] = sum(self.unexposed_development_cards.values()) + sum(self.exposed_development_cards.values()) - self.unexposed_development_cards[DevelopmentCard.VictoryPoint]
-
-        # average and max difference between player's VP, and other's VP. should be with negative weights.
-        values[22] = Winner.get_avg_vp_difference(scores_by_players, self)  # Avg VP diff
-        values[23] = Winner.get_vp_diff(scores_by_players, self)  # Max VP diff
-
-        values[24] = 1 if self.can_settle_settlement() else 0
-        values[25] = 1 if self.can_settle_city() else 0
-        values[26] = 1 if self.has_resources_for_development_card() else 0
-
-        values[27] = len(board.get_settleable_locations_by_player(self))  # number of places we could build a settlement
-
-        # estimate how many turns it would take to get the resources for a road, settlement, city or dev card.
-        values[28] = self.get_turns_till_piece(currentResouces, resource_expectation, ResourceAmounts.road)
-        values[29] = self.get_turns_till_piece(currentResouces,
-                                               resource_expectation,
-                                               ResourceAmounts.settlement)
-        values[30] = self.get_turns_till_piece(currentResouces,
-                                               resource_expectation,
-                                               ResourceAmounts.city)
-        values[31] = self.get_turns_till_piece(currentResouces,
-                                               resource_expectation,
-                                               ResourceAmounts.development_card)
-
-        # our VP
-        values[32] = scores_by_players[self]
-
-        # the other heuristic
-        values[33] = self.weighted_probabilities_heuristic(state)
-
-        #difference between number of exposed knights.
-        values[34] = self.get_exposed_knights_diff(self, state)
-
-
-        values_debug = np.multiply(values,weights)
-        debug = 0
-
-        return np.dot(values, weights)
+    def _get_features_evaluator(self, weights) -> WinnerFeaturesEvaluator:
+        evaluator = self._features_evaluators.get(weights.tobytes())
+        if evaluator is None:
+            evaluator = WinnerFeaturesEvaluator(weights)
+            self._features_evaluators[weights.tobytes()] = evaluator
+        return evaluator
 
 
     def heuristic_final_phase(self, state, weights):
@@ -409,17 +651,11 @@ class Winner(ExpectimaxBaselinePlayer):
         each resource is a key, and it's value is that player's expected yield.
         """
         res_yield = {Colony.Settlement: 1, Colony.City: 2}
-        resources = {r: 0 for r in Resource}
-
-        for location in state.board.get_locations_colonised_by_player(player):
-            colony_yield = res_yield[state.board.get_colony_type_at_location(location)]
-            for land in state.board._roads_and_colonies.node[location][Board.lands]:  # The adjacent lands to the location we check
-                if land.resource is None:  # If this is a desert - do nothing
-                    continue
-                calc = colony_yield * state.probabilities_by_dice_values[land.dice_value]
-                resources[land.resource] += calc
+        colonies = state.board.get_locations_colonised_by_player(player)
+        colonies_yields = [res_yield[state.board.get_colony_type_at_location(location)] for location in colonies]
+        resources = np.dot(colonies_yields, state.board.get_resources_probabilities(colonies))
 
-        return resources
+        return {r: resources[r.value] for r in Resource}
 
 
     @staticmethod
@@ -555,15 +791,8 @@ class Winner(ExpectimaxBaselinePlayer):
         score = 0
         # noinspection PyTypeChecker
         for player, factor in self._players_and_factors:
-            for location in state.board.get_locations_colonised_by_player(player):
-                weight = self.expectimax_weights[state.board.get_colony_type_at_location(location)]
-                for dice_value in state.board.get_surrounding_dice_values(location):
-                    score += state.probabilities_by_dice_values[dice_value] * weight * factor
-
-            for road in state.board.get_roads_paved_by_player(player):
-                weight = self.expectimax_weights[Road.Paved]
-                for dice_value in state.board.get_adjacent_to_path_dice_values(road):
-                    score += state.probabilities_by_dice_values[dice_value] * weight * factor
+            for piece, probability in state.board.get_production_probabilities(player).items():
+                score += probability * self.expectimax_weights[piece] * factor
 
             for development_card in {DevelopmentCard.VictoryPoint, DevelopmentCard.Knight}:
                 weight = self.expectimax_weights[development_card]